@@ -0,0 +1,304 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for fetching several repositories with a single query. """
+
+import threading
+from crawl import crawl
+from pagination import fetch_all_pages, find_pending_pages, render_fields
+from query import RATE_LIMIT_FIELDS, get_cache, run_query
+
+# Query cost in points that a batch aims for. Larger batches save round
+# trips, while smaller batches keep each response well within Github's
+# timeouts and node limits.
+TARGET_COST = 200
+
+# Number of repositories in a batch before any query cost is known.
+DEFAULT_BATCH_SIZE = 5
+
+# Largest number of repositories in a batch.
+MAX_BATCH_SIZE = 50
+
+
+def build_repository_query(fields, name, owner):
+    """ Builds a query for a single repository.
+
+    Args:
+        fields: A string with the fields to get from the repository.
+        name: A string containing the repository name.
+        owner: A string containing the repository owner.
+
+    Returns:
+        str. The query, with the results under the "repository" key.
+    """
+    return f"""{{
+        {RATE_LIMIT_FIELDS}
+        repository(name: "{name}", owner: "{owner}") {{
+            {fields}
+        }}
+    }}"""
+
+
+def build_batch_query(fields, repos):
+    """ Builds a query for several repositories using aliases.
+
+    The results of the i-th repository are under the "r<i>" key.
+
+    Args:
+        fields: A string with the fields to get from each repository.
+        repos: List of (name, owner) tuples.
+
+    Returns:
+        str. The query.
+    """
+    aliases = "\n".join(
+        f"""r{index}: repository(name: "{name}", owner: "{owner}") {{
+            {fields}
+        }}"""
+        for index, (name, owner) in enumerate(repos))
+    return f"""{{
+        {RATE_LIMIT_FIELDS}
+        {aliases}
+    }}"""
+
+
+def split_batch_result(result, count):
+    """ Splits the results of a batch query into per-repository results.
+
+    Each per-repository result has the same structure as the result of a
+    query built by build_repository_query, so it can be passed unchanged to
+    the process_*_query_results functions.
+
+    Args:
+        result: The results of a query built by build_batch_query.
+        count: The number of repositories in the batch.
+
+    Returns:
+        List with the results of each repository, or [] for a repository
+            that could not be fetched.
+    """
+    if not result:
+        return [[] for _ in range(count)]
+
+    data = result["data"]
+    results = []
+    for index in range(count):
+        repository = data.get(f"r{index}")
+        if repository is None:
+            results.append([])
+        else:
+            results.append({"data": {
+                "rateLimit": data.get("rateLimit"),
+                "repository": repository
+            }})
+    return results
+
+
+class BatchSizer:
+    """ Chooses how many repositories to put into one query.
+
+    The size is derived from the cost that Github reports for each batch,
+    so that a batch costs about TARGET_COST points. When a batch fails, the
+    largest size is lowered to half of that batch, so the size does not grow
+    back to a batch size that Github already rejected.
+
+    Attributes:
+        size: The number of repositories in the next batch.
+        target_cost: The query cost in points that a batch aims for.
+        max_size: The largest number of repositories in a batch.
+    """
+
+    def __init__(self, size=DEFAULT_BATCH_SIZE, target_cost=TARGET_COST,
+                 max_size=MAX_BATCH_SIZE):
+        self.size = size
+        self.target_cost = target_cost
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def update(self, result, count):
+        """ Updates the size from the cost of a successful batch.
+
+        Args:
+            result: The results of the batch query.
+            count: The number of repositories in the batch.
+        """
+        try:
+            cost = result["data"]["rateLimit"]["cost"]
+        except (KeyError, TypeError):
+            return
+        cost_per_repo = max(cost, 1) / count
+        with self._lock:
+            self.size = max(1, min(self.max_size,
+                                   int(self.target_cost / cost_per_repo)))
+
+    def shrink(self, count):
+        """ Lowers the largest size after a failed batch.
+
+        Args:
+            count: The number of repositories in the failed batch.
+        """
+        with self._lock:
+            self.max_size = max(1, min(self.max_size, count // 2))
+            self.size = min(self.size, self.max_size)
+
+
+def fetch_repository(fields, name, owner, connections=()):
+    """ Gets the results of a single repository with every page of its
+    connections.
+
+    Args:
+        fields: A string with the fields to get from the repository.
+        name: A string containing the repository name.
+        owner: A string containing the repository owner.
+        connections: List of the paginated Connections of the repository.
+
+    Returns:
+        JSON. The results of the repository, or [] if it could not be
+            fetched.
+    """
+    selection = render_fields(fields, connections)
+    result = run_query(build_repository_query(selection, name, owner))
+    if result and result["data"].get("repository"):
+        fetch_all_pages([result["data"]["repository"]], "Repository",
+                        connections)
+    return result
+
+
+def get_repository_cache_key(fields, name, owner):
+    """ Gets the response cache key of the complete results of a repository.
+
+    Batches depend on the batch sizes learned during a crawl, so their
+    queries differ from run to run. The results of each repository are
+    therefore cached on their own, with every page of their connections.
+
+    Args:
+        fields: A string with the selection of the repository, rendered
+            with its connections.
+        name: A string containing the repository name.
+        owner: A string containing the repository owner.
+
+    Returns:
+        str. The key, which is never sent to Github.
+    """
+    return "# Every page of\n" + build_repository_query(fields, name, owner)
+
+
+def fetch_batch(fields, repos, sizer, connections=(), use_cache=True):
+    """ Gets the results of several repositories with one query.
+
+    If the query fails, the batch is split in half and each half is sent
+    again, so a batch that is too large for Github still gets its results.
+    The connections that have more pages than the first one are then
+    completed by the pagination module.
+
+    Args:
+        fields: A string with the selection of each repository, rendered
+            with its connections.
+        repos: List of (name, owner) tuples.
+        sizer: The BatchSizer updated with the cost of the query.
+        connections: List of the paginated Connections of each repository.
+        use_cache: Whether the pages of the connections may be read from
+            the response cache.
+
+    Returns:
+        List with the results of each repository.
+    """
+    result = run_query(build_batch_query(fields, repos), partial=True,
+                       use_cache=False)
+    if not result and len(repos) > 1:
+        sizer.shrink(len(repos))
+        half = len(repos) // 2
+        return (fetch_batch(fields, repos[:half], sizer, connections,
+                            use_cache)
+                + fetch_batch(fields, repos[half:], sizer, connections,
+                              use_cache))
+    sizer.update(result, len(repos))
+    results = split_batch_result(result, len(repos))
+    if connections:
+        fetch_all_pages(
+            [repo_result["data"]["repository"]
+             for repo_result in results if repo_result],
+            "Repository", connections, use_cache=use_cache)
+    return results
+
+
+def generate_batches(repos, sizer):
+    """ Splits repositories into batches of the current size.
+
+    The batches are generated lazily, so each batch uses the size learned
+    from the batches that have already been answered.
+
+    Args:
+        repos: List of (name, owner) tuples.
+        sizer: The BatchSizer that gives the size of each batch.
+
+    Yields:
+        Tuple with the list of (name, owner) tuples in the batch.
+    """
+    position = 0
+    while position < len(repos):
+        batch = repos[position:position + sizer.size]
+        position += len(batch)
+        yield (batch,)
+
+
+def fetch_repositories(fields, repos, connections=(), concurrency=None,
+                       use_cache=True):
+    """ Gets the results of many repositories, several per query.
+
+    Batches are sent concurrently by the crawl module. Every page of the
+    connections is fetched before the results of a repository are yielded.
+    With the response cache, the repositories that are cached are not put
+    into any batch, and the complete results of the others are cached.
+
+    Args:
+        fields: A string with the fields to get from each repository.
+        repos: List of (name, owner) tuples.
+        connections: List of the paginated Connections of each repository.
+        concurrency: The maximum number of queries in flight at once.
+        use_cache: Whether the results may be read from and written to the
+            response cache.
+
+    Yields:
+        The results of each repository, in the order of repos.
+    """
+    cache = get_cache() if use_cache else None
+    selection = render_fields(fields, connections)
+    keys = [get_repository_cache_key(selection, name, owner)
+            for name, owner in repos]
+    cached = [cache.get(key) if cache is not None else None for key in keys]
+    missing = [repo for repo, result in zip(repos, cached) if result is None]
+
+    def fetch_missing():
+        sizer = BatchSizer()
+        for batch_results in crawl(
+                lambda batch: fetch_batch(selection, batch, sizer,
+                                          connections, use_cache),
+                generate_batches(missing, sizer), concurrency):
+            yield from batch_results
+
+    fetched = fetch_missing()
+    try:
+        for key, result in zip(keys, cached):
+            if result is None:
+                result = next(fetched, [])
+                # Repositories that could not be fetched completely are
+                # fetched again next time.
+                if cache is not None and result and not find_pending_pages(
+                        result["data"]["repository"], "Repository",
+                        connections):
+                    cache.put(key, result)
+            yield result
+    finally:
+        fetched.close()
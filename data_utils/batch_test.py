@@ -0,0 +1,201 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the batch module. """
+
+import os
+import re
+import tempfile
+import unittest
+from unittest.mock import patch
+from fake_github import FakeGithubServer
+from token_pool import TokenPool
+import batch
+import query
+
+ALIAS_PATTERN = re.compile(
+    r'(r\d+): repository\(name: "([^"]+)", owner: "([^"]+)"\)')
+
+
+def make_batch_endpoint(cost_per_repo, max_repos, batch_sizes):
+    """ Creates a fake endpoint that answers batch queries.
+
+    Args:
+        cost_per_repo: The query cost in points of each repository.
+        max_repos: Batches with more repositories fail with an error.
+        batch_sizes: List that records the size of every batch.
+
+    Returns:
+        The respond function for FakeGithubServer.
+    """
+    def respond(query_input, headers):
+        # pylint: disable=unused-argument
+        aliases = ALIAS_PATTERN.findall(query_input)
+        batch_sizes.append(len(aliases))
+        if len(aliases) > max_repos:
+            return 200, {}, {"errors": [{"type": "MAX_NODE_LIMIT_EXCEEDED"}]}
+        data = {"rateLimit": {"cost": cost_per_repo * len(aliases)}}
+        errors = []
+        for alias, name, owner in aliases:
+            if name == "missing":
+                data[alias] = None
+                errors.append({"type": "NOT_FOUND", "path": [alias]})
+            else:
+                data[alias] = {"nameWithOwner": f"{owner}/{name}"}
+        body = {"data": data}
+        if errors:
+            body["errors"] = errors
+        return 200, {}, body
+
+    return respond
+
+
+class BatchTest(unittest.TestCase):
+    """ Batch test class. """
+
+    def tearDown(self):
+        query._client = None  # pylint: disable=protected-access
+        query._cache = None  # pylint: disable=protected-access
+
+    def test_build_batch_query(self):
+        """ Test to check that each repository gets its own alias. """
+        batch_query = batch.build_batch_query(
+            "nameWithOwner", [("risr", "googleinterns"), ("step", "intern")])
+        self.assertEqual(ALIAS_PATTERN.findall(batch_query), [
+            ("r0", "risr", "googleinterns"),
+            ("r1", "step", "intern")
+        ])
+        self.assertIn("rateLimit", batch_query)
+
+    def test_split_batch_result(self):
+        """ Test to check that batch results are split into results with the
+        structure of a single repository query. """
+        result = {
+            "data": {
+                "rateLimit": {"cost": 2},
+                "r0": {"nameWithOwner": "googleinterns/risr"},
+                "r1": None
+            }
+        }
+        results = batch.split_batch_result(result, 2)
+        self.assertEqual(
+            results[0]["data"]["repository"]["nameWithOwner"],
+            "googleinterns/risr")
+        self.assertEqual(results[1], [])
+        self.assertEqual(batch.split_batch_result([], 2), [[], []])
+
+    def test_batch_sizer(self):
+        """ Test to check that the batch size follows the query cost. """
+        sizer = batch.BatchSizer(size=5, target_cost=100, max_size=20)
+        sizer.update({"data": {"rateLimit": {"cost": 50}}}, 5)
+        self.assertEqual(sizer.size, 10)
+        sizer.update({"data": {"rateLimit": {"cost": 1}}}, 10)
+        self.assertEqual(sizer.size, 20)
+        sizer.shrink(20)
+        self.assertEqual(sizer.size, 10)
+        sizer.update({"data": {"rateLimit": {"cost": 1}}}, 10)
+        self.assertEqual(sizer.size, 10)
+        sizer.update([], 10)
+        self.assertEqual(sizer.size, 10)
+
+    def test_fetch_repositories(self):
+        """ Test to check that results come back in order, one per
+        repository, with adaptive batch sizes and split failed batches. """
+        batch_sizes = []
+        repos = [(f"repo{index}", "intern") for index in range(40)]
+        repos[7] = ("missing", "intern")
+        respond = make_batch_endpoint(cost_per_repo=20, max_repos=8,
+                                      batch_sizes=batch_sizes)
+        with FakeGithubServer(respond) as server:
+            # Pace requests faster than Github would to keep the test short.
+            token_pool = TokenPool(["test"])
+            token_pool.limiters["test"].rate = 10 ** 6
+            token_pool.limiters["test"].max_rate = 10 ** 6
+            query._client = query.GraphQLClient(  # pylint: disable=protected-access
+                url=server.url, token_pool=token_pool)
+            results = list(batch.fetch_repositories("nameWithOwner", repos,
+                                                  concurrency=1))
+            query.get_client().close()
+
+        self.assertEqual(len(results), 40)
+        for (name, owner), result in zip(repos, results):
+            if name == "missing":
+                self.assertEqual(result, [])
+            else:
+                self.assertEqual(
+                    result["data"]["repository"]["nameWithOwner"],
+                    f"{owner}/{name}")
+        # The first batch uses the default size and the second one aims for
+        # the target cost. It is above the endpoint's limit, so it is split
+        # and later batches stay at half its size.
+        self.assertEqual(batch_sizes[:4], [5, 10, 5, 5])
+        self.assertTrue(all(size <= 5 for size in batch_sizes[2:]))
+
+    def test_fetch_repositories_cached(self):
+        """ Test to check that a second run answers every repository from
+        the response cache, whatever batches the first run sent. """
+        batch_sizes = []
+        repos = [(f"repo{index}", "intern") for index in range(12)]
+        repos[3] = ("missing", "intern")
+        respond = make_batch_endpoint(cost_per_repo=20, max_repos=8,
+                                      batch_sizes=batch_sizes)
+        with FakeGithubServer(respond) as server, \
+                tempfile.TemporaryDirectory() as cache_dir, \
+                patch.dict(os.environ, {"RISR_CACHE_DIR": cache_dir}):
+            token_pool = TokenPool(["test"])
+            token_pool.limiters["test"].rate = 10 ** 6
+            token_pool.limiters["test"].max_rate = 10 ** 6
+            query._client = query.GraphQLClient(  # pylint: disable=protected-access
+                url=server.url, token_pool=token_pool)
+            cache = query.enable_cache("pr_stats")
+            first = list(batch.fetch_repositories("nameWithOwner", repos,
+                                                  concurrency=2))
+            first_sizes = list(batch_sizes)
+            second = list(batch.fetch_repositories("nameWithOwner", repos,
+                                                   concurrency=2))
+            query.get_client().close()
+
+        self.assertEqual(first, second)
+        # Only the repository that could not be fetched is sent again.
+        self.assertEqual(batch_sizes[len(first_sizes):], [1])
+        self.assertEqual(cache.hits, 11)
+
+    def test_fetch_repositories_no_cache(self):
+        """ Test to check that use_cache=False neither reads nor writes the
+        response cache. """
+        batch_sizes = []
+        repos = [(f"repo{index}", "intern") for index in range(4)]
+        respond = make_batch_endpoint(cost_per_repo=20, max_repos=8,
+                                      batch_sizes=batch_sizes)
+        with FakeGithubServer(respond) as server, \
+                tempfile.TemporaryDirectory() as cache_dir, \
+                patch.dict(os.environ, {"RISR_CACHE_DIR": cache_dir}):
+            token_pool = TokenPool(["test"])
+            token_pool.limiters["test"].rate = 10 ** 6
+            token_pool.limiters["test"].max_rate = 10 ** 6
+            query._client = query.GraphQLClient(  # pylint: disable=protected-access
+                url=server.url, token_pool=token_pool)
+            cache = query.enable_cache("pr_comments")
+            for _ in range(2):
+                list(batch.fetch_repositories("nameWithOwner", repos,
+                                              concurrency=1,
+                                              use_cache=False))
+            query.get_client().close()
+
+        self.assertEqual(sum(batch_sizes), 8)
+        self.assertEqual(cache.hits + cache.misses, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for resuming long crawls after a failure.
+
+A stage appends the rows of each repository to its CSV, then commits the
+repository to a checkpoint file. If the run fails, for example because of a
+network error or an expired token, the next run truncates the rows of the
+repository that was not committed and continues with the repositories
+that are not completed. The checkpoint is removed once every repository is
+completed, so the run after that starts from the beginning.
+"""
+
+import csv
+import json
+import os
+from incremental import write_atomically
+from lake import get_results, skip_missing
+
+
+def get_repository_key(row):
+    """ Gets the key of a repository in a checkpoint.
+
+    Args:
+        row: The row of the repository in the repository CSV.
+
+    Returns:
+        str. The "owner/name" of the repository.
+    """
+    return f"{row['owner']}/{row['name']}"
+
+
+class Checkpoint:
+    """ Completed repositories of a stage, kept on disk.
+
+    The checkpoint also acts as the CSV writer of the stage: rows are held
+    until the repository they belong to is committed.
+
+    Attributes:
+        path: The path of the JSON file with the checkpoint, or None to
+            keep the progress in memory only.
+        completed: Set of the keys of the completed repositories.
+        offset: The size in bytes of the output CSV at the last commit.
+        state: Dictionary with data of the stage that must survive a
+            restart, such as the hosts found so far.
+        pending: List of the rows written since the last commit.
+        out_file: The output CSV, or None if the stage has no CSV output.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        self.offset = 0
+        self.state = {}
+        self.pending = []
+        self.out_file = None
+        if path and os.path.isfile(path):
+            with open(path) as in_file:
+                saved = json.load(in_file)
+            self.completed = set(saved["completed"])
+            self.offset = saved["offset"]
+            self.state = saved["state"]
+
+    def open_output(self, csv_path, header):
+        """ Opens the output CSV of the stage.
+
+        Without a checkpoint, the CSV is created with its header. Otherwise
+        the rows written after the last commit are removed, and new rows
+        are appended.
+
+        Args:
+            csv_path: The path of the output CSV.
+            header: List of the column names.
+
+        Raises:
+            Exception: The CSV is shorter than at the last commit.
+        """
+        if not self.path or not os.path.isfile(self.path):
+            self.out_file = open(csv_path, "w", newline="")
+            csv.writer(self.out_file).writerow(header)
+            return
+        if not os.path.isfile(csv_path) or \
+                os.path.getsize(csv_path) < self.offset:
+            raise Exception(f"{csv_path} does not match {self.path}. Remove "
+                            "the checkpoint to start over.")
+        os.truncate(csv_path, self.offset)
+        self.out_file = open(csv_path, "a", newline="")
+
+    def writerow(self, row):
+        """ Holds a row until the next commit.
+
+        Args:
+            row: List of the values in the row.
+        """
+        self.pending.append(row)
+
+    def commit(self, key):
+        """ Writes the pending rows to disk and marks a repository completed.
+
+        The rows are synced to disk before the checkpoint is replaced, so
+        the checkpoint never records rows that are not in the CSV.
+
+        Args:
+            key: The key of the repository, from get_repository_key().
+        """
+        if self.out_file:
+            csv.writer(self.out_file).writerows(self.pending)
+            self.out_file.flush()
+            os.fsync(self.out_file.fileno())
+            self.offset = os.fstat(self.out_file.fileno()).st_size
+        self.pending = []
+        self.completed.add(key)
+        if not self.path:
+            return
+        write_atomically(self.path, lambda out_file: json.dump({
+            "completed": sorted(self.completed),
+            "offset": self.offset,
+            "state": self.state
+        }, out_file))
+
+    def close(self):
+        """ Closes the output CSV. Uncommitted rows are dropped. """
+        if self.out_file:
+            self.out_file.close()
+            self.out_file = None
+
+    def remove(self):
+        """ Removes the checkpoint once the stage is completed. """
+        if self.path and os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+def run_with_checkpoint(checkpoint, stage, rows, fetch, sink,
+                        from_lake=False):
+    """ Runs a sink over the repositories that are not completed yet.
+
+    Each repository is committed after its results are given to the sink,
+    and the checkpoint is removed once every repository is completed.
+    The run stops at the first repository without results, except for
+    repositories missing from the lake, which are skipped.
+
+    Args:
+        checkpoint: The Checkpoint of the stage. Sinks with CSV output must
+            write their rows to it.
+        stage: The name of the stage, such as "pr_stats".
+        rows: List of the repository rows from the repositories CSV.
+        fetch: Function that takes a list of (name, owner) tuples and
+            returns an iterable with the query results of each repository.
+        sink: Function that takes a repository CSV row and the query
+            results of the repository.
+        from_lake: Whether to read the latest results in the response lake
+            instead of sending queries.
+
+    Raises:
+        Exception: The results of a repository could not be fetched.
+    """
+    # pylint: disable=too-many-arguments
+    remaining = [row for row in rows
+                 if get_repository_key(row) not in checkpoint.completed]
+    if len(remaining) < len(rows):
+        print(f"Resuming {stage} after {len(rows) - len(remaining)} "
+              "completed repositories.")
+    repos = [(row["name"], row["owner"]) for row in remaining]
+    try:
+        results = get_results(stage, repos, fetch, from_lake)
+        if from_lake:
+            # Running again does not add missing repositories to the lake.
+            results = skip_missing(stage, remaining, results)
+        else:
+            results = zip(remaining, results)
+        for row, query_results in results:
+            key = get_repository_key(row)
+            # A failed query, for example because of an expired token, is
+            # not committed, so the next run fetches the repository again.
+            if not query_results:
+                raise Exception(f"The {stage} results of {key} could not be "
+                                "fetched. Run the stage again to resume from "
+                                "it, or remove it from the repositories CSV "
+                                "if it no longer exists.")
+            sink(row, query_results)
+            checkpoint.commit(key)
+    finally:
+        checkpoint.close()
+    checkpoint.remove()
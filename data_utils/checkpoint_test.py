@@ -0,0 +1,146 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the checkpoint module. """
+
+import csv
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import checkpoint
+import lake
+
+ROWS = [{"owner": "intern", "name": f"repo{index}"} for index in range(4)]
+
+
+def make_sink(writer):
+    """ Creates a sink that writes a row per repository. """
+    def sink(row, result):
+        writer.writerow([row["name"], result["data"]])
+    return sink
+
+
+def make_fetch(requested, fail_after=None, empty_after=None):
+    """ Creates a fetch function that records the requested repositories,
+    fails after fail_after results and gives empty results, as failed
+    queries do, after empty_after results. """
+    def fetch(repos):
+        requested.append([name for name, _ in repos])
+        for count, (name, _) in enumerate(repos):
+            if count == fail_after:
+                raise Exception("Network error.")
+            if empty_after is not None and count >= empty_after:
+                yield []
+            else:
+                yield {"data": name.upper()}
+    return fetch
+
+
+class CheckpointTest(unittest.TestCase):
+    """ Checkpoint test class. """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.temp_dir.name, "out.csv")
+        self.checkpoint_json = os.path.join(self.temp_dir.name,
+                                            "checkpoint.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_stage(self, fetch):
+        """ Runs a stage with a checkpoint over ROWS. """
+        stage_checkpoint = checkpoint.Checkpoint(self.checkpoint_json)
+        stage_checkpoint.open_output(self.csv_path, ["name", "data"])
+        checkpoint.run_with_checkpoint(stage_checkpoint, "test", ROWS, fetch,
+                                       make_sink(stage_checkpoint))
+
+    def test_resume(self):
+        """ Test to check that a failed run resumes after the last completed
+        repository and gives the same CSV as a run without failures. """
+        requested = []
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaises(Exception):
+                self.run_stage(make_fetch(requested, fail_after=2))
+            self.assertTrue(os.path.isfile(self.checkpoint_json))
+            self.run_stage(make_fetch(requested))
+
+        self.assertEqual(requested, [["repo0", "repo1", "repo2", "repo3"],
+                                     ["repo2", "repo3"]])
+        self.assertFalse(os.path.isfile(self.checkpoint_json))
+        with open(self.csv_path, newline="") as in_csv:
+            self.assertEqual(list(csv.reader(in_csv)), [
+                ["name", "data"], ["repo0", "REPO0"], ["repo1", "REPO1"],
+                ["repo2", "REPO2"], ["repo3", "REPO3"]])
+
+    def test_failed_query(self):
+        """ Test to check that repositories without results, such as after
+        a token expires, are not completed. """
+        requested = []
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaises(Exception):
+                self.run_stage(make_fetch(requested, empty_after=1))
+            self.assertTrue(os.path.isfile(self.checkpoint_json))
+            self.run_stage(make_fetch(requested))
+
+        self.assertEqual(requested, [["repo0", "repo1", "repo2", "repo3"],
+                                     ["repo1", "repo2", "repo3"]])
+        with open(self.csv_path, newline="") as in_csv:
+            self.assertEqual(len(list(csv.reader(in_csv))), 5)
+
+    def test_missing_from_lake(self):
+        """ Test to check that repositories missing from the lake are
+        skipped instead of stopping the run. """
+        with tempfile.TemporaryDirectory() as lake_dir, \
+                patch.dict(os.environ, {"RISR_LAKE_DIR": lake_dir}):
+            lake.ResponseLake(lake_dir).append("test", "intern", "repo1",
+                                               {"data": "REPO1"})
+            stage_checkpoint = checkpoint.Checkpoint(self.checkpoint_json)
+            stage_checkpoint.open_output(self.csv_path, ["name", "data"])
+            checkpoint.run_with_checkpoint(
+                stage_checkpoint, "test", ROWS, make_fetch([]),
+                make_sink(stage_checkpoint), from_lake=True)
+
+        self.assertFalse(os.path.isfile(self.checkpoint_json))
+        with open(self.csv_path, newline="") as in_csv:
+            self.assertEqual(list(csv.reader(in_csv)),
+                             [["name", "data"], ["repo1", "REPO1"]])
+
+    def test_uncommitted_rows(self):
+        """ Test to check that rows written after the last commit are
+        removed on a restart. """
+        stage_checkpoint = checkpoint.Checkpoint(self.checkpoint_json)
+        stage_checkpoint.open_output(self.csv_path, ["name"])
+        stage_checkpoint.writerow(["repo0"])
+        stage_checkpoint.commit("intern/repo0")
+        stage_checkpoint.close()
+        with open(self.csv_path, "a", newline="") as out_csv:
+            out_csv.write("partial")
+
+        resumed = checkpoint.Checkpoint(self.checkpoint_json)
+        self.assertEqual(resumed.completed, {"intern/repo0"})
+        resumed.open_output(self.csv_path, ["name"])
+        resumed.close()
+        with open(self.csv_path, newline="") as in_csv:
+            self.assertEqual(in_csv.read(), "name\r\nrepo0\r\n")
+
+        os.remove(self.csv_path)
+        with self.assertRaises(Exception):
+            checkpoint.Checkpoint(self.checkpoint_json).open_output(
+                self.csv_path, ["name"])
+
+
+if __name__ == "__main__":
+    unittest.main()
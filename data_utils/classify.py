@@ -0,0 +1,341 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for classifying every code review comment into categories.
+
+A TF-IDF and logistic regression model is trained on the training comments
+from comment_classification.py, once a "category" column has been filled
+in by hand. The fitted model is saved, and then used to classify every
+comment of pr_comments.csv in chunks, by a pool of processes.
+
+The categories are counted per internship week for the dashboard, which
+plots comment_categories.csv.
+"""
+
+import collections
+import csv
+import hashlib
+import json
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from dedup import load_clusters
+from incremental import read_chunks, write_atomically
+from label_cache import LabelCache, get_label_key
+from transform import get_worker_count
+from weeks import get_comment_weeks, load_start_dates
+
+# Number of comments classified by a worker process at a time.
+CHUNK_SIZE = 20000
+
+MODEL_FILE = "model.pkl"
+METADATA_FILE = "model.json"
+
+# Columns of comment_classes.csv.
+CLASS_COLUMNS = ["comment_path", "created", "category"]
+
+# Model of the worker processes, loaded once per process.
+WORKER_MODEL = {}
+
+LABEL_CACHE_FILE = "labels.sqlite"
+
+# Chunk of comments being classified. labels has the categories found in
+# the cache, and future gives the categories of the texts of unseen_keys.
+PendingChunk = collections.namedtuple(
+    "PendingChunk", ["chunk", "keys", "labels", "unseen_keys", "future"])
+
+
+def train_model(training_file, model_dir):
+    """ Trains the comment classifier and saves it.
+
+    Args:
+        training_file: CSV of comments with a "comment" and a "category"
+            column. Comments without a category are ignored.
+        model_dir: Directory in which the model and its metadata are saved.
+
+    Returns:
+        Dictionary with the metadata of the model: its version, which is a
+        hash of the fitted model, its categories and its number of
+        training comments.
+
+    Raises:
+        Exception: There are fewer than two categories.
+    """
+    with open(training_file, newline="") as in_csv:
+        rows = [row for row in csv.DictReader(in_csv)
+                if row.get("category")]
+    categories = sorted({row["category"] for row in rows})
+    if len(categories) < 2:
+        raise Exception("The training comments need at least two categories.")
+
+    model = make_pipeline(
+        TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2)),
+        LogisticRegression(max_iter=1000))
+    model.fit([row["comment"] for row in rows],
+              [row["category"] for row in rows])
+
+    model_bytes = pickle.dumps(model)
+    metadata = {
+        "version": hashlib.sha256(model_bytes).hexdigest()[:16],
+        "categories": categories,
+        "training_comments": len(rows)
+    }
+    os.makedirs(model_dir, exist_ok=True)
+    write_atomically(os.path.join(model_dir, MODEL_FILE),
+                     lambda out_file: out_file.write(model_bytes),
+                     binary=True)
+    write_atomically(os.path.join(model_dir, METADATA_FILE),
+                     lambda out_file: json.dump(metadata, out_file, indent=2))
+    return metadata
+
+
+def load_metadata(model_dir):
+    """ Loads the metadata of a saved model.
+
+    Args:
+        model_dir: Directory in which the model is saved.
+
+    Returns:
+        Dictionary with the metadata from train_model().
+
+    Raises:
+        Exception: There is no saved model.
+    """
+    path = os.path.join(model_dir, METADATA_FILE)
+    if not os.path.isfile(path):
+        raise Exception("There is no model. Train one with: classify.py "
+                        "train")
+    with open(path) as in_file:
+        return json.load(in_file)
+
+
+def load_worker_model(model_dir):
+    """ Loads the model in a worker process.
+
+    Args:
+        model_dir: Directory in which the model is saved.
+    """
+    with open(os.path.join(model_dir, MODEL_FILE), "rb") as in_file:
+        WORKER_MODEL["model"] = pickle.load(in_file)
+
+
+def classify_chunk(comments):
+    """ Classifies a chunk of comments in a worker process.
+
+    Args:
+        comments: List of comment texts.
+
+    Returns:
+        numpy array with the index of the category of each comment in the
+        sorted categories of the model.
+    """
+    model = WORKER_MODEL["model"]
+    if not comments:
+        return np.array([], dtype=np.int64)
+    return np.searchsorted(model.classes_, model.predict(comments))
+
+
+def classify_comments(comments_file, model_dir, out_csv, workers=None,
+                      clusters=None):
+    """ Classifies every comment of a comments CSV.
+
+    Comments whose text was already classified by the same model are taken
+    from the label cache of the model directory. The other texts are
+    classified once each by a pool of processes, each of which loads the
+    model once. At most two chunks per process are read ahead, so memory
+    does not grow with the number of comments.
+
+    Args:
+        comments_file: CSV containing all code review comments.
+        model_dir: Directory in which the model is saved.
+        out_csv: The path of the CSV with the category of each comment.
+        workers: The number of processes. Defaults to get_worker_count().
+        clusters: Dictionary mapping comment paths to their near-duplicate
+            cluster, from dedup.load_clusters(). The comments of a cluster
+            get the category of its first comment. None to classify every
+            comment by its own text.
+
+    Returns:
+        LabelCache. The closed cache, with the number of comments found in
+        it and not found.
+    """
+    metadata = load_metadata(model_dir)
+    workers = workers or get_worker_count()
+    cache = LabelCache(os.path.join(model_dir, LABEL_CACHE_FILE),
+                       metadata["version"])
+    representative_keys = {}
+    # Keys of the texts being classified, which later chunks do not submit.
+    in_flight = set()
+
+    def get_key(row):
+        path = row["comment_path"]
+        cluster = clusters.get(path, path) if clusters else path
+        if cluster in representative_keys:
+            return representative_keys[cluster]
+        key = get_label_key(row["comment"])
+        if clusters and cluster == path:
+            representative_keys[path] = key
+        return key
+
+    def write(out_file):
+        writer = csv.writer(out_file)
+        writer.writerow(CLASS_COLUMNS)
+        with ProcessPoolExecutor(workers, initializer=load_worker_model,
+                                 initargs=(model_dir,)) as executor:
+            pending = collections.deque()
+            for chunk in read_chunks(comments_file, CHUNK_SIZE):
+                keys = [get_key(row) for row in chunk]
+                labels = cache.get_many(keys)
+                unseen = {}
+                for key, row in zip(keys, chunk):
+                    if key not in labels and key not in in_flight:
+                        unseen.setdefault(key, row["comment"])
+                in_flight.update(unseen)
+                future = executor.submit(classify_chunk,
+                                         list(unseen.values()))
+                pending.append(PendingChunk(chunk, keys, labels,
+                                            list(unseen), future))
+                if len(pending) > 2 * workers:
+                    write_chunk(writer, metadata["categories"], cache,
+                                pending.popleft(), in_flight)
+            while pending:
+                write_chunk(writer, metadata["categories"], cache,
+                            pending.popleft(), in_flight)
+
+    try:
+        write_atomically(out_csv, write)
+    finally:
+        cache.close()
+    return cache
+
+
+def write_chunk(writer, categories, cache, pending_chunk, in_flight):
+    """ Writes the categories of a chunk of comments once classified.
+
+    Args:
+        writer: CSV writer of the comment categories.
+        categories: List of the sorted categories of the model.
+        cache: The LabelCache, to which the new categories are added.
+        pending_chunk: The PendingChunk.
+        in_flight: Set of the keys being classified, from which the keys of
+            the chunk are removed.
+    """
+    labels = pending_chunk.labels
+    new_labels = {
+        key: categories[index] for key, index in zip(
+            pending_chunk.unseen_keys,
+            pending_chunk.future.result().tolist())
+    }
+    cache.put_many(new_labels)
+    in_flight.difference_update(new_labels)
+    labels.update(new_labels)
+    # Texts submitted with an earlier chunk, which is already written.
+    labels.update(cache.lookup(
+        [key for key in pending_chunk.keys if key not in labels]))
+    for row, key in zip(pending_chunk.chunk, pending_chunk.keys):
+        writer.writerow([row["comment_path"], row["created"], labels[key]])
+
+
+def count_categories(classes_csv, stats_csv, categories, out_csv):
+    """ Counts the comments of each category per internship week.
+
+    The week of a comment is found from the start date of its pull request
+    in the pull request statistics. Comments with an unknown week are not
+    counted.
+
+    Args:
+        classes_csv: The path of the CSV with the category of each comment.
+        stats_csv: The path of the pull request statistics CSV.
+        categories: List of the categories of the model.
+        out_csv: The path of the CSV with a week column and a count column
+            per category.
+    """
+    start_dates = load_start_dates(stats_csv)
+    counts = collections.defaultdict(collections.Counter)
+    for chunk in read_chunks(classes_csv, CHUNK_SIZE):
+        weeks = get_comment_weeks(chunk, start_dates)
+        for row, week in zip(chunk, weeks):
+            if week != "unknown":
+                counts[week][row["category"]] += 1
+
+    def write(out_file):
+        writer = csv.writer(out_file)
+        writer.writerow(["week"] + categories)
+        for week in sorted(counts):
+            writer.writerow([week] + [counts[week][category]
+                                      for category in categories])
+
+    write_atomically(out_csv, write)
+
+
+def main():
+    """ Trains the comment classifier or classifies every comment.
+
+    Usage:
+        $ python3 classify.py train [test]
+    trains the model on training_comments.csv, which must have a "category"
+    column, and saves it to data/model/.
+        $ python3 classify.py classify [test]
+    classifies every comment of pr_comments.csv with the saved model. The
+    categories are cached by comment text, so only new or edited comments
+    are classified again, until the model is retrained. While the clusters
+    of dedup.py are up to date, near-duplicate comments get the category of
+    the first comment of their cluster.
+
+    comment_classes.csv has the following columns:
+        comment_path: The resource path to the comment.
+        created: The date and time that the comment was created.
+        category: The predicted category of the comment.
+
+    comment_categories.csv has a week column, with the internship week from
+    the start dates in pr_stats.csv, and the number of comments of each
+    category in that week.
+    """
+    if len(sys.argv) < 2 or sys.argv[1] not in ("train", "classify"):
+        raise Exception("Usage: classify.py <train|classify> [test]")
+    if len(sys.argv) == 2:
+        prefix = "data/"
+    elif sys.argv[2] == "test":
+        prefix = "data/test_"
+    else:
+        raise Exception("Invalid command line argument.")
+    model_dir = prefix + "model"
+
+    if sys.argv[1] == "train":
+        metadata = train_model(prefix + "training_comments.csv", model_dir)
+        print(f"Trained model {metadata['version']} on "
+              f"{metadata['training_comments']} comments.")
+        return
+
+    comments_file = prefix + "pr_comments.csv"
+    if not os.path.isfile(comments_file):
+        raise Exception("The CSV for code review comments does not exist.")
+    classes_csv = prefix + "comment_classes.csv"
+    cache = classify_comments(
+        comments_file, model_dir, classes_csv,
+        clusters=load_clusters(prefix + "comment_clusters.csv", comments_file))
+    print(f"Classified {cache.hits + cache.misses} comments.")
+    print(cache.report())
+    count_categories(classes_csv, prefix + "pr_stats.csv",
+                     load_metadata(model_dir)["categories"],
+                     prefix + "comment_categories.csv")
+
+
+if __name__ == "__main__":
+    main()
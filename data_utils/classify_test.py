@@ -0,0 +1,188 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the classify module. """
+
+import csv
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import classify
+
+TRAINING_COMMENTS = [
+    ("Please add a unit test for this case.", "testing"),
+    ("Could you add tests for the empty list?", "testing"),
+    ("This needs a test.", "testing"),
+    ("nit: rename this variable.", "style"),
+    ("nit: fix the indentation.", "style"),
+    ("Use a more descriptive variable name.", "style"),
+    ("Unlabeled comment.", "")
+]
+
+
+class ClassifyTest(unittest.TestCase):
+    """ Classify test class. """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.model_dir = self.get_path("model")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_path(self, name):
+        """ Gets the path of a file in the temporary directory. """
+        return os.path.join(self.temp_dir.name, name)
+
+    def write_csv(self, name, rows):
+        """ Writes a CSV in the temporary directory. """
+        with open(self.get_path(name), "w", newline="") as out_csv:
+            csv.writer(out_csv).writerows(rows)
+        return self.get_path(name)
+
+    def test_train_model(self):
+        """ Test to check that the model is saved with its metadata, and
+        that unlabeled comments are ignored. """
+        training_file = self.write_csv(
+            "training_comments.csv",
+            [["comment", "category"]] + TRAINING_COMMENTS)
+        metadata = classify.train_model(training_file, self.model_dir)
+        self.assertEqual(metadata["categories"], ["style", "testing"])
+        self.assertEqual(metadata["training_comments"], 6)
+        self.assertEqual(classify.load_metadata(self.model_dir), metadata)
+
+        single_category = self.write_csv(
+            "single.csv", [["comment", "category"]] + TRAINING_COMMENTS[:3])
+        with self.assertRaises(Exception):
+            classify.train_model(single_category, self.model_dir)
+
+    def test_classify_comments(self):
+        """ Test to check that every comment is classified, in order, and
+        counted per week. """
+        training_file = self.write_csv(
+            "training_comments.csv",
+            [["comment", "category"]] + TRAINING_COMMENTS)
+        classify.train_model(training_file, self.model_dir)
+        comments_file = self.write_csv("pr_comments.csv", [
+            ["comment_path", "created", "author", "comment", "repo_type",
+             "is_host"],
+            ["/a/b/pull/1#1", "2020-06-01T10:00:00Z", "host",
+             "Add a test for this.", "starter", "True"],
+            ["/a/b/pull/1#2", "2020-06-09T10:00:00Z", "host",
+             "nit: rename this.", "starter", "True"],
+            ["/a/b/pull/2#1", "2020-06-09T10:00:00Z", "intern",
+             "Please add more tests.", "starter", "False"],
+            ["/a/c/pull/1#1", "2020-06-09T10:00:00Z", "intern",
+             "nit: indentation.", "starter", "False"]
+        ])
+        stats_csv = self.write_csv("pr_stats.csv", [
+            ["pr_path", "start_date"],
+            ["/a/b/pull/1", "6/1/2020"],
+            ["/a/b/pull/2", "6/1/2020"],
+            ["/a/c/pull/1", "unknown"]
+        ])
+
+        classes_csv = self.get_path("comment_classes.csv")
+        with patch("classify.CHUNK_SIZE", 1):
+            cache = classify.classify_comments(
+                comments_file, self.model_dir, classes_csv, workers=2)
+        self.assertEqual((cache.hits, cache.misses), (0, 4))
+        with open(classes_csv, newline="") as in_csv:
+            rows = list(csv.DictReader(in_csv))
+        self.assertEqual([row["comment_path"] for row in rows],
+                         ["/a/b/pull/1#1", "/a/b/pull/1#2", "/a/b/pull/2#1",
+                          "/a/c/pull/1#1"])
+        self.assertEqual([row["category"] for row in rows],
+                         ["testing", "style", "testing", "style"])
+
+        categories_csv = self.get_path("comment_categories.csv")
+        classify.count_categories(classes_csv, stats_csv,
+                                  ["style", "testing"], categories_csv)
+        with open(categories_csv, newline="") as in_csv:
+            self.assertEqual(list(csv.reader(in_csv)), [
+                ["week", "style", "testing"], ["1", "0", "1"],
+                ["2", "1", "1"]])
+
+    def test_classify_new_comments(self):
+        """ Test to check that only comments with a new text are classified
+        again, until the model is retrained. """
+        training_file = self.write_csv(
+            "training_comments.csv",
+            [["comment", "category"]] + TRAINING_COMMENTS)
+        classify.train_model(training_file, self.model_dir)
+        header = ["comment_path", "created", "comment"]
+        rows = [["/a/b/pull/1#1", "2020-06-01T10:00:00Z", "Add a test."],
+                ["/a/b/pull/1#2", "2020-06-01T10:00:00Z", "nit: rename."]]
+        classes_csv = self.get_path("comment_classes.csv")
+
+        comments_file = self.write_csv("pr_comments.csv", [header] + rows)
+        cache = classify.classify_comments(comments_file, self.model_dir,
+                                           classes_csv, workers=1)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        comments_file = self.write_csv("pr_comments.csv", [header] + rows + [
+            ["/a/b/pull/2#1", "2020-06-02T10:00:00Z", "Add a test."],
+            ["/a/b/pull/2#2", "2020-06-02T10:00:00Z", "Please add tests."]])
+        cache = classify.classify_comments(comments_file, self.model_dir,
+                                           classes_csv, workers=1)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+        with open(classes_csv, newline="") as in_csv:
+            self.assertEqual([row["category"] for row in csv.DictReader(in_csv)],
+                             ["testing", "style", "testing", "testing"])
+
+        classify.train_model(self.write_csv(
+            "training_comments.csv",
+            [["comment", "category"]] + TRAINING_COMMENTS[:-2]),
+                             self.model_dir)
+        cache = classify.classify_comments(comments_file, self.model_dir,
+                                           classes_csv, workers=1)
+        self.assertEqual((cache.hits, cache.misses), (0, 4))
+
+    def test_classify_clusters(self):
+        """ Test to check that near-duplicate comments get the category of
+        the first comment of their cluster. """
+        training_file = self.write_csv(
+            "training_comments.csv",
+            [["comment", "category"]] + TRAINING_COMMENTS)
+        classify.train_model(training_file, self.model_dir)
+        comments_file = self.write_csv("pr_comments.csv", [
+            ["comment_path", "created", "comment"],
+            ["/a/b/pull/1#1", "2020-06-01T10:00:00Z", "nit: rename this."],
+            ["/a/b/pull/1#2", "2020-06-01T10:00:00Z", "Add a test."],
+            ["/a/c/pull/1#1", "2020-06-01T10:00:00Z", "nit: rename this"],
+            ["/a/d/pull/1#1", "2020-06-01T10:00:00Z", "nit: rename this."]
+        ])
+        clusters = {"/a/c/pull/1#1": "/a/b/pull/1#1",
+                    "/a/d/pull/1#1": "/a/b/pull/1#1"}
+
+        classes_csv = self.get_path("comment_classes.csv")
+        with patch("classify.CHUNK_SIZE", 1):
+            classify.classify_comments(comments_file, self.model_dir,
+                                       classes_csv, workers=2,
+                                       clusters=clusters)
+        with open(classes_csv, newline="") as in_csv:
+            self.assertEqual([row["category"] for row in csv.DictReader(in_csv)],
+                             ["style", "testing", "style", "style"])
+        cache = classify.LabelCache(
+            os.path.join(self.model_dir, classify.LABEL_CACHE_FILE),
+            classify.load_metadata(self.model_dir)["version"])
+        self.assertEqual(len(cache.lookup([
+            classify.get_label_key(text) for text in
+            ["nit: rename this.", "Add a test.", "nit: rename this"]])), 2)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
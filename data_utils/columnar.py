@@ -0,0 +1,188 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for writing and reading the datasets as Parquet files.
+
+The stages write CSVs, which they append to, merge and resume. With the
+--parquet flag, a stage also converts its finished CSV to a typed,
+compressed Parquet file next to it:
+    data/pr_comments.csv -> data/pr_comments.parquet
+
+Columns with few distinct values, such as authors and repository types,
+are dictionary-encoded. read_dataset() loads only the requested columns of
+a dataset, for analyses of large comment tables. The stages and the
+dashboard do not use it: the stages stream their CSVs row by row, and the
+dashboard reads small aggregate CSVs that it keeps in memory.
+"""
+
+import csv
+import os
+from datetime import datetime
+import pandas as pd
+from incremental import write_atomically
+
+try:
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+    import pyarrow.parquet as pyarrow_parquet
+except ImportError:
+    pyarrow = None
+
+PARQUET_FLAG = "--parquet"
+PARQUET_SUFFIX = ".parquet"
+PARQUET_COMPRESSION = "zstd"
+
+# Format of the columns of type "date", such as 6/15/2020.
+DATE_FORMAT = "%m/%d/%Y"
+
+# Bytes of CSV read per record batch, and so per Parquet row group.
+READ_BLOCK_SIZE = 1 << 24
+
+# Values that are written as null in the columns that are not strings.
+NULL_VALUES = ["", "unknown"]
+
+
+def get_parquet_path(csv_path):
+    """ Gets the path of the Parquet file of a CSV.
+
+    Args:
+        csv_path: The path of the CSV.
+
+    Returns:
+        str. The path with a .parquet extension.
+    """
+    return os.path.splitext(csv_path)[0] + PARQUET_SUFFIX
+
+
+def get_arrow_type(type_name):
+    """ Gets the Arrow type that a column is parsed as.
+
+    Args:
+        type_name: One of "string", "category", "int", "bool", "timestamp"
+            for ISO 8601 dates and times, or "date" for DATE_FORMAT dates.
+
+    Returns:
+        pyarrow.DataType. Categories and dates are parsed as strings and
+            converted afterwards.
+    """
+    return {
+        "string": pyarrow.string(),
+        "category": pyarrow.string(),
+        "int": pyarrow.int64(),
+        "bool": pyarrow.bool_(),
+        "timestamp": pyarrow.timestamp("s", tz="UTC"),
+        "date": pyarrow.string()
+    }[type_name]
+
+
+def parse_dates(column):
+    """ Converts a string column of DATE_FORMAT dates to dates.
+
+    Args:
+        column: pyarrow.Array of strings.
+
+    Returns:
+        pyarrow.Array of date32, with null for unknown dates.
+    """
+    dates = []
+    for value in column.to_pylist():
+        try:
+            dates.append(datetime.strptime(value, DATE_FORMAT).date())
+        except ValueError:
+            dates.append(None)
+    return pyarrow.array(dates, pyarrow.date32())
+
+
+def write_parquet(csv_path, column_types):
+    """ Converts a CSV to a Parquet file next to it.
+
+    The CSV is streamed one record batch at a time, so that large tables
+    are not loaded in memory.
+
+    Args:
+        csv_path: The path of the CSV.
+        column_types: Dictionary mapping column names to type names, from
+            get_arrow_type(). Other columns are strings.
+
+    Returns:
+        str. The path of the Parquet file.
+
+    Raises:
+        Exception: pyarrow is not installed.
+    """
+    if pyarrow is None:
+        raise Exception("pyarrow must be installed to write Parquet files.")
+    with open(csv_path, newline="") as in_csv:
+        header = next(csv.reader(in_csv))
+
+    types = {column: column_types.get(column, "string") for column in header}
+    reader = pyarrow_csv.open_csv(
+        csv_path,
+        read_options=pyarrow_csv.ReadOptions(block_size=READ_BLOCK_SIZE),
+        convert_options=pyarrow_csv.ConvertOptions(
+            column_types={column: get_arrow_type(type_name)
+                          for column, type_name in types.items()},
+            null_values=NULL_VALUES,
+            true_values=["True"],
+            false_values=["False"]))
+    categories = [column for column in header
+                  if types[column] == "category"]
+    schema = pyarrow.schema([
+        (field.name, {
+            "category": pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+            "date": pyarrow.date32()
+        }.get(types[field.name], field.type)) for field in reader.schema])
+
+    def write_batches(out_file):
+        with pyarrow_parquet.ParquetWriter(
+                out_file, schema, compression=PARQUET_COMPRESSION,
+                use_dictionary=categories) as writer:
+            for batch in reader:
+                columns = []
+                for index, column in enumerate(header):
+                    if types[column] == "category":
+                        columns.append(batch.column(index).dictionary_encode())
+                    elif types[column] == "date":
+                        columns.append(parse_dates(batch.column(index)))
+                    else:
+                        columns.append(batch.column(index))
+                writer.write_batch(
+                    pyarrow.RecordBatch.from_arrays(columns, schema=schema))
+
+    parquet_path = get_parquet_path(csv_path)
+    write_atomically(parquet_path, write_batches, binary=True)
+    return parquet_path
+
+
+def read_dataset(csv_path, columns=None):
+    """ Reads a dataset, from its Parquet file if it is up to date.
+
+    Only the requested columns are read from a Parquet file, and categories
+    are loaded as pandas categoricals.
+
+    Args:
+        csv_path: The path of the CSV of the dataset.
+        columns: List of the names of the columns to read. None to read
+            every column.
+
+    Returns:
+        pandas.DataFrame. The dataset.
+    """
+    parquet_path = get_parquet_path(csv_path)
+    if pyarrow is not None and os.path.isfile(parquet_path) and (
+            not os.path.isfile(csv_path) or
+            os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return pyarrow_parquet.read_table(
+            parquet_path, columns=columns).to_pandas()
+    return pd.read_csv(csv_path, usecols=columns)
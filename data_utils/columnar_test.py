@@ -0,0 +1,130 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the columnar module. """
+
+import csv
+import datetime
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+import pyarrow
+import pyarrow.parquet
+import columnar
+import pr_comments
+import pr_stats
+
+
+class ColumnarTest(unittest.TestCase):
+    """ Columnar test class. """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_csv(self, name, rows):
+        """ Writes a CSV in the temporary directory. """
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "w", newline="") as out_csv:
+            csv.writer(out_csv).writerows(rows)
+        return path
+
+    def test_write_comments(self):
+        """ Test to check the types of the comment columns and that only the
+        requested columns are read. """
+        csv_path = self.write_csv("pr_comments.csv", [
+            pr_comments.COMMENT_COLUMNS,
+            ["/a/b/pull/1#1", "2020-06-11T21:51:20Z", "host1", "unknown",
+             "starter", True],
+            ["/a/b/pull/1#2", "2020-06-12T08:00:00Z", "intern1", "1, 2",
+             "starter", False]
+        ])
+        parquet_path = columnar.write_parquet(csv_path,
+                                              pr_comments.COMMENT_TYPES)
+        self.assertEqual(parquet_path,
+                         os.path.join(self.temp_dir.name,
+                                      "pr_comments.parquet"))
+
+        schema = pyarrow.parquet.read_schema(parquet_path)
+        self.assertEqual(schema.field("author").type,
+                         pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+        self.assertEqual(schema.field("is_host").type, pyarrow.bool_())
+        # Parquet stores seconds as milliseconds.
+        self.assertEqual(schema.field("created").type,
+                         pyarrow.timestamp("ms", tz="UTC"))
+
+        comments = columnar.read_dataset(csv_path, ["comment", "is_host"])
+        self.assertEqual(list(comments.columns), ["comment", "is_host"])
+        self.assertEqual(comments["comment"].tolist(), ["unknown", "1, 2"])
+        self.assertEqual(comments["is_host"].tolist(), [True, False])
+
+    def test_write_stats(self):
+        """ Test to check that unknown weeks and start dates are null. """
+        csv_path = self.write_csv("pr_stats.csv", [
+            pr_stats.STATS_COLUMNS,
+            ["/a/b/pull/1", 1, "unknown", "unknown", "5/10/2020", 5, 1, 2],
+            ["/a/b/pull/2", 2, 5, "6/1/2020", "5/1/2020", 1, 0, 3]
+        ])
+        table = pyarrow.parquet.read_table(
+            columnar.write_parquet(csv_path, pr_stats.STATS_TYPES))
+        self.assertEqual(table.column("week").to_pylist(), [None, 5])
+        self.assertEqual(table.column("start_date").to_pylist(),
+                         [None, datetime.date(2020, 6, 1)])
+        self.assertEqual(table.column("created_date").to_pylist(),
+                         [datetime.date(2020, 5, 10),
+                          datetime.date(2020, 5, 1)])
+
+    def test_write_batches(self):
+        """ Test to check that a CSV read in several record batches, or with
+        no rows, is written whole. """
+        rows = [["team" + str(index % 3), str(index)] for index in range(200)]
+        csv_path = self.write_csv("teams.csv", [["team", "count"]] + rows)
+        with patch.object(columnar, "READ_BLOCK_SIZE", 256):
+            table = pyarrow.parquet.read_table(
+                columnar.write_parquet(csv_path, {"team": "category",
+                                                  "count": "int"}))
+        self.assertGreater(pyarrow.parquet.ParquetFile(
+            columnar.get_parquet_path(csv_path)).num_row_groups, 1)
+        self.assertEqual(table.column("team").to_pylist(),
+                         [row[0] for row in rows])
+        self.assertEqual(table.column("count").to_pylist(), list(range(200)))
+
+        csv_path = self.write_csv("teams.csv", [["team", "count"]])
+        table = pyarrow.parquet.read_table(
+            columnar.write_parquet(csv_path, {"team": "category",
+                                              "count": "int"}))
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.field("team").type,
+                         pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+
+    def test_read_stale_parquet(self):
+        """ Test to check that the CSV is read when it is newer than the
+        Parquet file. """
+        csv_path = self.write_csv("host_info.csv", [
+            ["username", "start_date", "team"], ["host1", "6/1/2020", "1"]])
+        columnar.write_parquet(csv_path, {"team": "category"})
+        modified = time.time() + 10
+        self.write_csv("host_info.csv", [
+            ["username", "start_date", "team"], ["host2", "6/1/2020", "2"]])
+        os.utime(csv_path, (modified, modified))
+        self.assertEqual(
+            columnar.read_dataset(csv_path)["username"].tolist(), ["host2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,42 +18,153 @@ import csv
 import os
 import random
 import sys
+from datetime import datetime
+from dedup import load_clusters
+from sampling import ReservoirSampler, StratifiedSampler
+
+# Number of host comments in the training dataset.
+TRAINING_SIZE = 200
+
+
+def get_week(row):
+    """ Gets the ISO year and week in which a comment was created.
+
+    Args:
+        row: The row of the comment in the comments CSV.
+
+    Returns:
+        str. The week, such as "2020-W24".
+    """
+    year, week, _ = datetime.fromisoformat(row["created"][:-1]).isocalendar()
+    return f"{year}-W{week:02}"
+
+
+# Functions that give the stratum of a comment row.
+STRATA = {
+    "repo_type": lambda row: row["repo_type"],
+    "author": lambda row: row["author"],
+    "week": get_week
+}
+
+
+def get_options(args):
+    """ Parses the options of the command line.
+
+    Args:
+        args: List of the command line arguments.
+
+    Returns:
+        Tuple with a dictionary mapping option names to values, for
+        arguments such as --seed=10, and the list of the other arguments.
+    """
+    options = {}
+    other_args = []
+    for arg in args:
+        if arg.startswith("--") and "=" in arg:
+            name, value = arg[2:].split("=", 1)
+            options[name] = value
+        else:
+            other_args.append(arg)
+    return options, other_args
+
+
+def sample_host_comments(comments_file, size, rand, stratify=None,
+                         allocation="proportional", clusters=None):
+    """ Samples host comments from a comments CSV in a single pass.
+
+    Only the sample is kept in memory, so the CSV can be of any size.
+
+    Args:
+        comments_file: CSV containing all code review comments.
+        size: The number of comments to sample.
+        rand: The random.Random used to draw the sample.
+        stratify: The name of a stratum in STRATA, or None for a uniform
+            sample.
+        allocation: How the sample is allocated to the strata, as in
+            sampling.StratifiedSampler.
+        clusters: Dictionary mapping comment paths to their near-duplicate
+            cluster, from dedup.load_clusters(), to only sample the first
+            host comment of each cluster. None to sample every comment.
+
+    Returns:
+        Tuple with the header and the list of sampled rows, in the order of
+        the CSV.
+    """
+    # pylint: disable=too-many-arguments
+    if stratify is None:
+        sampler = ReservoirSampler(size, rand)
+    elif stratify in STRATA:
+        sampler = StratifiedSampler(size, STRATA[stratify], rand, allocation)
+    else:
+        raise Exception(f"Unsupported stratum {stratify}.")
+
+    # The first comment of a cluster may be an intern's, so the clusters
+    # are tracked instead of only keeping their first comment.
+    sampled_clusters = set()
+    with open(comments_file, newline="") as in_csv:
+        reader = csv.DictReader(in_csv)
+        for row in reader:
+            if row["is_host"] != "True":
+                continue
+            if clusters is not None:
+                path = row["comment_path"]
+                cluster = clusters.get(path, path)
+                if cluster in sampled_clusters:
+                    continue
+                sampled_clusters.add(cluster)
+            sampler.add(row)
+    return reader.fieldnames, sampler.get_sample()
 
 
 def main():
     """" Creates training dataset with 200 host code review comments.
 
-    The 200 comments from hosts are selected at random.
+    The 200 comments from hosts are sampled at random, without replacement.
+    The sample can be changed with the following options:
+        --seed=<seed>: Seed of the sample. Without it, a random seed is
+            used, and printed so that the sample can be drawn again.
+        --size=<size>: Number of comments instead of 200.
+        --stratify=<repo_type|author|week>: Stratifies the sample.
+        --allocation=<proportional|equal>: Allocates the sample to strata
+            by their number of comments in expectation, by default, or
+            equally.
+    Near-duplicate comments are sampled once while the clusters of dedup.py
+    are up to date.
 
     Args:
         comments_file: CSV containing all code review comments.
     """
 
-    if len(sys.argv) == 1:
+    options, args = get_options(sys.argv[1:])
+    if not args:
         comments_file = "data/pr_comments.csv"
         training_file = "data/training_comments.csv"
+        clusters_csv = "data/comment_clusters.csv"
     else:
-        if sys.argv[1] == "test":
+        if args[0] == "test":
             comments_file = "data/test_pr_comments.csv"
             training_file = "data/test_training_comments.csv"
+            clusters_csv = "data/test_comment_clusters.csv"
         else:
             raise Exception("Invalid command line argument.")
 
     if not os.path.isfile(comments_file):
         raise Exception("The CSV for code review comments does not exist.")
 
-    # Uncomment if deterministic behavior is desired.
-    # random.seed(10)
-
-    with open(comments_file, newline="") as in_csv, \
-         open(training_file, "w", newline="") as out_csv:
-        reader = csv.reader(in_csv)
-        writer = csv.writer(out_csv)
-        headers = next(reader)
-        host_comments = [row for row in reader if row[5] == "True"]
-        num_comments = min(200, len(host_comments))
-        training_comments = random.choices(host_comments, k=num_comments)
-        writer.writerow(headers)
+    if "seed" in options:
+        seed = int(options["seed"])
+    else:
+        seed = random.randrange(2 ** 32)
+        print(f"Sampling with --seed={seed}.")
+
+    headers, training_comments = sample_host_comments(
+        comments_file, int(options.get("size", TRAINING_SIZE)),
+        random.Random(seed), options.get("stratify"),
+        options.get("allocation", "proportional"),
+        load_clusters(clusters_csv, comments_file))
+    with open(training_file, "w", newline="") as out_csv:
+        writer = csv.DictWriter(out_csv, headers)
+        writer.writeheader()
         writer.writerows(training_comments)
 
 
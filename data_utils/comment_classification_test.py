@@ -14,9 +14,12 @@
 
 """ Tests for the comment_classification module. """
 
+import collections
 import csv
 import os
+import random
 import sys
+import tempfile
 import unittest
 from unittest.mock import patch
 import comment_classification
@@ -66,5 +69,57 @@ class CommentClassTest(unittest.TestCase):
             self.assertEqual(num_rows, 3)
         os.remove(test_file_path)
 
+    def test_sample_host_comments(self):
+        """ Test to check that samples have no duplicates, are reproducible
+        and can be stratified. """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            comments_file = os.path.join(temp_dir, "pr_comments.csv")
+            with open(comments_file, "w", newline="") as test_csv:
+                writer = csv.writer(test_csv)
+                writer.writerow(["comment_path", "created", "author",
+                                 "comment", "repo_type", "is_host"])
+                for index in range(300):
+                    writer.writerow([
+                        f"path{index}", f"2020-06-{index % 28 + 1:02}T"
+                        "10:00:00Z", f"author{index % 3}", "comment",
+                        "capstone" if index % 4 else "starter",
+                        str(index % 2 == 0)])
+
+            header, sample = comment_classification.sample_host_comments(
+                comments_file, 20, random.Random(5))
+            self.assertEqual(header[0], "comment_path")
+            paths = [row["comment_path"] for row in sample]
+            self.assertEqual(len(set(paths)), 20)
+            self.assertTrue(all(row["is_host"] == "True" for row in sample))
+            _, same_sample = comment_classification.sample_host_comments(
+                comments_file, 20, random.Random(5))
+            self.assertEqual(same_sample, sample)
+
+            _, sample = comment_classification.sample_host_comments(
+                comments_file, 20, random.Random(5), "repo_type", "equal")
+            self.assertEqual(
+                collections.Counter(row["repo_type"] for row in sample),
+                {"starter": 10, "capstone": 10})
+            _, sample = comment_classification.sample_host_comments(
+                comments_file, 20, random.Random(5), "week")
+            self.assertEqual(len(sample), 20)
+
+            # Only the first comment of each cluster is sampled.
+            clusters = {f"path{index}": f"path{index % 10}"
+                        for index in range(300)}
+            _, sample = comment_classification.sample_host_comments(
+                comments_file, 20, random.Random(5), clusters=clusters)
+            self.assertEqual([row["comment_path"] for row in sample],
+                             ["path0", "path2", "path4", "path6", "path8"])
+
+            # Clusters whose first comment is an intern's keep their first
+            # host comment.
+            clusters = {f"path{index}": "path1" for index in range(1, 300)}
+            _, sample = comment_classification.sample_host_comments(
+                comments_file, 20, random.Random(5), clusters=clusters)
+            self.assertEqual([row["comment_path"] for row in sample],
+                             ["path0", "path2"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,122 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for running per-repository queries concurrently. """
+
+import asyncio
+import collections
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of queries in flight at once if RISR_CONCURRENCY is not set.
+DEFAULT_CONCURRENCY = 8
+
+
+def get_concurrency():
+    """ Gets the number of queries that may be in flight at once.
+
+    The limit can be changed with the following command:
+        $ export RISR_CONCURRENCY=16
+
+    Returns:
+        int. The concurrency limit.
+
+    Raises:
+        Exception: RISR_CONCURRENCY is not a positive integer.
+    """
+    concurrency = os.getenv("RISR_CONCURRENCY")
+    if concurrency is None:
+        return DEFAULT_CONCURRENCY
+    if not concurrency.isdigit() or int(concurrency) < 1:
+        raise Exception("RISR_CONCURRENCY must be a positive integer.")
+    return int(concurrency)
+
+
+async def fan_out(fetch, args_list, concurrency, executor=None):
+    """ Runs fetch for every set of arguments, several at a time.
+
+    At most concurrency calls are in flight at once. Results are yielded in
+    the same order as args_list, regardless of the order in which the calls
+    finish, so that the output of a crawl is deterministic.
+
+    Args:
+        fetch: Function that sends the query for one set of arguments. It may
+            be a coroutine function or a blocking function, which runs on the
+            executor.
+        args_list: Iterable of argument tuples for fetch.
+        concurrency: The maximum number of calls in flight at once.
+        executor: The concurrent.futures executor for blocking functions.
+
+    Yields:
+        The result of fetch for each set of arguments.
+    """
+    loop = asyncio.get_event_loop()
+    args_iter = iter(args_list)
+    window = collections.deque()
+
+    def submit():
+        for args in args_iter:
+            if asyncio.iscoroutinefunction(fetch):
+                window.append(loop.create_task(fetch(*args)))
+            else:
+                window.append(loop.run_in_executor(executor, fetch, *args))
+            return
+
+    for _ in range(concurrency):
+        submit()
+
+    try:
+        while window:
+            result = await window.popleft()
+            submit()
+            yield result
+    finally:
+        for future in window:
+            future.cancel()
+
+
+def crawl(fetch, args_list, concurrency=None):
+    """ Runs fetch for every set of arguments and yields results in order.
+
+    This is a blocking wrapper around fan_out for the data_utils scripts,
+    which process each result as soon as it and every result before it have
+    arrived.
+
+    Args:
+        fetch: Function that sends the query for one set of arguments.
+        args_list: Iterable of argument tuples for fetch.
+        concurrency: The maximum number of calls in flight at once. Read from
+            the RISR_CONCURRENCY environment variable if not given.
+
+    Yields:
+        The result of fetch for each set of arguments.
+    """
+    if concurrency is None:
+        concurrency = get_concurrency()
+
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    results = fan_out(fetch, args_list, concurrency, executor)
+    try:
+        asyncio.set_event_loop(loop)
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(results.aclose())
+        executor.shutdown(wait=True)
+        asyncio.set_event_loop(None)
+        loop.close()
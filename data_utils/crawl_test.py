@@ -0,0 +1,93 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the crawl module. """
+
+import asyncio
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+import crawl
+
+
+class CrawlTest(unittest.TestCase):
+    """ Crawl test class. """
+
+    def test_results_in_input_order(self):
+        """ Test to check that results keep the order of the arguments even
+        when later calls finish first. """
+        def fetch(index):
+            time.sleep(0.01 * (5 - index))
+            return index
+
+        args_list = [(index,) for index in range(6)]
+        self.assertEqual(list(crawl.crawl(fetch, args_list, 3)),
+                         list(range(6)))
+
+    def test_concurrency_limit(self):
+        """ Test to check that no more than the limit is in flight. """
+        lock = threading.Lock()
+        counts = {"in_flight": 0, "max_in_flight": 0}
+
+        def fetch(index):
+            with lock:
+                counts["in_flight"] += 1
+                counts["max_in_flight"] = max(counts["max_in_flight"],
+                                              counts["in_flight"])
+            time.sleep(0.01)
+            with lock:
+                counts["in_flight"] -= 1
+            return index
+
+        args_list = [(index,) for index in range(20)]
+        self.assertEqual(len(list(crawl.crawl(fetch, args_list, 4))), 20)
+        self.assertLessEqual(counts["max_in_flight"], 4)
+        self.assertGreater(counts["max_in_flight"], 1)
+
+    def test_coroutine_fetch(self):
+        """ Test to check that coroutine functions are awaited. """
+        async def fetch(name, owner):
+            await asyncio.sleep(0)
+            return f"{owner}/{name}"
+
+        args_list = [("risr", "googleinterns"), ("step", "googleinterns")]
+        self.assertEqual(list(crawl.crawl(fetch, args_list, 2)),
+                         ["googleinterns/risr", "googleinterns/step"])
+
+    def test_fetch_exception(self):
+        """ Test to check that errors in fetch are raised to the caller. """
+        def fetch(index):
+            if index == 2:
+                raise ValueError("test error")
+            return index
+
+        with self.assertRaises(ValueError):
+            list(crawl.crawl(fetch, [(index,) for index in range(5)], 2))
+
+    def test_get_concurrency(self):
+        """ Test to check the concurrency limit from the environment. """
+        with patch.dict(os.environ, {"RISR_CONCURRENCY": "16"}):
+            self.assertEqual(crawl.get_concurrency(), 16)
+        with patch.dict(os.environ, {"RISR_CONCURRENCY": "0"}):
+            with self.assertRaises(Exception):
+                crawl.get_concurrency()
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(crawl.get_concurrency(),
+                             crawl.DEFAULT_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for grouping near-duplicate code review comments.
+
+Comments such as "LGTM" and boilerplate review bodies repeat across many
+repositories. Each comment gets a MinHash signature of its character
+shingles, and locality-sensitive hashing of the signature bands finds the
+earlier comments that may be similar to it, without comparing every pair.
+
+A comment joins the cluster of the first candidate whose estimated Jaccard
+similarity reaches the threshold, and otherwise starts a new cluster. The
+cluster of a comment is the comment_path of its representative, which is
+the first comment of the cluster in the CSV.
+"""
+
+import csv
+import hashlib
+import os
+import sys
+import numpy as np
+from incremental import write_atomically
+
+# Number of bytes in a shingle.
+SHINGLE_SIZE = 5
+
+# Number of hash functions of a signature, split in bands of rows. Comments
+# with a similarity of 0.8 share a band with a probability above 0.999.
+NUM_PERM = 128
+BANDS = 32
+
+# Lowest estimated Jaccard similarity of near-duplicate comments.
+THRESHOLD = 0.8
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+# Columns of comment_clusters.csv.
+CLUSTER_COLUMNS = ["comment_path", "cluster"]
+
+
+def normalize(text):
+    """ Normalizes the case and whitespace of a comment.
+
+    Args:
+        text: A string containing the comment text.
+
+    Returns:
+        str. The lowercase text with single spaces between words.
+    """
+    return " ".join(text.lower().split())
+
+
+def get_shingles(text, size=SHINGLE_SIZE):
+    """ Gets the distinct shingles of a text.
+
+    Args:
+        text: A string containing the normalized text.
+        size: The number of bytes in a shingle. Shorter texts are a single
+            shingle.
+
+    Returns:
+        numpy array of the distinct shingles, as integers below
+        MERSENNE_PRIME.
+    """
+    data = np.frombuffer(text.encode(), dtype=np.uint8).astype(np.uint64)
+    if len(data) < size:
+        data = np.pad(data, (0, size - len(data)))
+    count = len(data) - size + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        shingles |= data[offset:offset + count] << np.uint64(8 * offset)
+    return np.unique(shingles % np.uint64(MERSENNE_PRIME))
+
+
+class MinHasher:
+    """ MinHash signatures with universal hash functions.
+
+    Attributes:
+        multipliers: numpy array of the multiplier of each hash function.
+        increments: numpy array of the increment of each hash function.
+    """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rand = np.random.default_rng(seed)
+        self.multipliers = rand.integers(1, MERSENNE_PRIME, num_perm,
+                                         dtype=np.uint64)
+        self.increments = rand.integers(0, MERSENNE_PRIME, num_perm,
+                                        dtype=np.uint64)
+
+    def get_signature(self, text):
+        """ Gets the MinHash signature of a text.
+
+        Args:
+            text: A string containing the normalized text.
+
+        Returns:
+            numpy array with the smallest hash of the shingles for each
+            hash function.
+        """
+        hashes = (np.outer(self.multipliers, get_shingles(text))
+                  + self.increments[:, np.newaxis]) % np.uint64(MERSENNE_PRIME)
+        return hashes.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """ LSH index of the representatives of the near-duplicate clusters.
+
+    Only representatives are indexed, so memory grows with the number of
+    clusters rather than with the number of comments.
+
+    Attributes:
+        hasher: The MinHasher of the signatures.
+        threshold: The lowest estimated Jaccard similarity of a cluster.
+        rows: The number of signature rows in a band.
+        buckets: List with a dictionary per band, mapping the band of a
+            signature to the list of representatives with that band.
+        signatures: Dictionary mapping representatives to their signature.
+        exact: Dictionary mapping the hash of normalized texts already seen
+            to their cluster.
+    """
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise Exception("The number of hash functions must be a multiple "
+                            "of the number of bands.")
+        self.hasher = MinHasher(num_perm)
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+        self.exact = {}
+
+    def add(self, key, text):
+        """ Adds a text to the cluster of its first near-duplicate.
+
+        Args:
+            key: The key of the text, such as its comment_path.
+            text: A string containing the text.
+
+        Returns:
+            The key of the representative of the cluster of the text, which
+            is key itself if the text starts a new cluster.
+        """
+        normalized = normalize(text)
+        digest = hashlib.sha256(normalized.encode()).digest()
+        if digest in self.exact:
+            return self.exact[digest]
+
+        signature = self.hasher.get_signature(normalized)
+        bands = [signature[start:start + self.rows].tobytes()
+                 for start in range(0, len(signature), self.rows)]
+        cluster = self.find_cluster(signature, bands)
+        if cluster is None:
+            cluster = key
+            self.signatures[key] = signature
+            for band, bucket in zip(bands, self.buckets):
+                bucket.setdefault(band, []).append(key)
+        self.exact[digest] = cluster
+        return cluster
+
+    def find_cluster(self, signature, bands):
+        """ Finds the first representative similar to a signature.
+
+        Args:
+            signature: The MinHash signature of the text.
+            bands: List of the bands of the signature, as bytes.
+
+        Returns:
+            The key of the representative, or None if there is none.
+        """
+        checked = set()
+        for band, bucket in zip(bands, self.buckets):
+            for candidate in bucket.get(band, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                similarity = np.mean(self.signatures[candidate] == signature)
+                if similarity >= self.threshold:
+                    return candidate
+        return None
+
+
+def cluster_comments(comments_file, out_csv, index=None):
+    """ Writes the near-duplicate cluster of every comment of a CSV.
+
+    Args:
+        comments_file: CSV containing all code review comments.
+        out_csv: The path of the CSV with the cluster of each comment.
+        index: The NearDuplicateIndex. Defaults to a new index.
+
+    Returns:
+        Tuple with the number of comments and the number of clusters.
+    """
+    index = index or NearDuplicateIndex()
+    counts = [0]
+
+    def write(out_file):
+        writer = csv.writer(out_file)
+        writer.writerow(CLUSTER_COLUMNS)
+        with open(comments_file, newline="") as in_csv:
+            for row in csv.DictReader(in_csv):
+                writer.writerow([row["comment_path"],
+                                 index.add(row["comment_path"],
+                                           row["comment"])])
+                counts[0] += 1
+
+    write_atomically(out_csv, write)
+    return counts[0], len(index.signatures)
+
+
+def load_clusters(clusters_csv, comments_file):
+    """ Loads the clusters of the comments, if they are up to date.
+
+    Args:
+        clusters_csv: The path of the CSV with the cluster of each comment.
+        comments_file: CSV containing all code review comments.
+
+    Returns:
+        Dictionary mapping the comment_path of each comment to its cluster,
+        or None if the clusters are missing or older than the comments.
+    """
+    if (not os.path.isfile(clusters_csv) or
+            os.path.getmtime(clusters_csv) < os.path.getmtime(comments_file)):
+        return None
+    with open(clusters_csv, newline="") as in_csv:
+        return {row["comment_path"]: row["cluster"]
+                for row in csv.DictReader(in_csv)}
+
+
+def main():
+    """ Groups the near-duplicate comments of pr_comments.csv.
+
+    Usage:
+        $ python3 dedup.py [test]
+
+    comment_clusters.csv has the following columns:
+        comment_path: The resource path to the comment.
+        cluster: The comment_path of the first comment of its cluster.
+
+    While comment_clusters.csv is up to date, comment_classification.py only
+    samples the first comment of each cluster, and classify.py classifies it
+    in place of the other comments of its cluster.
+    """
+    if len(sys.argv) == 1:
+        prefix = "data/"
+    elif sys.argv[1] == "test":
+        prefix = "data/test_"
+    else:
+        raise Exception("Invalid command line argument.")
+
+    comments_file = prefix + "pr_comments.csv"
+    if not os.path.isfile(comments_file):
+        raise Exception("The CSV for code review comments does not exist.")
+    comments, clusters = cluster_comments(
+        comments_file, prefix + "comment_clusters.csv")
+    print(f"Grouped {comments} comments into {clusters} clusters.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the dedup module. """
+
+import csv
+import os
+import tempfile
+import unittest
+import dedup
+
+
+class DedupTest(unittest.TestCase):
+    """ Dedup test class. """
+
+    def test_near_duplicates(self):
+        """ Test to check that near-identical texts join the cluster of the
+        first one, and that other texts start their own cluster. """
+        index = dedup.NearDuplicateIndex()
+        self.assertEqual(index.add("a", "LGTM"), "a")
+        self.assertEqual(index.add("b", "lgtm "), "a")
+        self.assertEqual(
+            index.add("c", "nit: please rename this variable to something "
+                      "more descriptive."), "c")
+        self.assertEqual(
+            index.add("d", "Nit: please rename this variable to something "
+                      "more  descriptive"), "c")
+        self.assertEqual(
+            index.add("e", "Could you add a unit test for the empty list?"),
+            "e")
+        self.assertEqual(index.add("f", "nit: fix the indentation."), "f")
+        self.assertEqual(sorted(index.signatures), ["a", "c", "e", "f"])
+
+        with self.assertRaises(Exception):
+            dedup.NearDuplicateIndex(num_perm=100, bands=32)
+
+    def test_cluster_comments(self):
+        """ Test to check that the cluster of every comment is written, and
+        only loaded while it is up to date. """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            comments_file = os.path.join(temp_dir, "pr_comments.csv")
+            clusters_csv = os.path.join(temp_dir, "comment_clusters.csv")
+            with open(comments_file, "w", newline="") as out_csv:
+                csv.writer(out_csv).writerows([
+                    ["comment_path", "comment"],
+                    ["/a/b/pull/1#1", "Looks good to me, thanks!"],
+                    ["/a/b/pull/1#2", "Add a test."],
+                    ["/a/c/pull/1#1", "Looks good to me, thanks"]
+                ])
+            self.assertEqual(
+                dedup.cluster_comments(comments_file, clusters_csv), (3, 2))
+            clusters = {"/a/b/pull/1#1": "/a/b/pull/1#1",
+                        "/a/b/pull/1#2": "/a/b/pull/1#2",
+                        "/a/c/pull/1#1": "/a/b/pull/1#1"}
+            self.assertEqual(
+                dedup.load_clusters(clusters_csv, comments_file), clusters)
+
+            stat = os.stat(comments_file)
+            os.utime(clusters_csv, (stat.st_atime, stat.st_mtime - 10))
+            self.assertIsNone(dedup.load_clusters(clusters_csv,
+                                                  comments_file))
+            os.remove(clusters_csv)
+            self.assertIsNone(dedup.load_clusters(clusters_csv,
+                                                  comments_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for extracting every pull request dataset with a single crawl.
+
+The pull request statistics, comments and reviewers are all read from the
+pull requests of the same repositories. Instead of crawling them three
+times, one query asks for the union of the fields of the three stages, and
+each repository response is passed to the sink of every stage.
+"""
+
+import csv
+import os
+import sys
+import host
+import pr_comments
+import pr_stats
+from batch import fetch_repositories
+from columnar import PARQUET_FLAG, write_parquet
+from lake import get_results, skip_missing
+from pagination import Connection
+from query import enable_cache
+from transform import run_transform
+
+# Paginated connections of a repository with the fields of the pull request
+# statistics, comments and reviewers. The total count of each connection
+# stands in for the comment counts of the statistics query, and the timeline
+# has the items of both the statistics and reviewers queries.
+UNIFIED_CONNECTIONS = [
+    Connection("pullRequests", "PullRequest", 20,
+               "updatedAt" + pr_stats.PULL_REQUEST_FIELDS, [
+                   Connection("participants", "User", 10, "login"),
+                   *pr_comments.PULL_REQUEST_CONNECTIONS,
+                   Connection(
+                       "timelineItems", "PullRequestTimelineItems", 100,
+                       host.REVIEWER_FIELDS + pr_stats.REVIEW_STATE_FIELDS,
+                       args=host.REVIEWER_ITEM_TYPES)
+               ], args=pr_comments.PULL_REQUEST_ORDER)
+]
+
+
+def get_all_pull_requests(repos):
+    """ Gets the pull requests of many repositories with the fields of every
+    stage.
+
+    Args:
+        repos: List of (name, owner) tuples.
+
+    Returns:
+        Iterator over the JSON objects with the pull requests of each
+        repository, in the order of repos.
+    """
+    return fetch_repositories("nameWithOwner", repos, UNIFIED_CONNECTIONS)
+
+
+def sort_pull_requests(result):
+    """ Sorts the pull requests of query results by creation date.
+
+    The unified query asks for the most recently updated pull requests
+    first, as pr_comments.py does, but the start date of a repository is
+    found at its first pull request with a known host, so the statistics
+    need the creation order of pr_stats.py.
+
+    Args:
+        result: The query results of a repository.
+
+    Returns:
+        The query results with the pull requests in creation order.
+    """
+    try:
+        repository = result["data"]["repository"]
+        pull_requests = sorted(repository["pullRequests"]["nodes"],
+                               key=lambda node: node["createdAt"])
+    except (KeyError, TypeError):
+        return result
+    return {"data": {"repository": dict(repository, pullRequests=dict(
+        repository["pullRequests"], nodes=pull_requests))}}
+
+
+def make_stats_sink(writer, host_dict, repo_dates):
+    """ Creates a sink that records the statistics of each repository in
+    the order of pr_stats.py.
+
+    Args:
+        writer: CSV writer to record the data in a CSV file.
+        host_dict: dictionary with host logins as keys and start dates as
+                   values.
+        repo_dates: dictionary mapping repositories to start dates.
+
+    Returns:
+        Function that takes a repository CSV row and the query results of
+        the repository.
+    """
+    stats_sink = pr_stats.make_stats_sink(writer, host_dict, repo_dates)
+
+    def sink(row, result):
+        stats_sink(row, sort_pull_requests(result))
+    return sink
+
+
+def run_sinks(rows, results, sinks):
+    """ Passes the results of each repository to every sink.
+
+    Args:
+        rows: List of the repository rows from the repositories CSV.
+        results: Iterable with the query results of each repository, in the
+            order of rows.
+        sinks: List of functions that take a repository row and its query
+            results.
+    """
+    for row, result in zip(rows, results):
+        for sink in sinks:
+            sink(row, result)
+
+
+def get_host_information(host_csv):
+    """ Loads the known hosts with their start date and team.
+
+    Args:
+        host_csv: The path of the host information CSV.
+
+    Returns:
+        Dictionary with host logins as keys and [start date, team] lists as
+        values.
+    """
+    with open(host_csv, newline="") as in_csv:
+        return {row["username"]: [row["start_date"], row["team"]]
+                for row in csv.DictReader(in_csv)}
+
+
+def main():
+    """ Extracts the pull request statistics, comments and reviewers.
+
+    The output is the same as the one of pr_stats.py and pr_comments.py, and
+    the reviewers that host.py would add to the known hosts are written to
+    reviewer_candidates.csv, which has the columns of host_info.csv.
+
+    With the --from-lake flag, every CSV is rebuilt from the latest
+    responses in the response lake, without sending any query:
+        $ python3 extract.py --from-lake
+
+    With the --parquet flag, every CSV is also converted to Parquet.
+    """
+    # pylint: disable=too-many-locals
+    from_lake = "--from-lake" in sys.argv
+    parquet = PARQUET_FLAG in sys.argv
+    args = [arg for arg in sys.argv[1:]
+            if arg not in ("--from-lake", PARQUET_FLAG)]
+
+    # If no extra arguments are given, then extract from all repositories.
+    if not args:
+        prefix = "data/"
+    elif args[0] == "test":
+        prefix = "data/test_"
+    else:
+        raise Exception(f"Unsupported mode {args[0]}.")
+
+    repo_csv = prefix + "repos.csv"
+    host_csv = prefix + "host_info.csv"
+    if not os.path.isfile(repo_csv):
+        raise Exception("The CSV for repositories does not exist.")
+
+    cache = enable_cache("extract")
+
+    with open(repo_csv, newline="") as in_csv:
+        rows = list(csv.DictReader(in_csv))
+    known_hosts = get_host_information(host_csv)
+    reviewers = dict(known_hosts)
+    intern_usernames = set()
+    host.get_interns_from_repos_csv(repo_csv, intern_usernames)
+
+    start_dates = {login: info[0] for login, info in known_hosts.items()}
+    reviewer_sink = host.make_reviewer_sink(reviewers, intern_usernames)
+    repos = [(row["name"], row["owner"]) for row in rows]
+    if from_lake:
+        # Statistics and comments only depend on their own repository, so
+        # they are computed in parallel. Reviewers found in a repository
+        # depend on the ones found before, so they are found in order.
+        run_transform("extract", rows, [
+            (prefix + "pr_stats.csv", pr_stats.STATS_COLUMNS,
+             make_stats_sink, (start_dates, dict())),
+            (prefix + "pr_comments.csv", pr_comments.COMMENT_COLUMNS,
+             pr_comments.make_comment_sink, (set(known_hosts),))
+        ])
+        for row, result in skip_missing(
+                "extract", rows, get_results("extract", repos,
+                                             get_all_pull_requests,
+                                             from_lake=True)):
+            reviewer_sink(row, result)
+    else:
+        with open(prefix + "pr_stats.csv", "w", newline="") as stats_csv, \
+                open(prefix + "pr_comments.csv", "w",
+                     newline="") as comment_csv:
+            stats_writer = csv.writer(stats_csv)
+            stats_writer.writerow(pr_stats.STATS_COLUMNS)
+            comment_writer = csv.writer(comment_csv)
+            comment_writer.writerow(pr_comments.COMMENT_COLUMNS)
+            sinks = [
+                make_stats_sink(stats_writer, start_dates, dict()),
+                pr_comments.make_comment_sink(comment_writer,
+                                              set(known_hosts)),
+                reviewer_sink
+            ]
+            run_sinks(rows, get_results("extract", repos,
+                                        get_all_pull_requests), sinks)
+
+    host.write_host_information(
+        prefix + "reviewer_candidates.csv",
+        {login: info for login, info in reviewers.items()
+         if login not in known_hosts})
+    if parquet:
+        write_parquet(prefix + "pr_stats.csv", pr_stats.STATS_TYPES)
+        write_parquet(prefix + "pr_comments.csv", pr_comments.COMMENT_TYPES)
+        write_parquet(prefix + "reviewer_candidates.csv", host.HOST_TYPES)
+
+    if cache:
+        print(cache.report())
+
+
+if __name__ == "__main__":
+    main()
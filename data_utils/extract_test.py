@@ -0,0 +1,216 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the extract module. """
+
+import csv
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import extract
+import pr_stats
+from pagination import render_fields
+
+
+def make_comment(path, login, body="comment"):
+    """ Creates a comment node of the unified query. """
+    return {
+        "resourcePath": path,
+        "body": body,
+        "createdAt": "2020-06-11T21:51:20Z",
+        "author": {"login": login}
+    }
+
+
+def make_pull_request(number, created_at):
+    """ Creates a pull request node of the unified query. """
+    path = f"/googleinterns/risr/pull/{number}"
+    return {
+        "updatedAt": created_at,
+        "resourcePath": path,
+        "number": number,
+        "createdAt": created_at,
+        "closedAt": None,
+        "deletions": 1,
+        "additions": 2,
+        "participants": {"totalCount": 1, "nodes": [{"login": "intern1"}]},
+        "comments": {
+            "totalCount": 1,
+            "nodes": [make_comment(f"{path}#issuecomment", "host1")]
+        },
+        "reviews": {
+            "totalCount": 1,
+            "nodes": [dict(
+                make_comment(f"{path}#review", "reviewer"),
+                comments={
+                    "totalCount": 2,
+                    "nodes": [
+                        make_comment(f"{path}#discussion1", "reviewer"),
+                        make_comment(f"{path}#discussion2", "intern1", "")
+                    ]
+                })]
+        },
+        "timelineItems": {
+            "totalCount": 2,
+            "nodes": [
+                {"requestedReviewer": {"login": "reviewer"}},
+                {"state": "APPROVED", "author": {"login": "reviewer"}}
+            ]
+        }
+    }
+
+
+class ExtractTest(unittest.TestCase):
+    """ Extract test class. """
+
+    def test_unified_query(self):
+        """ Test to check that the unified query has the fields of every
+        stage. """
+        selection = render_fields("nameWithOwner",
+                                  extract.UNIFIED_CONNECTIONS)
+        for field in ["participants", "timelineItems", "requestedReviewer",
+                      "state", "deletions", "resourcePath", "totalCount"]:
+            self.assertIn(field, selection)
+
+    @patch("extract.get_all_pull_requests")
+    def test_main(self, mock_results):
+        """ Test to check that one crawl gives the statistics, comments and
+        reviewer candidates. """
+        pull_requests = [make_pull_request(number, f"2020-06-{number:02}T"
+                                                   "00:00:00Z")
+                         for number in range(7, 0, -1)]
+        # Only the first pull requests are used to find reviewers.
+        pull_requests[0]["timelineItems"]["nodes"].append(
+            {"requestedReviewer": {"login": "late-reviewer"}})
+        mock_results.return_value = [{
+            "data": {
+                "repository": {
+                    "nameWithOwner": "googleinterns/risr",
+                    "pullRequests": {"nodes": pull_requests}
+                }
+            }
+        }]
+
+        paths = ["data/test_pr_stats.csv", "data/test_pr_comments.csv",
+                 "data/test_reviewer_candidates.csv"]
+        sys.argv = ["extract.py", "test"]
+        extract.main()
+        try:
+            with open(paths[0], newline="") as in_csv:
+                stats = list(csv.DictReader(in_csv))
+            with open(paths[1], newline="") as in_csv:
+                comments = list(csv.DictReader(in_csv))
+            with open(paths[2], newline="") as in_csv:
+                candidates = list(csv.DictReader(in_csv))
+        finally:
+            for path in paths:
+                os.remove(path)
+
+        self.assertEqual(mock_results.call_count, 1)
+        self.assertEqual(len(stats), 7)
+        self.assertEqual(stats[0]["total_comments"], "4")
+        self.assertEqual(stats[0]["review_count"], "1")
+        self.assertEqual(len(comments), 21)
+        self.assertEqual(
+            [row["is_host"] for row in comments[:3]],
+            ["True", "False", "False"])
+        self.assertEqual([row["username"] for row in candidates],
+                         ["reviewer"])
+
+    @patch("extract.get_all_pull_requests")
+    def test_from_lake(self, mock_results):
+        """ Test to check that the CSVs are rebuilt from the response lake
+        without any query. """
+        mock_results.return_value = [{
+            "data": {
+                "repository": {
+                    "nameWithOwner": "googleinterns/risr",
+                    "pullRequests": {"nodes": [
+                        make_pull_request(1, "2020-06-01T00:00:00Z")
+                    ]}
+                }
+            }
+        }]
+        paths = ["data/test_pr_stats.csv", "data/test_pr_comments.csv",
+                 "data/test_reviewer_candidates.csv"]
+        outputs = []
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                patch.dict(os.environ, {"RISR_LAKE_DIR": temp_dir}):
+            for argv in [["extract.py", "test"],
+                         ["extract.py", "--from-lake", "test"]]:
+                sys.argv = argv
+                extract.main()
+                contents = []
+                for path in paths:
+                    with open(path) as in_file:
+                        contents.append(in_file.read())
+                    os.remove(path)
+                outputs.append(contents)
+        self.assertEqual(mock_results.call_count, 1)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn("/googleinterns/risr/pull/1", outputs[1][0])
+
+    @patch("pr_stats.get_all_pr_stats")
+    @patch("pr_stats.get_host_start_dates")
+    @patch("extract.get_host_information")
+    @patch("extract.get_all_pull_requests")
+    def test_same_stats(self, mock_results, mock_hosts, mock_start_dates,
+                        mock_stats):
+        """ Test to check that the statistics match the ones of pr_stats.py
+        when a pull request comes before the first host participant. """
+        mock_hosts.return_value = {"host1": ["6/1/2020", "team1"]}
+        mock_start_dates.return_value = {"host1": "6/1/2020"}
+        first = make_pull_request(1, "2020-06-01T00:00:00Z")
+        second = make_pull_request(2, "2020-06-09T00:00:00Z")
+        second["participants"]["nodes"].append({"login": "host1"})
+        # The unified query gives the most recently updated first.
+        first["updatedAt"] = "2020-06-10T00:00:00Z"
+        second["updatedAt"] = "2020-06-20T00:00:00Z"
+
+        def make_result(pull_requests):
+            return [{
+                "data": {
+                    "repository": {
+                        "nameWithOwner": "googleinterns/risr",
+                        "pullRequests": {"nodes": pull_requests}
+                    }
+                }
+            }]
+        mock_results.return_value = make_result([second, first])
+        mock_stats.return_value = make_result([first, second])
+
+        stats_csv = "data/test_pr_stats.csv"
+        outputs = []
+        try:
+            for module, argv in [(extract, ["extract.py", "test"]),
+                                 (pr_stats, ["pr_stats.py", "test"])]:
+                sys.argv = argv
+                module.main()
+                with open(stats_csv, newline="") as in_csv:
+                    outputs.append(list(csv.DictReader(in_csv)))
+        finally:
+            for path in [stats_csv, "data/test_pr_comments.csv",
+                         "data/test_reviewer_candidates.csv"]:
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual([row["week"] for row in outputs[0]],
+                         ["unknown", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
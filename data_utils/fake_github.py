@@ -0,0 +1,120 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module with a local stand-in for the Github GraphQL API.
+
+The stand-in server is used by tests and benchmarks so that the query client
+can be exercised without a network connection or a Github Personal Access
+Token.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_response(query, headers):
+    """ Answers every query with an empty successful result.
+
+    Args:
+        query: A string containing the query.
+        headers: The request headers.
+
+    Returns:
+        Tuple with the status code, response headers and JSON body.
+    """
+    # pylint: disable=unused-argument
+    return 200, {}, {"data": {}}
+
+
+class FakeGithubServer:
+    """ Local HTTP server that answers GraphQL queries.
+
+    Attributes:
+        respond: Function that takes the query string and the request headers
+            and returns a tuple with the status code, response headers and
+            JSON body.
+        connections: The number of TCP connections accepted so far.
+        requests: The number of requests answered so far.
+    """
+
+    def __init__(self, respond=default_response):
+        self.respond = respond
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                           self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """ The URL of the GraphQL endpoint. """
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/graphql"
+
+    def start(self):
+        """ Starts serving requests in a background thread. """
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops the server and closes the listening socket. """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _make_handler(self):
+        """ Creates the request handler class bound to this server. """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """ Handles GraphQL POST requests with keep-alive support. """
+
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:  # pylint: disable=protected-access
+                    server.connections += 1
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """ Answers a single GraphQL request. """
+                length = int(self.headers.get("Content-Length", 0))
+                query = json.loads(self.rfile.read(length))["query"]
+                with server._lock:  # pylint: disable=protected-access
+                    server.requests += 1
+                status, headers, body = server.respond(query, self.headers)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, str(value))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
@@ -19,7 +19,51 @@ import csv
 import os
 import sys
 from datetime import datetime
-from query import run_query
+from batch import fetch_repository, fetch_repositories
+from checkpoint import Checkpoint, run_with_checkpoint
+from columnar import PARQUET_FLAG, write_parquet
+from pagination import Connection
+from query import enable_cache
+
+
+# Types of the columns of host_info.parquet. Other columns are strings.
+HOST_TYPES = {"team": "category"}
+
+# Number of pull requests of a repository, from the first one, in which
+# reviewers are looked for.
+REVIEWED_PR_COUNT = 5
+
+# Fields of the pull request timeline items that name a reviewer.
+REVIEWER_FIELDS = """
+... on ReviewRequestedEvent {
+    requestedReviewer {
+        ... on User {
+            login
+        }
+    }
+}
+... on PullRequestReview {
+    author {
+        login
+    }
+}
+"""
+
+# Types of the timeline items that name a reviewer.
+REVIEWER_ITEM_TYPES = "itemTypes: [REVIEW_REQUESTED_EVENT, PULL_REQUEST_REVIEW]"
+
+# Paginated connections of a repository needed to find the pull request
+# reviewers. Only the first pull requests are used, but their whole timeline
+# is followed.
+PR_REVIEWERS_CONNECTIONS = [
+    Connection("pullRequests", "PullRequest", REVIEWED_PR_COUNT, """
+        createdAt
+        resourcePath
+    """, [
+        Connection("timelineItems", "PullRequestTimelineItems", 100,
+                   REVIEWER_FIELDS, args=REVIEWER_ITEM_TYPES)
+    ], follow=False)
+]
 
 
 def get_pr_reviewers(name, owner):
@@ -37,34 +81,23 @@ def get_pr_reviewers(name, owner):
         A JSON object with the pull request reviewer information.
     """
 
-    query = f"""{{
-        repository(name: "{name}", owner: "{owner}") {{
-            pullRequests(first: 5) {{
-                nodes {{
-                    createdAt
-                    resourcePath
-                    timelineItems(first: 100) {{
-                        nodes {{
-                            ... on ReviewRequestedEvent {{
-                                requestedReviewer {{
-                                    ... on User {{
-                                        login
-                                    }}
-                                }}
-                            }}
-                            ... on PullRequestReview {{
-                                author {{
-                                    login
-                                }}
-                            }}
-                        }}
-                    }}
-                }}
-            }}
-        }}
-    }}"""
-
-    return run_query(query)
+    return fetch_repository("", name, owner, PR_REVIEWERS_CONNECTIONS)
+
+
+def get_all_pr_reviewers(repos):
+    """ Gets the reviewer usernames from many repositories.
+
+    Several repositories are fetched with each query, and the queries are
+    sent concurrently.
+
+    Args:
+        repos: List of (name, owner) tuples.
+
+    Returns:
+        Iterator over the JSON objects with the reviewer usernames
+        information of each repository, in the order of repos.
+    """
+    return fetch_repositories("", repos, PR_REVIEWERS_CONNECTIONS)
 
 
 def process_reviewer_query_results(result, host_dict, intern_usernames):
@@ -168,7 +201,8 @@ def get_interns_from_repos_csv(repos_file, intern_usernames):
             intern_usernames.add(row["owner"])
 
 
-def get_hosts_from_pr_reviews(repos_file, host_dict, intern_usernames):
+def get_hosts_from_pr_reviews(repos_file, host_dict, intern_usernames,
+                              from_lake=False, checkpoint_json=None):
     """ Gets host username based on pull request reviewers.
 
     Only checks starter project repositories because the capstone projects
@@ -183,21 +217,73 @@ def get_hosts_from_pr_reviews(repos_file, host_dict, intern_usernames):
         repos_file: File name for the repository CSV.
         host_dict: Dictionary to be updated with host information.
         intern_usernames: Set containing intern usernames.
+        from_lake: Whether to read the pull requests from the response lake
+            instead of sending queries.
+        checkpoint_json: The path of the checkpoint of the hosts found so
+            far, or None to not resume a failed run.
     """
     with open(repos_file, newline="") as in_csv:
-        reader = csv.DictReader(in_csv)
-        for row in reader:
-            if row["repo_type"] == "capstone":
-                continue
-            # Ignore repositories made in the googleinterns organization.
-            if row["owner"] == "googleinterns" and row["repo_type"] != "test":
-                continue
-            query_results = get_pr_reviewers(row["name"], row["owner"])
-            process_reviewer_query_results(
-                query_results,
-                host_dict,
-                intern_usernames
-            )
+        rows = [row for row in csv.DictReader(in_csv)
+                if should_check_reviewers(row)]
+
+    checkpoint = Checkpoint(checkpoint_json)
+    # Hosts found before a failure are restored in the order they were
+    # found, after the hosts from the STEP teams CSV.
+    host_dict.update(checkpoint.state.get("hosts", {}))
+    checkpoint.state["hosts"] = host_dict
+    run_with_checkpoint(checkpoint, "host", rows, get_all_pr_reviewers,
+                        make_reviewer_sink(host_dict, intern_usernames),
+                        from_lake)
+
+
+def should_check_reviewers(row):
+    """ Checks if the reviewers of a repository may be hosts.
+
+    Args:
+        row: The row of the repository in the repository CSV.
+
+    Returns:
+        bool. False for capstone repositories and for repositories made in
+            the googleinterns organization.
+    """
+    if row["repo_type"] == "capstone":
+        return False
+    return row["owner"] != "googleinterns" or row["repo_type"] == "test"
+
+
+def make_reviewer_sink(host_dict, intern_usernames):
+    """ Creates a sink that looks for hosts among the reviewers.
+
+    Only the first REVIEWED_PR_COUNT pull requests of a repository are
+    used, so the sink gives the same hosts for results with every pull
+    request of a repository.
+
+    Args:
+        host_dict: Dictionary to be updated with host information.
+        intern_usernames: Set containing intern usernames.
+
+    Returns:
+        Function that takes a repository CSV row and the query results of
+        the repository.
+    """
+    def sink(row, result):
+        if not should_check_reviewers(row):
+            return
+        try:
+            repository = result["data"]["repository"]
+            pull_requests = sorted(repository["pullRequests"]["nodes"],
+                                   key=lambda node: node["createdAt"])
+        except (KeyError, TypeError):
+            process_reviewer_query_results(result, host_dict,
+                                           intern_usernames)
+            return
+        first_pull_requests = dict(repository, pullRequests={
+            "nodes": pull_requests[:REVIEWED_PR_COUNT]})
+        process_reviewer_query_results(
+            {"data": {"repository": first_pull_requests}},
+            host_dict,
+            intern_usernames)
+    return sink
 
 
 def write_host_information(hosts_file, host_dict):
@@ -223,18 +309,33 @@ def main():
 
     host_info.csv is created to store the host usernames, intern start
     date, and team number from the STEP teams CSV.
+
+    The hosts found in the reviews of each repository are committed to a
+    checkpoint, so a run that fails resumes after the last completed
+    repository.
+
+    With the --from-lake flag, the pull request reviews are read from the
+    latest responses in the response lake, without sending any query.
+
+    With the --parquet flag, the CSV is also converted to host_info.parquet.
     """
 
+    from_lake = "--from-lake" in sys.argv
+    parquet = PARQUET_FLAG in sys.argv
+    args = [arg for arg in sys.argv[1:]
+            if arg not in ("--from-lake", PARQUET_FLAG)]
     try:
-        teams_file = sys.argv[1]
+        teams_file = args[0]
     except:
-        raise Exception("Usage: host.py <STEP teams CSV>")
+        raise Exception(
+            "Usage: host.py [--from-lake] [--parquet] <STEP teams CSV>")
 
     if not os.path.isfile(teams_file):
         raise Exception("The CSV for the Github usernames does not exist.")
 
     repos_file = "data/repos.csv"
     hosts_file = "data/host_info.csv"
+    checkpoint_json = "data/host_checkpoint.json"
 
     host_dict = dict()
     get_hosts_from_teams_csv(teams_file, host_dict)
@@ -242,9 +343,15 @@ def main():
     intern_usernames = set()
     get_interns_from_repos_csv(repos_file, intern_usernames)
 
-    get_hosts_from_pr_reviews(repos_file, host_dict, intern_usernames)
+    cache = enable_cache("host")
+    get_hosts_from_pr_reviews(repos_file, host_dict, intern_usernames,
+                              from_lake, checkpoint_json)
+    if cache:
+        print(cache.report())
 
     write_host_information(hosts_file, host_dict)
+    if parquet:
+        write_parquet(hosts_file, HOST_TYPES)
 
 
 if __name__ == "__main__":
@@ -77,12 +77,12 @@ class HostTest(unittest.TestCase):
         host.get_interns_from_repos_csv(repos_file, intern_usernames)
         self.assertSetEqual(intern_usernames, correct_set)
 
-    @patch("host.get_pr_reviewers")
+    @patch("host.get_all_pr_reviewers")
     def test_get_hosts_from_pr_reviews(self, mock_results):
         """ Test that method gets hosts from pull request reviews. """
 
         # Mock results to test all the supported query result cases.
-        mock_results.return_value = {
+        mock_results.return_value = [{
             "data": {
                 "repository": {
                     "pullRequests": {
@@ -126,7 +126,7 @@ class HostTest(unittest.TestCase):
                     }
                 }
             }
-        }
+        }]
 
         repos_file = "data/test_repos.csv"
         host_dict = {
@@ -0,0 +1,175 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for updating datasets incrementally between runs. """
+
+import collections
+import csv
+import itertools
+import json
+import os
+import tempfile
+
+
+def write_atomically(path, write, binary=False):
+    """ Writes a file so that readers never see it partially written.
+
+    The file is written to a temporary file in the same directory, which
+    then replaces path.
+
+    Args:
+        path: The path of the file.
+        write: Function that writes the contents to an open text file.
+        binary: Whether to open the file in binary mode instead.
+    """
+    directory = os.path.dirname(path) or "."
+    file_handle, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(file_handle, "wb" if binary else "w",
+                       newline=None if binary else "") as out_file:
+            write(out_file)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class WatermarkStore:
+    """ Latest value seen for each key, such as a repository, kept on disk.
+
+    Values are ISO 8601 dates from Github, which sort in time order as
+    strings, so a watermark only ever moves forward.
+
+    Attributes:
+        path: The path of the JSON file with the watermarks.
+        watermarks: Dictionary mapping keys to their watermark.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.watermarks = {}
+        if os.path.isfile(path):
+            with open(path) as in_file:
+                self.watermarks = json.load(in_file)
+
+    def get(self, key):
+        """ Gets the watermark of a key.
+
+        Args:
+            key: A string such as "owner/name".
+
+        Returns:
+            str. The watermark, or "" if the key was never seen, which sorts
+                before every date.
+        """
+        return self.watermarks.get(key, "")
+
+    def update(self, key, value):
+        """ Moves the watermark of a key forward.
+
+        Args:
+            key: A string such as "owner/name".
+            value: The newly seen value. Values older than the current
+                watermark are ignored.
+        """
+        if value and value > self.get(key):
+            self.watermarks[key] = value
+
+    def save(self):
+        """ Writes the watermarks to disk. """
+        write_atomically(self.path, lambda out_file: json.dump(
+            self.watermarks, out_file, indent=2, sort_keys=True))
+
+
+class RowBuffer:  # pylint: disable=too-few-public-methods
+    """ CSV writer stand-in that keeps the written rows in memory.
+
+    Attributes:
+        rows: List of the rows written so far.
+    """
+
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        """ Records a row.
+
+        Args:
+            row: List of the values in the row.
+        """
+        self.rows.append(row)
+
+
+def upsert_csv(path, header, rows, key_columns):
+    """ Inserts new rows into a CSV file and replaces changed ones.
+
+    Existing rows keep their position, new rows are appended in order, and
+    the file is replaced atomically. Rows with the same key are merged, so
+    the CSV never has duplicates.
+
+    Args:
+        path: The path of the CSV file. It is created if it does not exist.
+        header: List of the column names.
+        rows: List of the new or updated rows, as lists of values.
+        key_columns: List of the names of the columns that identify a row.
+
+    Returns:
+        Tuple with the number of inserted and of updated rows.
+    """
+    key_indexes = [header.index(column) for column in key_columns]
+    existing = collections.OrderedDict()
+    if os.path.isfile(path):
+        with open(path, newline="") as in_csv:
+            reader = csv.reader(in_csv)
+            if next(reader, None) != header:
+                raise Exception(f"The columns of {path} do not match.")
+            for row in reader:
+                existing[tuple(row[index] for index in key_indexes)] = row
+
+    inserted = updated = 0
+    for row in rows:
+        row = [str(value) for value in row]
+        key = tuple(row[index] for index in key_indexes)
+        if key not in existing:
+            inserted += 1
+        elif existing[key] != row:
+            updated += 1
+        existing[key] = row
+
+    def write(out_csv):
+        writer = csv.writer(out_csv)
+        writer.writerow(header)
+        writer.writerows(existing.values())
+
+    write_atomically(path, write)
+    return inserted, updated
+
+
+def read_chunks(path, size):
+    """ Reads a CSV in chunks of rows, without loading all of it.
+
+    Args:
+        path: The path of the CSV.
+        size: The number of rows in a chunk.
+
+    Yields:
+        Lists of at most size rows, as dictionaries.
+    """
+    with open(path, newline="") as in_csv:
+        reader = csv.DictReader(in_csv)
+        while True:
+            chunk = list(itertools.islice(reader, size))
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,75 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the incremental module. """
+
+import csv
+import os
+import tempfile
+import unittest
+import incremental
+
+
+class IncrementalTest(unittest.TestCase):
+    """ Incremental test class. """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_watermark_store(self):
+        """ Test to check that watermarks only move forward and persist. """
+        path = os.path.join(self.temp_dir.name, "watermarks.json")
+        watermarks = incremental.WatermarkStore(path)
+        self.assertEqual(watermarks.get("googleinterns/risr"), "")
+        watermarks.update("googleinterns/risr", "2020-06-11T21:51:20Z")
+        watermarks.update("googleinterns/risr", "2020-06-01T00:00:00Z")
+        watermarks.save()
+        self.assertEqual(
+            incremental.WatermarkStore(path).get("googleinterns/risr"),
+            "2020-06-11T21:51:20Z")
+
+    def test_upsert_csv(self):
+        """ Test to check that new rows are appended and changed rows are
+        replaced in place. """
+        path = os.path.join(self.temp_dir.name, "comments.csv")
+        header = ["comment_path", "comment", "is_host"]
+        self.assertEqual(incremental.upsert_csv(
+            path, header, [["a", "first", False], ["b", "second", True]],
+            ["comment_path"]), (2, 0))
+        self.assertEqual(incremental.upsert_csv(
+            path, header, [["c", "third", False], ["a", "edited", False],
+                           ["b", "second", True]],
+            ["comment_path"]), (1, 1))
+        with open(path, newline="") as in_csv:
+            rows = list(csv.reader(in_csv))
+        self.assertEqual(rows, [
+            header,
+            ["a", "edited", "False"],
+            ["b", "second", "True"],
+            ["c", "third", "False"]
+        ])
+
+    def test_upsert_csv_columns(self):
+        """ Test to check that a CSV with other columns is not merged. """
+        path = os.path.join(self.temp_dir.name, "comments.csv")
+        incremental.upsert_csv(path, ["a"], [["1"]], ["a"])
+        with self.assertRaises(Exception):
+            incremental.upsert_csv(path, ["b"], [["1"]], ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
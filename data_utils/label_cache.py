@@ -0,0 +1,130 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for caching the categories of comments between runs.
+
+The category of a comment only depends on its text and on the model, so
+categories are stored by the hash of the comment text, for one model
+version. A cache opened with another version, after the model is retrained,
+is emptied.
+"""
+
+import hashlib
+import sqlite3
+
+# Largest number of keys in a query, below the SQLite limit of variables.
+MAX_KEYS_PER_QUERY = 500
+
+
+def get_label_key(comment):
+    """ Gets the content address of a comment.
+
+    Args:
+        comment: A string containing the comment text.
+
+    Returns:
+        bytes. The SHA-256 digest of the comment text.
+    """
+    return hashlib.sha256(comment.encode()).digest()
+
+
+class LabelCache:
+    """ SQLite cache of the category of each comment text for a model.
+
+    Attributes:
+        connection: The connection to the SQLite database.
+        version: The version of the model of the categories.
+        hits: The number of comments found in the cache.
+        misses: The number of comments not found.
+    """
+
+    def __init__(self, path, version):
+        self.connection = sqlite3.connect(path)
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata "
+                "(name TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS labels "
+                "(key BLOB PRIMARY KEY, category TEXT) WITHOUT ROWID")
+            cached_version = self.connection.execute(
+                "SELECT value FROM metadata WHERE name = 'version'"
+            ).fetchone()
+            if cached_version is None or cached_version[0] != version:
+                self.connection.execute("DELETE FROM labels")
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO metadata VALUES ('version', ?)",
+                    (version,))
+
+    def lookup(self, keys):
+        """ Looks up the categories of comments, without counting them.
+
+        Args:
+            keys: List of comment keys, from get_label_key().
+
+        Returns:
+            Dictionary mapping the keys found to their category.
+        """
+        unique_keys = list(set(keys))
+        labels = {}
+        for start in range(0, len(unique_keys), MAX_KEYS_PER_QUERY):
+            batch = unique_keys[start:start + MAX_KEYS_PER_QUERY]
+            labels.update(self.connection.execute(
+                "SELECT key, category FROM labels WHERE key IN "
+                f"({', '.join('?' * len(batch))})", batch))
+        return labels
+
+    def get_many(self, keys):
+        """ Looks up the categories of comments, and counts the hits and
+        misses.
+
+        Args:
+            keys: List of comment keys, from get_label_key().
+
+        Returns:
+            Dictionary mapping the keys found to their category.
+        """
+        labels = self.lookup(keys)
+        for key in keys:
+            if key in labels:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return labels
+
+    def put_many(self, labels):
+        """ Stores the categories of comments.
+
+        Args:
+            labels: Dictionary mapping comment keys to their category.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO labels VALUES (?, ?)", labels.items())
+
+    def close(self):
+        """ Closes the connection to the database. """
+        self.connection.close()
+
+    def report(self):
+        """ Summarizes the use of the cache.
+
+        Returns:
+            str. The number of hits and misses.
+        """
+        return (f"Label cache: {self.hits} hits, {self.misses} misses for "
+                f"model {self.version}.")
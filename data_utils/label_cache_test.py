@@ -0,0 +1,68 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the label_cache module. """
+
+import os
+import tempfile
+import unittest
+import label_cache
+
+
+class LabelCacheTest(unittest.TestCase):
+    """ Label cache test class. """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "labels.sqlite")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_many(self):
+        """ Test to check that stored categories are found by comment text
+        in the next run, in batches, and counted. """
+        keys = [label_cache.get_label_key(str(index))
+                for index in range(1200)]
+        cache = label_cache.LabelCache(self.path, "v1")
+        self.assertEqual(cache.get_many(keys[:2]), {})
+        cache.put_many({key: "style" for key in keys[:1000]})
+        cache.close()
+
+        cache = label_cache.LabelCache(self.path, "v1")
+        labels = cache.get_many(keys + keys[:1])
+        self.assertEqual(len(labels), 1000)
+        self.assertEqual(labels[label_cache.get_label_key("0")], "style")
+        self.assertEqual((cache.hits, cache.misses), (1001, 200))
+        cache.close()
+
+    def test_version(self):
+        """ Test to check that a new model version empties the cache. """
+        key = label_cache.get_label_key("nit: rename this.")
+        cache = label_cache.LabelCache(self.path, "v1")
+        cache.put_many({key: "style"})
+        cache.close()
+
+        cache = label_cache.LabelCache(self.path, "v2")
+        self.assertEqual(cache.get_many([key]), {})
+        cache.put_many({key: "naming"})
+        cache.close()
+
+        cache = label_cache.LabelCache(self.path, "v2")
+        self.assertEqual(cache.get_many([key]), {key: "naming"})
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for keeping the raw Github API responses of each repository.
+
+Responses are appended to gzip-compressed newline-delimited JSON files,
+one file per stage and repository:
+    <RISR_LAKE_DIR>/<stage>/<owner>/<name>.ndjson.gz
+
+Every run appends a line, so the files keep the history of a repository.
+The CSVs can then be rebuilt from the latest response of each repository
+without any query, for example after changing how they are computed.
+"""
+
+import gzip
+import json
+import os
+import time
+
+LAKE_SUFFIX = ".ndjson.gz"
+
+
+def get_lake_dir():
+    """ Gets the directory of the response lake.
+
+    The lake is enabled with the following command:
+        $ export RISR_LAKE_DIR="lake"
+
+    Returns:
+        str. The directory, or None if the lake is not enabled.
+    """
+    return os.getenv("RISR_LAKE_DIR") or None
+
+
+class ResponseLake:
+    """ Raw query results partitioned by stage and repository.
+
+    Attributes:
+        directory: The root directory of the lake.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_path(self, stage, owner, name):
+        """ Gets the path of the file of a repository.
+
+        Args:
+            stage: The name of the stage, such as "pr_stats".
+            owner: A string containing the repository owner.
+            name: A string containing the repository name.
+
+        Returns:
+            str. The path of the compressed NDJSON file.
+        """
+        return os.path.join(self.directory, stage, owner, name + LAKE_SUFFIX)
+
+    def append(self, stage, owner, name, result):
+        """ Appends the results of a repository to its file.
+
+        Each call adds a gzip member with one line, and gzip readers read
+        the members of a file as one stream.
+
+        Args:
+            stage: The name of the stage, such as "pr_stats".
+            owner: A string containing the repository owner.
+            name: A string containing the repository name.
+            result: The JSON results of the query.
+        """
+        path = self.get_path(stage, owner, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        line = json.dumps({
+            "repository": f"{owner}/{name}",
+            "fetched": time.time(),
+            "result": result
+        })
+        with gzip.open(path, "at") as out_file:
+            out_file.write(line + "\n")
+
+    def read_records(self, stage, owner, name):
+        """ Reads every record of a repository, from the oldest one.
+
+        Args:
+            stage: The name of the stage, such as "pr_stats".
+            owner: A string containing the repository owner.
+            name: A string containing the repository name.
+
+        Yields:
+            Dictionaries with the repository, the time it was fetched and
+            the results.
+        """
+        path = self.get_path(stage, owner, name)
+        if not os.path.isfile(path):
+            return
+        with gzip.open(path, "rt") as in_file:
+            for line in in_file:
+                yield json.loads(line)
+
+    def read_latest(self, stage, owner, name):
+        """ Reads the latest results of a repository.
+
+        Args:
+            stage: The name of the stage, such as "pr_stats".
+            owner: A string containing the repository owner.
+            name: A string containing the repository name.
+
+        Returns:
+            JSON. The results, or [] if the repository is not in the lake.
+        """
+        result = []
+        for record in self.read_records(stage, owner, name):
+            result = record["result"]
+        return result
+
+
+def record_results(lake, stage, repos, results):
+    """ Appends each result to the lake as it is fetched.
+
+    Args:
+        lake: The ResponseLake, or None to not record anything.
+        stage: The name of the stage, such as "pr_stats".
+        repos: List of (name, owner) tuples.
+        results: Iterable with the results of each repository, in the order
+            of repos.
+
+    Yields:
+        The results, unchanged.
+    """
+    for (name, owner), result in zip(repos, results):
+        if lake and result:
+            lake.append(stage, owner, name, result)
+        yield result
+
+
+def skip_missing(stage, rows, results):
+    """ Pairs repositories with their results from the lake, skipping the
+    repositories that are not in the lake.
+
+    A repository is missing when it was never fetched, or when every fetch
+    failed, since failed results are not recorded.
+
+    Args:
+        stage: The name of the stage, such as "pr_stats".
+        rows: List of the repository rows from the repositories CSV.
+        results: Iterable with the results of each repository read from the
+            lake, in the order of rows.
+
+    Yields:
+        (row, results) tuples of the repositories in the lake.
+    """
+    for row, result in zip(rows, results):
+        if result:
+            yield row, result
+        else:
+            print(f"Skipping {row['owner']}/{row['name']}, which has no "
+                  f"{stage} results in the lake.")
+
+
+def get_results(stage, repos, fetch, from_lake=False):
+    """ Gets the results of each repository for a stage.
+
+    Args:
+        stage: The name of the stage, such as "pr_stats".
+        repos: List of (name, owner) tuples.
+        fetch: Function that takes repos and returns an iterable with the
+            query results of each repository.
+        from_lake: Whether to read the latest results in the lake instead of
+            sending queries.
+
+    Returns:
+        Iterable with the results of each repository, in the order of repos.
+
+    Raises:
+        Exception: from_lake is set and RISR_LAKE_DIR is not.
+    """
+    lake_dir = get_lake_dir()
+    if from_lake:
+        if not lake_dir:
+            raise Exception("RISR_LAKE_DIR must be set to read from the lake.")
+        lake = ResponseLake(lake_dir)
+        return (lake.read_latest(stage, owner, name) for name, owner in repos)
+    lake = ResponseLake(lake_dir) if lake_dir else None
+    return record_results(lake, stage, repos, fetch(repos))
@@ -0,0 +1,88 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the lake module. """
+
+import gzip
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import lake
+
+
+class LakeTest(unittest.TestCase):
+    """ Lake test class. """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_append_and_read(self):
+        """ Test to check that appended results are kept in order and that
+        the latest one is read back. """
+        response_lake = lake.ResponseLake(self.temp_dir.name)
+        self.assertEqual(
+            response_lake.read_latest("pr_stats", "googleinterns", "risr"), [])
+        response_lake.append("pr_stats", "googleinterns", "risr",
+                             {"data": {"run": 1}})
+        response_lake.append("pr_stats", "googleinterns", "risr",
+                             {"data": {"run": 2}})
+
+        path = response_lake.get_path("pr_stats", "googleinterns", "risr")
+        self.assertEqual(path, os.path.join(
+            self.temp_dir.name, "pr_stats", "googleinterns",
+            "risr.ndjson.gz"))
+        with gzip.open(path, "rt") as in_file:
+            self.assertEqual(len(in_file.readlines()), 2)
+        records = list(response_lake.read_records(
+            "pr_stats", "googleinterns", "risr"))
+        self.assertEqual(records[0]["repository"], "googleinterns/risr")
+        self.assertEqual(
+            response_lake.read_latest("pr_stats", "googleinterns", "risr"),
+            {"data": {"run": 2}})
+
+    def test_get_results(self):
+        """ Test to check that fetched results are recorded and can be read
+        back without fetching. """
+        repos = [("risr", "googleinterns"), ("missing", "intern")]
+        fetch = MagicMock(return_value=[{"data": {"a": 1}}, []])
+        with patch.dict(os.environ, {"RISR_LAKE_DIR": self.temp_dir.name}):
+            results = list(lake.get_results("host", repos, fetch))
+            self.assertEqual(results, [{"data": {"a": 1}}, []])
+
+            fetch.reset_mock()
+            results = list(lake.get_results("host", repos, fetch,
+                                            from_lake=True))
+            self.assertEqual(results, [{"data": {"a": 1}}, []])
+            fetch.assert_not_called()
+
+    def test_get_results_no_lake(self):
+        """ Test to check that nothing is recorded without RISR_LAKE_DIR and
+        that the lake cannot be read. """
+        fetch = MagicMock(return_value=[{"data": {"a": 1}}])
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(
+                list(lake.get_results("host", [("risr", "googleinterns")],
+                                      fetch)),
+                [{"data": {"a": 1}}])
+            with self.assertRaises(Exception):
+                lake.get_results("host", [], fetch, from_lake=True)
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
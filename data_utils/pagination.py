@@ -0,0 +1,264 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for following the pages of nested GraphQL connections.
+
+The first page of every connection is fetched with the repository query.
+Connections that have more pages are then re-requested on their own through
+the node(id:) field of their parent, so only the data that is still missing
+is fetched. All the pages missing at the same nesting depth are requested
+together, several per query, until every connection is complete.
+"""
+
+from crawl import crawl
+from query import RATE_LIMIT_FIELDS, run_query
+
+PAGE_INFO_FIELDS = """pageInfo {
+    hasNextPage
+    endCursor
+}"""
+
+# Github's largest page size, used for every page after the first one.
+MAX_PAGE_SIZE = 100
+
+# Number of connection pages requested with one query.
+MAX_PAGES_PER_QUERY = 10
+
+
+class Connection:
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """ A paginated connection in a query.
+
+    Attributes:
+        name: The field name of the connection, such as "pullRequests".
+        node_type: The GraphQL type of the nodes, used to re-request the
+            nested connections of a node.
+        page_size: The number of nodes in the first page.
+        fields: A string with the fields to get from each node.
+        connections: List of the nested Connections of each node.
+        args: A string with extra connection arguments.
+        follow: Whether the pages after the first one are fetched. The
+            nested connections of the first page are followed either way.
+        stop: Function that takes the owner of the connection and a node and
+            returns True if the pages after that node are not needed, for
+            example because the connection is sorted and the node was
+            already seen. The nested connections of such nodes are not
+            completed either. None to fetch every page.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, name, node_type, page_size, fields, connections=(),
+                 args="", follow=True, stop=None):
+        self.name = name
+        self.node_type = node_type
+        self.page_size = page_size
+        self.fields = fields
+        self.connections = list(connections)
+        self.args = args
+        self.follow = follow
+        self.stop = stop
+
+    def render(self, after=None, page_size=None):
+        """ Renders the connection as a GraphQL field.
+
+        Args:
+            after: The cursor to start the page after, if any.
+            page_size: The number of nodes in the page. Defaults to the size
+                of the first page.
+
+        Returns:
+            str. The connection field with its total count, page info and
+                nodes.
+        """
+        arguments = [f"first: {page_size or self.page_size}"]
+        if after:
+            arguments.append(f'after: "{after}"')
+        if self.args:
+            arguments.append(self.args)
+        return f"""{self.name}({", ".join(arguments)}) {{
+            totalCount
+            {PAGE_INFO_FIELDS}
+            nodes {{
+                {render_fields(self.fields, self.connections)}
+            }}
+        }}"""
+
+
+def render_fields(fields, connections):
+    """ Renders the fields of an object and its connections.
+
+    Objects with connections also get their id, so that the connections can
+    be re-requested later.
+
+    Args:
+        fields: A string with the fields to get from the object.
+        connections: List of the Connections of the object.
+
+    Returns:
+        str. The selection of the object.
+    """
+    parts = ["id"] if connections else []
+    parts.append(fields)
+    parts.extend(connection.render() for connection in connections)
+    return "\n".join(parts)
+
+
+def _has_next_page(obj, connection, page):
+    """ Checks if the page after a page of a connection is needed.
+
+    Args:
+        obj: The object that owns the connection.
+        connection: The Connection of the page.
+        page: The page of the connection.
+
+    Returns:
+        bool. True if the next page should be fetched.
+    """
+    if not connection.follow or not page["pageInfo"]["hasNextPage"]:
+        return False
+    if connection.stop:
+        return not any(connection.stop(obj, node)
+                       for node in page["nodes"] if node)
+    return True
+
+
+def _find_pending_in_page(obj, obj_type, connection, page):
+    """ Finds the incomplete connections of a page and of its nodes.
+
+    Args:
+        obj: The object that owns the connection.
+        obj_type: The GraphQL type of obj.
+        connection: The Connection of the page.
+        page: The page of the connection.
+
+    Returns:
+        List of (object, object type, Connection) tuples.
+    """
+    pending = []
+    if _has_next_page(obj, connection, page):
+        pending.append((obj, obj_type, connection))
+    if connection.connections:
+        for node in page["nodes"]:
+            if not node or (connection.stop and connection.stop(obj, node)):
+                continue
+            pending.extend(find_pending_pages(
+                node, connection.node_type, connection.connections))
+    return pending
+
+
+def find_pending_pages(obj, obj_type, connections):
+    """ Finds every connection of an object that has more pages.
+
+    Args:
+        obj: The object, for example a repository.
+        obj_type: The GraphQL type of obj.
+        connections: List of the Connections of obj.
+
+    Returns:
+        List of (object, object type, Connection) tuples.
+    """
+    pending = []
+    for connection in connections:
+        page = obj.get(connection.name)
+        if page:
+            pending.extend(
+                _find_pending_in_page(obj, obj_type, connection, page))
+    return pending
+
+
+def build_page_query(pending):
+    """ Builds a query for the next page of several connections.
+
+    The page of the i-th connection is under the "p<i>" key.
+
+    Args:
+        pending: List of (object, object type, Connection) tuples.
+
+    Returns:
+        str. The query.
+    """
+    pages = []
+    for index, (obj, obj_type, connection) in enumerate(pending):
+        cursor = obj[connection.name]["pageInfo"]["endCursor"]
+        page = connection.render(after=cursor, page_size=MAX_PAGE_SIZE)
+        pages.append(f"""p{index}: node(id: "{obj['id']}") {{
+            ... on {obj_type} {{
+                {page}
+            }}
+        }}""")
+    pages = "\n".join(pages)
+    return f"""{{
+        {RATE_LIMIT_FIELDS}
+        {pages}
+    }}"""
+
+
+def fetch_pages(pending, use_cache=True):
+    """ Fetches the next page of several connections and merges them.
+
+    The nodes of each page are appended to the nodes already fetched for
+    the connection.
+
+    Args:
+        pending: List of (object, object type, Connection) tuples.
+        use_cache: Whether the pages may be read from the response cache.
+
+    Returns:
+        List of the connections that still have more pages after the merge.
+    """
+    result = run_query(build_page_query(pending), partial=True,
+                       use_cache=use_cache)
+    if not result:
+        print(f"Could not fetch {len(pending)} connection pages.")
+        return []
+
+    still_pending = []
+    for index, (obj, obj_type, connection) in enumerate(pending):
+        node = result["data"].get(f"p{index}")
+        if not node or not node.get(connection.name):
+            continue
+        page = node[connection.name]
+        obj[connection.name]["nodes"].extend(page["nodes"])
+        obj[connection.name]["pageInfo"] = page["pageInfo"]
+        still_pending.extend(
+            _find_pending_in_page(obj, obj_type, connection, page))
+    return still_pending
+
+
+def fetch_all_pages(objects, obj_type, connections, concurrency=None,
+                    use_cache=True):
+    """ Completes every connection of the objects, at every nesting level.
+
+    The objects are modified in place. Each round requests the next page of
+    every incomplete connection, several pages per query, with the queries
+    sent concurrently.
+
+    Args:
+        objects: List of objects fetched with render_fields, for example
+            repositories.
+        obj_type: The GraphQL type of the objects.
+        connections: List of the Connections of the objects.
+        concurrency: The maximum number of queries in flight at once.
+        use_cache: Whether the pages may be read from the response cache.
+    """
+    pending = []
+    for obj in objects:
+        pending.extend(find_pending_pages(obj, obj_type, connections))
+
+    while pending:
+        chunks = [(pending[start:start + MAX_PAGES_PER_QUERY], use_cache)
+                  for start in range(0, len(pending), MAX_PAGES_PER_QUERY)]
+        pending = []
+        for still_pending in crawl(fetch_pages, chunks, concurrency):
+            pending.extend(still_pending)
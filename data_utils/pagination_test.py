@@ -0,0 +1,199 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the pagination module. """
+
+import re
+import unittest
+from unittest.mock import patch
+import pagination
+
+PAGE_PATTERN = re.compile(
+    r'(p\d+): node\(id: "([^"]+)"\) \{\s*\.\.\. on \w+ \{\s*'
+    r'(\w+)\(first: (\d+), after: "(\d+)"')
+
+# Nodes of every connection, by object id and connection name.
+NODES = {
+    "repo": {"pullRequests": ["pr0", "pr1", "pr2", "pr3", "pr4"]},
+    "pr0": {"comments": ["c0", "c1", "c2", "c3", "c4"]},
+    "pr1": {"comments": ["c5"]},
+    "pr2": {"comments": ["c6", "c7", "c8"]},
+    "pr3": {"comments": []},
+    "pr4": {"comments": ["c9", "c10", "c11"]},
+}
+
+CONNECTIONS = [
+    pagination.Connection("pullRequests", "PullRequest", 2, "number", [
+        pagination.Connection("comments", "IssueComment", 2, "body")
+    ])
+]
+
+
+def make_page(obj_id, name, start, size):
+    """ Creates a page of a connection from NODES.
+
+    Args:
+        obj_id: The id of the object that owns the connection.
+        name: The name of the connection.
+        start: The position of the first node in the page.
+        size: The number of nodes in the page.
+
+    Returns:
+        The page, with the first page of the comments of each node.
+    """
+    node_ids = NODES[obj_id][name][start:start + size]
+    nodes = []
+    for node_id in node_ids:
+        node = {"id": node_id}
+        if node_id in NODES:
+            node["comments"] = make_page(node_id, "comments", 0, 2)
+        nodes.append(node)
+    end = start + len(node_ids)
+    return {
+        "pageInfo": {
+            "hasNextPage": end < len(NODES[obj_id][name]),
+            "endCursor": str(end)
+        },
+        "nodes": nodes
+    }
+
+
+def make_run_query(requested):
+    """ Creates a run_query stand-in that answers page queries from NODES.
+
+    Args:
+        requested: List that records the (id, connection, cursor) tuple of
+            every requested page.
+
+    Returns:
+        The run_query function.
+    """
+    def run_query(query_input, partial=False, use_cache=True):
+        # pylint: disable=unused-argument
+        data = {}
+        for alias, obj_id, name, size, cursor in \
+                PAGE_PATTERN.findall(query_input):
+            requested.append((obj_id, name, cursor))
+            data[alias] = {
+                name: make_page(obj_id, name, int(cursor), int(size))}
+        return {"data": data}
+
+    return run_query
+
+
+class PaginationTest(unittest.TestCase):
+    """ Pagination test class. """
+
+    def test_render(self):
+        """ Test to check that connections render their page arguments,
+        page info and nested connections. """
+        selection = pagination.render_fields("nameWithOwner", CONNECTIONS)
+        self.assertTrue(selection.startswith("id\nnameWithOwner"))
+        self.assertIn("pullRequests(first: 2)", selection)
+        self.assertIn("comments(first: 2)", selection)
+        self.assertIn("hasNextPage", selection)
+        self.assertIn('after: "abc"', CONNECTIONS[0].render(after="abc"))
+        self.assertEqual(pagination.render_fields("body", []), "body")
+
+    def test_find_pending_pages(self):
+        """ Test to check that incomplete connections are found at every
+        nesting level. """
+        repo = {"id": "repo", "pullRequests": make_page(
+            "repo", "pullRequests", 0, 2)}
+        pending = pagination.find_pending_pages(repo, "Repository",
+                                                CONNECTIONS)
+        self.assertEqual(
+            [(obj["id"], obj_type, connection.name)
+             for obj, obj_type, connection in pending],
+            [("repo", "Repository", "pullRequests"),
+             ("pr0", "PullRequest", "comments")])
+
+        unfollowed = [pagination.Connection(
+            "pullRequests", "PullRequest", 2, "number",
+            CONNECTIONS[0].connections, follow=False)]
+        pending = pagination.find_pending_pages(repo, "Repository",
+                                                unfollowed)
+        self.assertEqual([obj["id"] for obj, _, _ in pending], ["pr0"])
+
+    def test_build_page_query(self):
+        """ Test to check that each page gets its own alias. """
+        repo = {"id": "repo", "pullRequests": make_page(
+            "repo", "pullRequests", 0, 2)}
+        pending = pagination.find_pending_pages(repo, "Repository",
+                                                CONNECTIONS)
+        page_query = pagination.build_page_query(pending)
+        self.assertEqual(PAGE_PATTERN.findall(page_query), [
+            ("p0", "repo", "pullRequests", "100", "2"),
+            ("p1", "pr0", "comments", "100", "2")
+        ])
+        self.assertIn("rateLimit", page_query)
+
+    def test_fetch_all_pages(self):
+        """ Test to check that every page is merged at every nesting level
+        and that complete connections are never requested again. """
+        requested = []
+
+        repo = {"id": "repo", "pullRequests": make_page(
+            "repo", "pullRequests", 0, 2)}
+        with patch("pagination.run_query",
+                   side_effect=make_run_query(requested)), \
+                patch("pagination.MAX_PAGE_SIZE", 2):
+            pagination.fetch_all_pages([repo], "Repository", CONNECTIONS, 1)
+
+        pull_requests = repo["pullRequests"]["nodes"]
+        self.assertEqual([node["id"] for node in pull_requests],
+                         NODES["repo"]["pullRequests"])
+        self.assertFalse(repo["pullRequests"]["pageInfo"]["hasNextPage"])
+        for pull_request in pull_requests:
+            self.assertEqual(
+                [node["id"] for node in pull_request["comments"]["nodes"]],
+                NODES[pull_request["id"]]["comments"])
+        self.assertEqual(sorted(requested), [
+            ("pr0", "comments", "2"), ("pr0", "comments", "4"),
+            ("pr2", "comments", "2"), ("pr4", "comments", "2"),
+            ("repo", "pullRequests", "2"), ("repo", "pullRequests", "4")
+        ])
+
+    def test_stop(self):
+        """ Test to check that pages and nested connections stop at nodes
+        that are not needed. """
+        connections = [pagination.Connection(
+            "pullRequests", "PullRequest", 2, "number",
+            CONNECTIONS[0].connections,
+            stop=lambda repo, pull_request: pull_request["id"] == "pr2")]
+        requested = []
+
+        repo = {"id": "repo", "pullRequests": make_page(
+            "repo", "pullRequests", 0, 2)}
+        with patch("pagination.run_query",
+                   side_effect=make_run_query(requested)), \
+                patch("pagination.MAX_PAGE_SIZE", 2):
+            pagination.fetch_all_pages([repo], "Repository", connections, 1)
+        self.assertEqual(sorted(requested), [
+            ("pr0", "comments", "2"), ("pr0", "comments", "4"),
+            ("repo", "pullRequests", "2")
+        ])
+
+    def test_fetch_pages_failure(self):
+        """ Test to check that a failed query leaves the objects as they
+        are. """
+        repo = {"id": "repo", "pullRequests": make_page(
+            "repo", "pullRequests", 0, 2)}
+        with patch("pagination.run_query", return_value=[]):
+            pagination.fetch_all_pages([repo], "Repository", CONNECTIONS, 1)
+        self.assertEqual(len(repo["pullRequests"]["nodes"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
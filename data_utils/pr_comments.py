@@ -17,13 +17,68 @@
 import csv
 import os
 import sys
-from query import run_query
+from batch import fetch_repository, fetch_repositories
+from checkpoint import Checkpoint, run_with_checkpoint
+from columnar import PARQUET_FLAG, write_parquet
+from incremental import RowBuffer, WatermarkStore, upsert_csv
+from pagination import Connection
+from query import enable_cache
+from transform import run_transform
+
+# Columns of pr_comments.csv.
+COMMENT_COLUMNS = [
+    "comment_path",
+    "created",
+    "author",
+    "comment",
+    "repo_type",
+    "is_host"
+]
+
+# Types of the columns of pr_comments.parquet. Other columns are strings.
+COMMENT_TYPES = {
+    "created": "timestamp",
+    "author": "category",
+    "repo_type": "category",
+    "is_host": "bool"
+}
+
+# Fields of each comment and review.
+COMMENT_FIELDS = """
+resourcePath
+body
+createdAt
+author {
+    login
+}
+"""
+
+# Pull requests are sorted from the most recently updated, so that an
+# incremental sync can stop at the first pull request it has already seen.
+PULL_REQUEST_ORDER = "orderBy: {field: UPDATED_AT, direction: DESC}"
+
+# Connections of each pull request needed for the comments.
+PULL_REQUEST_CONNECTIONS = [
+    Connection("comments", "IssueComment", 20, COMMENT_FIELDS),
+    Connection("reviews", "PullRequestReview", 20, COMMENT_FIELDS, [
+        Connection("comments", "PullRequestReviewComment", 20,
+                   COMMENT_FIELDS)
+    ])
+]
+
+# Paginated connections of a repository needed for the pull request
+# comments.
+PR_COMMENTS_CONNECTIONS = [
+    Connection("pullRequests", "PullRequest", 20, "updatedAt",
+               PULL_REQUEST_CONNECTIONS, args=PULL_REQUEST_ORDER)
+]
 
 
 def get_pr_comments(name, owner):
     """ Gets the pull request comments from a particular repository.
 
-    This function fetches the results from the Github API query.
+    This function fetches the results from the Github API query. Every
+    page of the pull requests, comments and reviews is fetched.
 
     Args:
         name: A string containing the repository name.
@@ -33,46 +88,99 @@ def get_pr_comments(name, owner):
         A JSON object with the pull request comment information.
     """
 
-    query = f"""{{
-        repository(name: "{name}", owner: "{owner}") {{
-            pullRequests(first: 20) {{
-                nodes {{
-                    comments(first: 20) {{
-                        nodes {{
-                            resourcePath
-                            body
-                            createdAt
-                            author {{
-                                login
-                            }}
-                        }}
-                    }}
-                    reviews(first: 20) {{
-                        nodes {{
-                            resourcePath
-                            body
-                            createdAt
-                            author {{
-                                login
-                            }}
-                            comments(first: 20) {{
-                                nodes {{
-                                    resourcePath
-                                    body
-                                    createdAt
-                                    author {{
-                                        login
-                                    }}
-                                }}
-                            }}
-                        }}
-                    }}
-                }}
-            }}
-        }}
-    }}"""
-
-    return run_query(query)
+    return fetch_repository("", name, owner, PR_COMMENTS_CONNECTIONS)
+
+
+def get_all_pr_comments(repos):
+    """ Gets the pull request comments from many repositories.
+
+    Several repositories are fetched with each query, and the queries are
+    sent concurrently.
+
+    Args:
+        repos: List of (name, owner) tuples.
+
+    Returns:
+        Iterator over the JSON objects with the pull request comments
+        information of each repository, in the order of repos.
+    """
+    return fetch_repositories("", repos, PR_COMMENTS_CONNECTIONS)
+
+
+def get_updated_pr_comments(repos, watermarks):
+    """ Gets the comments of the pull requests updated since the last sync.
+
+    Pull requests are read from the most recently updated one, and the
+    pages stop at the first pull request that is not newer than the
+    watermark of its repository. Comments of pull requests that were
+    already seen are not completed.
+
+    The query of a repository does not depend on its watermark, so the
+    response cache is not used: a cached response would miss the pull
+    requests updated since it was fetched.
+
+    Args:
+        repos: List of (name, owner) tuples.
+        watermarks: WatermarkStore with the latest pull request updatedAt
+            of each repository, keyed by "owner/name".
+
+    Returns:
+        Iterator over the JSON objects with the pull request comments
+        information of each repository, in the order of repos. Pull
+        requests that are not newer than the watermark may be included.
+    """
+    def is_seen(repository, pull_request):
+        return (pull_request["updatedAt"]
+                <= watermarks.get(repository["nameWithOwner"]))
+
+    connections = [
+        Connection("pullRequests", "PullRequest", 20, "updatedAt",
+                   PULL_REQUEST_CONNECTIONS, args=PULL_REQUEST_ORDER,
+                   stop=is_seen)
+    ]
+    return fetch_repositories("nameWithOwner", repos, connections,
+                              use_cache=False)
+
+
+def sync_pr_comments(comment_csv, watermark_json, rows, host_usernames):
+    """ Updates the comments CSV with the comments of updated pull requests.
+
+    New comments are added and edited comments replace their old row. The
+    watermarks are only saved once the CSV has been written, so an
+    interrupted sync is simply repeated by the next run.
+
+    Args:
+        comment_csv: The path of the pull request comments CSV.
+        watermark_json: The path of the watermarks of the repositories.
+        rows: List of the repository rows from the repositories CSV.
+        host_usernames: A set containing all known host usernames.
+    """
+    watermarks = WatermarkStore(watermark_json)
+    buffer = RowBuffer()
+    repos = [(row["name"], row["owner"]) for row in rows]
+    for row, query_results in zip(
+            rows, get_updated_pr_comments(repos, watermarks)):
+        if not query_results:
+            print(f"Could not sync {row['owner']}/{row['name']}.")
+            continue
+        repository = query_results["data"]["repository"]
+        key = repository["nameWithOwner"]
+        pull_requests = [
+            pull_request
+            for pull_request in repository["pullRequests"]["nodes"]
+            if pull_request["updatedAt"] > watermarks.get(key)
+        ]
+        repository["pullRequests"]["nodes"] = pull_requests
+        process_comment_query_results(
+            buffer, query_results, row["repo_type"], host_usernames)
+        for pull_request in pull_requests:
+            watermarks.update(key, pull_request["updatedAt"])
+
+    inserted, updated = upsert_csv(
+        comment_csv, COMMENT_COLUMNS, buffer.rows, ["comment_path"])
+    watermarks.save()
+    print(f"Synced {len(rows)} repositories: {inserted} new and {updated} "
+          "edited comments.")
 
 
 def process_comment_query_results(writer, result, repo_type, host_usernames):
@@ -151,9 +259,59 @@ def process_comment(repo_type, host_usernames, comment):
     return None
 
 
+def make_comment_sink(writer, host_usernames):
+    """ Creates a sink that records the comments of each repository.
+
+    Args:
+        writer: CSV writer to record the data in a CSV file.
+        host_usernames: A set containing all known host usernames.
+
+    Returns:
+        Function that takes a repository CSV row and the query results of
+        the repository.
+    """
+    def sink(row, result):
+        process_comment_query_results(
+            writer, result, row["repo_type"], host_usernames)
+    return sink
+
+
+def get_host_usernames(host_csv):
+    """ Loads the known host usernames.
+
+    Args:
+        host_csv: The path of the host information CSV.
+
+    Returns:
+        A set containing all known host usernames.
+    """
+    host_usernames = set()
+    with open(host_csv, newline="") as in_csv:
+        reader = csv.DictReader(in_csv)
+        for row in reader:
+            host_usernames.add(row["username"])
+    return host_usernames
+
+
 def main():
     """ Retrieves the comments in pull requests for intern repositories.
 
+    With the --incremental flag, only the pull requests updated since the
+    previous incremental run are fetched, and their comments are merged
+    into the existing CSV:
+        $ python3 pr_comments.py --incremental
+
+    Otherwise, the comments of each repository are committed to a
+    checkpoint as they are written, so a run that fails resumes after the
+    last completed repository.
+
+    With the --from-lake flag, the comments are read from the latest
+    responses in the response lake, without sending any query, by several
+    processes.
+
+    With the --parquet flag, the CSV is also converted to
+    pr_comments.parquet.
+
     pr_comments.csv has the following columns:
         comment_path: The resource path to the comment.
         created: The date and time that the comment was created.
@@ -162,49 +320,62 @@ def main():
         repo_type: The type of repository that the comment was made in.
         is_host: Boolean that indicates if author is a host.
     """
-    arg_count = len(sys.argv)
+    # pylint: disable=too-many-locals
+    incremental = "--incremental" in sys.argv
+    from_lake = "--from-lake" in sys.argv
+    parquet = PARQUET_FLAG in sys.argv
+    args = [arg for arg in sys.argv[1:]
+            if arg not in ("--incremental", "--from-lake", PARQUET_FLAG)]
 
     # If no extra arguments are given, then get pull request comments from
     # all repositories (capstone and starter).
-    if arg_count == 1:
+    if not args:
         comment_csv = "data/pr_comments.csv"
         repo_csv = "data/repos.csv"
         host_csv = "data/host_info.csv"
+        watermark_json = "data/pr_comments_watermarks.json"
+        checkpoint_json = "data/pr_comments_checkpoint.json"
     else:
         # If in testing mode, then use testing files.
-        if sys.argv[1] == "test":
+        if args[0] == "test":
             comment_csv = "data/test_pr_comments.csv"
             repo_csv = "data/test_repos.csv"
             host_csv = "data/test_host_info.csv"
+            watermark_json = "data/test_pr_comments_watermarks.json"
+            checkpoint_json = "data/test_pr_comments_checkpoint.json"
+        else:
+            raise Exception(f"Unsupported mode {args[0]}.")
 
     if not os.path.isfile(repo_csv):
         raise Exception("The CSV for intern repositories does not exist.")
 
-    host_usernames = set()
-    with open(host_csv, newline="") as host_csv:
-        reader = csv.DictReader(host_csv)
-        for row in reader:
-            host_usernames.add(row["username"])
+    cache = enable_cache("pr_comments")
 
-    with open(repo_csv, newline="") as in_csv, \
-         open(comment_csv, "w", newline="") as out_csv:
-        reader = csv.DictReader(in_csv)
-        writer = csv.writer(out_csv)
-        writer.writerow([
-            "comment_path",
-            "created",
-            "author",
-            "comment",
-            "repo_type",
-            "is_host"
+    host_usernames = get_host_usernames(host_csv)
+
+    with open(repo_csv, newline="") as in_csv:
+        rows = list(csv.DictReader(in_csv))
+
+    if incremental and from_lake:
+        raise Exception("--incremental cannot be used with --from-lake.")
+    if incremental:
+        sync_pr_comments(comment_csv, watermark_json, rows, host_usernames)
+    elif from_lake:
+        run_transform("pr_comments", rows, [
+            (comment_csv, COMMENT_COLUMNS, make_comment_sink,
+             (host_usernames,))
         ])
-        for row in reader:
-            query_results = get_pr_comments(row["name"], row["owner"])
-            process_comment_query_results(
-                writer,
-                query_results,
-                row["repo_type"],
-                host_usernames)
+    else:
+        checkpoint = Checkpoint(checkpoint_json)
+        checkpoint.open_output(comment_csv, COMMENT_COLUMNS)
+        run_with_checkpoint(checkpoint, "pr_comments", rows,
+                            get_all_pr_comments,
+                            make_comment_sink(checkpoint, host_usernames))
+    if parquet:
+        write_parquet(comment_csv, COMMENT_TYPES)
+
+    if cache:
+        print(cache.report())
 
 
 if __name__ == "__main__":
@@ -17,6 +17,7 @@
 import csv
 import os
 import sys
+import tempfile
 import unittest
 from unittest.mock import patch
 import pr_comments
@@ -119,7 +120,7 @@ class PrCommentsTest(unittest.TestCase):
             None
         ))
 
-    @patch("pr_comments.get_pr_comments")
+    @patch("pr_comments.get_all_pr_comments")
     def test_get_pr_comments(self, mock_results):
         """ Test for getting test repository PR comments.
 
@@ -130,7 +131,7 @@ class PrCommentsTest(unittest.TestCase):
 
         # Mock results: first three comments from host1 in a pull request
         # pylint: disable=line-too-long
-        mock_results.return_value = {
+        mock_results.return_value = [{
             "data": {
                 "repository": {
                     "pullRequests": {
@@ -177,7 +178,7 @@ class PrCommentsTest(unittest.TestCase):
                     }
                 }
             }
-        }
+        }]
 
         pr_comments_path = "data/test_pr_comments.csv"
 
@@ -197,6 +198,71 @@ class PrCommentsTest(unittest.TestCase):
                 self.assertTrue(row["is_host"])
         os.remove(pr_comments_path)
 
+    @patch("pr_comments.get_updated_pr_comments")
+    def test_sync_pr_comments(self, mock_results):
+        """ Test for the incremental sync of PR comments.
+
+        Pull requests that are not newer than the watermark are skipped,
+        new comments are added and edited comments replace their row.
+        """
+        def make_results(pull_requests):
+            return [{
+                "data": {
+                    "repository": {
+                        "nameWithOwner": "googleinterns/risr",
+                        "pullRequests": {"nodes": pull_requests}
+                    }
+                }
+            }]
+
+        def make_pull_request(updated_at, path, body):
+            return {
+                "updatedAt": updated_at,
+                "comments": {"nodes": [{
+                    "resourcePath": path,
+                    "body": body,
+                    "createdAt": "2020-06-11T21:51:20Z",
+                    "author": {"login": "host1"}
+                }]},
+                "reviews": {"nodes": []}
+            }
+
+        rows = [{"name": "risr", "owner": "googleinterns",
+                 "repo_type": "test"}]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            comment_csv = os.path.join(temp_dir, "pr_comments.csv")
+            watermark_json = os.path.join(temp_dir, "watermarks.json")
+
+            mock_results.return_value = make_results([
+                make_pull_request("2020-06-12T00:00:00Z", "/pull/2#c", "b"),
+                make_pull_request("2020-06-11T00:00:00Z", "/pull/1#c", "a")
+            ])
+            pr_comments.sync_pr_comments(
+                comment_csv, watermark_json, rows, {"host1"})
+
+            mock_results.return_value = make_results([
+                make_pull_request("2020-06-13T00:00:00Z", "/pull/1#c", "e"),
+                make_pull_request("2020-06-12T00:00:00Z", "/pull/2#c", "x")
+            ])
+            pr_comments.sync_pr_comments(
+                comment_csv, watermark_json, rows, {"host1"})
+            watermarks = mock_results.call_args[0][1]
+            self.assertEqual(watermarks.get("googleinterns/risr"),
+                             "2020-06-13T00:00:00Z")
+
+            with open(comment_csv, newline="") as in_csv:
+                comments = [(row["comment_path"], row["comment"])
+                            for row in csv.DictReader(in_csv)]
+        self.assertEqual(comments, [("/pull/2#c", "b"), ("/pull/1#c", "e")])
+
+    @patch("pr_comments.fetch_repositories")
+    def test_get_updated_pr_comments_no_cache(self, mock_fetch):
+        """ Test to check that incremental syncs do not use the response
+        cache, whose responses may predate the latest updates. """
+        pr_comments.get_updated_pr_comments([("risr", "googleinterns")],
+                                            None)
+        self.assertFalse(mock_fetch.call_args[1]["use_cache"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -14,17 +14,85 @@
 
 """ Module for retrieving pull request statistics. """
 
+import collections
 import csv
 import os
 import sys
 from datetime import datetime
-from query import run_query
+import numpy as np
+from batch import fetch_repository, fetch_repositories
+from checkpoint import Checkpoint, run_with_checkpoint
+from columnar import PARQUET_FLAG, write_parquet
+from pagination import Connection
+from query import enable_cache
+from transform import run_transform
+from weeks import calculate_weeks
+
+
+# Columns of pr_stats.csv.
+STATS_COLUMNS = [
+    "pr_path", "pr_number", "week", "start_date", "created_date",
+    "total_comments", "review_count", "pr_lines_changed"
+]
+
+# Types of the columns of pr_stats.parquet. Other columns are strings.
+STATS_TYPES = {
+    "pr_number": "int",
+    "week": "int",
+    "start_date": "date",
+    "created_date": "date",
+    "total_comments": "int",
+    "review_count": "int",
+    "pr_lines_changed": "int"
+}
+
+# Fields of the pull request timeline items that are counted as reviews.
+REVIEW_STATE_FIELDS = """
+... on PullRequestReview {
+    state
+}
+"""
+
+# Fields of each pull request needed for the pull request statistics.
+PULL_REQUEST_FIELDS = """
+resourcePath
+number
+createdAt
+closedAt
+deletions
+additions
+"""
+
+# Fields of a repository needed for the pull request statistics.
+PR_STATS_FIELDS = "nameWithOwner"
+
+# Paginated connections of a repository needed for the pull request
+# statistics. Only reviews are requested from the timeline, since they are
+# the only items that are counted.
+PR_STATS_CONNECTIONS = [
+    Connection("pullRequests", "PullRequest", 50, PULL_REQUEST_FIELDS + """
+        comments {
+            totalCount
+        }
+    """, [
+        Connection("participants", "User", 10, "login"),
+        Connection("reviews", "PullRequestReview", 50, """
+            body
+            comments {
+                totalCount
+            }
+        """),
+        Connection("timelineItems", "PullRequestTimelineItems", 100,
+                   REVIEW_STATE_FIELDS, args="itemTypes: [PULL_REQUEST_REVIEW]")
+    ])
+]
 
 
 def get_pr_stats(name, owner):
     """ Gets the pull request statistics from a particular repository.
 
-    This function processes the results from the Github API query.
+    This function processes the results from the Github API query. Every
+    page of the pull requests and of their nested connections is fetched.
 
     Args:
         name: A string containing the repository name.
@@ -34,46 +102,24 @@ def get_pr_stats(name, owner):
         A JSON object with the pull request statistics information.
     """
 
-    query = f"""{{
-        repository(name: "{name}", owner: "{owner}") {{
-            nameWithOwner
-            pullRequests(first: 50) {{
-                nodes {{
-                    participants(first: 10) {{
-                        nodes {{
-                            login
-                        }}
-                    }}
-                    resourcePath
-                    number
-                    createdAt
-                    closedAt
-                    deletions
-                    additions
-                    comments {{
-                        totalCount
-                    }}
-                    reviews(first: 50) {{
-                        nodes {{
-                            body
-                            comments {{
-                                totalCount
-                            }}
-                        }}
-                    }}
-                    timelineItems(first: 100) {{
-                        nodes {{
-                            ... on PullRequestReview {{
-                                state
-                            }}
-                        }}
-                    }}
-                }}
-            }}
-        }}
-    }}"""
-
-    return run_query(query)
+    return fetch_repository(PR_STATS_FIELDS, name, owner,
+                            PR_STATS_CONNECTIONS)
+
+
+def get_all_pr_stats(repos):
+    """ Gets the pull request statistics from many repositories.
+
+    Several repositories are fetched with each query, and the queries are
+    sent concurrently.
+
+    Args:
+        repos: List of (name, owner) tuples.
+
+    Returns:
+        Iterator over the JSON objects with the pull request statistics
+        information of each repository, in the order of repos.
+    """
+    return fetch_repositories(PR_STATS_FIELDS, repos, PR_STATS_CONNECTIONS)
 
 
 def calculate_week(start_date, created_date):
@@ -122,6 +168,121 @@ def get_start_date(participants, host_dict, repo_dates, repo):
 
 
 
+def flatten_pull_requests(results, host_dict, repo_dates):
+    """ Flattens the pull requests of query results into columns.
+
+    The reviews and timeline items are flattened into arrays of the index
+    of their pull request, so that they are counted per pull request with
+    bincount instead of nested loops. Start dates are found in the same
+    pass, since they depend on the pull requests seen before.
+
+    Args:
+        results: Iterable with the query results of each repository.
+        host_dict: dictionary with host logins as keys and start dates as
+                   values.
+        repo_dates: dictionary mapping repositories to start dates.
+
+    Returns:
+        Tuple with a dictionary of the pull request columns, the pull
+        request index of each review, the comments of each review and the
+        pull request index of each review in the timelines.
+    """
+    columns = collections.defaultdict(list)
+    review_prs = []
+    review_comments = []
+    timeline_prs = []
+    for result in results:
+        if result == []:
+            continue
+        repo = result["data"]["repository"]["nameWithOwner"]
+        try:
+            pull_requests = \
+                result["data"]["repository"]["pullRequests"]["nodes"]
+        except (KeyError, TypeError):
+            print(f"PR statistics results {repo} does not have a"
+                  "structure that is currently supported by RISR.")
+            continue
+
+        for pull_request in pull_requests:
+            index = len(columns["pr_path"])
+            columns["pr_path"].append(pull_request["resourcePath"])
+            columns["pr_number"].append(pull_request["number"])
+            columns["created"].append(pull_request["createdAt"][:-1])
+            columns["comments"].append(
+                pull_request["comments"]["totalCount"])
+            columns["pr_lines_changed"].append(
+                pull_request["deletions"] + pull_request["additions"])
+            columns["start_date"].append(get_start_date(
+                pull_request["participants"]["nodes"], host_dict,
+                repo_dates, repo))
+            for review in pull_request["reviews"]["nodes"]:
+                review_prs.append(index)
+                review_comments.append(
+                    (review["body"] != "") + review["comments"]["totalCount"])
+            # Only reviews have a state.
+            timeline_prs.extend(
+                index for item in pull_request["timelineItems"]["nodes"]
+                if item and "state" in item)
+    return columns, review_prs, review_comments, timeline_prs
+
+
+def format_dates(dates):
+    """ Formats dates in "m/d/YYYY" form, without leading zeros.
+
+    Args:
+        dates: datetime64 array of the dates.
+
+    Returns:
+        List of the formatted dates.
+    """
+    months = dates.astype("datetime64[M]")
+    days = (dates.astype("datetime64[D]") - months).astype(np.int64) + 1
+    years = months.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = months.astype(np.int64) % 12 + 1
+    return [f"{month}/{day}/{year}" for month, day, year
+            in zip(months.tolist(), days.tolist(), years.tolist())]
+
+
+def build_stats_columns(results, host_dict, repo_dates):
+    """ Computes the pull request statistics of repositories as columns.
+
+    Args:
+        results: Iterable with the query results of each repository.
+        host_dict: dictionary with host logins as keys and start dates as
+                   values.
+        repo_dates: dictionary mapping repositories to start dates.
+
+    Returns:
+        Dictionary mapping each of the STATS_COLUMNS to a list with the
+        values of every pull request, in order.
+    """
+    columns, review_prs, review_comments, timeline_prs = \
+        flatten_pull_requests(results, host_dict, repo_dates)
+    num_pull_requests = len(columns["pr_path"])
+    if not num_pull_requests:
+        return {column: [] for column in STATS_COLUMNS}
+
+    total_comments = np.array(columns["comments"], dtype=np.int64)
+    if review_prs:
+        total_comments += np.bincount(
+            review_prs, weights=review_comments,
+            minlength=num_pull_requests).astype(np.int64)
+    review_count = np.bincount(
+        np.array(timeline_prs, dtype=np.int64), minlength=num_pull_requests)
+
+    created = np.array(columns["created"], dtype="datetime64[s]")
+    return {
+        "pr_path": columns["pr_path"],
+        "pr_number": columns["pr_number"],
+        "week": calculate_weeks(columns["start_date"], created),
+        "start_date": columns["start_date"],
+        "created_date": format_dates(created),
+        "total_comments": total_comments.tolist(),
+        "review_count": review_count.tolist(),
+        "pr_lines_changed": columns["pr_lines_changed"]
+    }
+
+
 def process_stats_query_results(writer, result, host_dict, repo_dates):
     """ Processes the query results for pull request statistics.
 
@@ -129,7 +290,7 @@ def process_stats_query_results(writer, result, host_dict, repo_dates):
 
     Args:
         writer: CSV writer to record the data in a CSV file.
-        pull_requests: the results from the query.
+        result: the results from the query.
         host_dict: dictionary with host logins as keys and start dates as
                    values.
         repo_dates: dictionary mapping repositories to start dates.
@@ -137,50 +298,45 @@ def process_stats_query_results(writer, result, host_dict, repo_dates):
     Returns:
         None.
     """
-    if result == []:
-        return
-    repo = result["data"]["repository"]["nameWithOwner"]
-    try:
-        pull_requests = result["data"]["repository"]["pullRequests"]["nodes"]
-    except (KeyError, TypeError):
-        print(f"PR statistics results {repo} does not have a"
-              "structure that is currently supported by RISR.")
-        return
-
-    for pull_request in pull_requests:
-        total_comments = pull_request["comments"]["totalCount"]
-        for review in pull_request["reviews"]["nodes"]:
-            if review["body"] != "" and review:
-                total_comments += 1
-            total_comments += review["comments"]["totalCount"]
-
-        participants = pull_request["participants"]["nodes"]
-        start_date = get_start_date(
-            participants, host_dict, repo_dates, repo)
-
-        # Calculate week if start_date was found
-        created_date = pull_request["createdAt"][:-1]
-        created_date = datetime.fromisoformat(created_date)
-        if start_date != "unknown":
-            week = calculate_week(start_date, created_date)
-        else:
-            week = "unknown"
+    columns = build_stats_columns([result], host_dict, repo_dates)
+    for row in zip(*[columns[column] for column in STATS_COLUMNS]):
+        writer.writerow(row)
 
-        created_date = created_date.strftime("%-m/%-d/%Y")
 
-        # Count the number of reviews before PR was closed.
-        review_count = 0
-        for item in pull_request["timelineItems"]["nodes"]:
-            if not item:
-                continue
-            review_count += 1
+def make_stats_sink(writer, host_dict, repo_dates):
+    """ Creates a sink that records the statistics of each repository.
+
+    Args:
+        writer: CSV writer to record the data in a CSV file.
+        host_dict: dictionary with host logins as keys and start dates as
+                   values.
+        repo_dates: dictionary mapping repositories to start dates.
+
+    Returns:
+        Function that takes a repository CSV row and the query results of
+        the repository.
+    """
+    def sink(row, result):
+        # pylint: disable=unused-argument
+        process_stats_query_results(writer, result, host_dict, repo_dates)
+    return sink
 
-        writer.writerow([
-            pull_request["resourcePath"], pull_request["number"],
-            week, start_date, created_date,
-            total_comments, review_count,
-            pull_request["deletions"] + pull_request["additions"]
-        ])
+
+def get_host_start_dates(host_csv):
+    """ Loads a dictionary of known host - start date mappings.
+
+    Args:
+        host_csv: The path of the host information CSV.
+
+    Returns:
+        Dictionary with host logins as keys and start dates as values.
+    """
+    host_dict = dict()
+    with open(host_csv, newline="") as in_csv:
+        reader = csv.DictReader(in_csv)
+        for row in reader:
+            host_dict[row["username"]] = row["start_date"]
+    return host_dict
 
 
 def main():
@@ -198,48 +354,66 @@ def main():
         total_comments: The total number of comments for a pull request.
         pr_lines_changed: The number of lines of code that were changed in a
             pull request.
+
+    The statistics of each repository are committed to a checkpoint as
+    they are written, so a run that fails resumes after the last completed
+    repository.
+
+    With the --from-lake flag, the statistics are computed from the latest
+    responses in the response lake, without sending any query, by several
+    processes.
+
+    With the --parquet flag, the CSV is also converted to pr_stats.parquet,
+    in which unknown weeks and start dates are null.
     """
+    # pylint: disable=too-many-locals
 
-    arg_count = len(sys.argv)
+    from_lake = "--from-lake" in sys.argv
+    parquet = PARQUET_FLAG in sys.argv
+    args = [arg for arg in sys.argv[1:]
+            if arg not in ("--from-lake", PARQUET_FLAG)]
 
     # If no extra arguments are given, then get pull request comments from
     # all repositories (capstone and starter).
-    if arg_count == 1:
+    if not args:
         repo_csv = "data/repos.csv"
         stats_csv = "data/pr_stats.csv"
         host_csv = "data/host_info.csv"
+        checkpoint_json = "data/pr_stats_checkpoint.json"
     else:
         # If in testing mode, then use testing files.
-        if sys.argv[1] == "test":
+        if args[0] == "test":
             repo_csv = "data/test_repos.csv"
             stats_csv = "data/test_pr_stats.csv"
             host_csv = "data/test_host_info.csv"
+            checkpoint_json = "data/test_pr_stats_checkpoint.json"
         else:
-            raise Exception(f"Unsupported mode {sys.argv[1]}.")
+            raise Exception(f"Unsupported mode {args[0]}.")
 
     if not os.path.isfile(repo_csv):
         raise Exception("The CSV for repositories does not exist.")
 
-    # Load a dictionary of known host - start date mappings.
-    host_dict = dict()
-    with open(host_csv, newline="") as in_csv:
-        reader = csv.DictReader(in_csv)
-        for row in reader:
-            host_dict[row["username"]] = row["start_date"]
+    cache = enable_cache("pr_stats")
 
-    repo_dates = dict()
-    with open(repo_csv, newline="") as in_csv, \
-            open(stats_csv, "w", newline="") as out_csv:
-        reader = csv.DictReader(in_csv)
-        writer = csv.writer(out_csv)
-        writer.writerow([
-            "pr_path", "pr_number", "week", "start_date", "created_date",
-            "total_comments", "review_count", "pr_lines_changed"
+    host_dict = get_host_start_dates(host_csv)
+
+    with open(repo_csv, newline="") as in_csv:
+        rows = list(csv.DictReader(in_csv))
+
+    if from_lake:
+        run_transform("pr_stats", rows, [
+            (stats_csv, STATS_COLUMNS, make_stats_sink, (host_dict, dict()))
         ])
-        for row in reader:
-            query_results = get_pr_stats(row["name"], row["owner"])
-            process_stats_query_results(
-                writer, query_results, host_dict, repo_dates)
+    else:
+        checkpoint = Checkpoint(checkpoint_json)
+        checkpoint.open_output(stats_csv, STATS_COLUMNS)
+        run_with_checkpoint(checkpoint, "pr_stats", rows, get_all_pr_stats,
+                            make_stats_sink(checkpoint, host_dict, dict()))
+    if parquet:
+        write_parquet(stats_csv, STATS_TYPES)
+
+    if cache:
+        print(cache.report())
 
 
 if __name__ == "__main__":
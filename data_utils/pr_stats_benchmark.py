@@ -0,0 +1,157 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Benchmark for the computation of the pull request statistics.
+
+Compares the previous per-pull request loops against the columnar
+build_stats_columns, on synthetic query results, and checks that both write
+the same CSV.
+
+Usage: python pr_stats_benchmark.py [number of pull requests]
+"""
+
+import csv
+import io
+import random
+import sys
+import time
+from datetime import datetime
+import pr_stats
+
+PULL_REQUESTS_PER_REPO = 50
+HOST_DICT = {"host0": "5/18/2020", "host1": "6/15/2020", "host2": "7/6/2020"}
+
+
+def make_results(num_pull_requests):
+    """ Creates synthetic pull request statistics query results.
+
+    Args:
+        num_pull_requests: The total number of pull requests.
+
+    Returns:
+        List with the query results of each repository.
+    """
+    rand = random.Random(0)
+    results = []
+    for number in range(num_pull_requests):
+        if number % PULL_REQUESTS_PER_REPO == 0:
+            pull_requests = []
+            results.append({"data": {"repository": {
+                "nameWithOwner": f"intern/repo{len(results)}",
+                "pullRequests": {"nodes": pull_requests}}}})
+        pull_requests.append({
+            "resourcePath": f"/intern/repo{len(results)}/pull/{number}",
+            "number": number,
+            "createdAt": f"2020-0{rand.randint(5, 8)}-"
+                         f"{rand.randint(10, 28)}T12:00:00Z",
+            "deletions": rand.randint(0, 100),
+            "additions": rand.randint(0, 500),
+            "comments": {"totalCount": rand.randint(0, 5)},
+            "reviews": {"nodes": [
+                {"body": rand.choice(["", "LGTM"]),
+                 "comments": {"totalCount": rand.randint(0, 3)}}
+                for _ in range(rand.randint(0, 3))]},
+            "participants": {"nodes": [
+                {"login": f"intern{rand.randint(0, 9)}"},
+                {"login": f"host{rand.randint(0, 5)}"}]},
+            "timelineItems": {"nodes": [
+                {"state": "APPROVED"} for _ in range(rand.randint(0, 2))]}
+        })
+    return results
+
+
+def process_with_loops(writer, result, host_dict, repo_dates):
+    """ The previous implementation of process_stats_query_results. """
+    repo = result["data"]["repository"]["nameWithOwner"]
+    for pull_request in result["data"]["repository"]["pullRequests"]["nodes"]:
+        total_comments = pull_request["comments"]["totalCount"]
+        for review in pull_request["reviews"]["nodes"]:
+            if review["body"] != "" and review:
+                total_comments += 1
+            total_comments += review["comments"]["totalCount"]
+
+        participants = pull_request["participants"]["nodes"]
+        start_date = pr_stats.get_start_date(
+            participants, host_dict, repo_dates, repo)
+
+        created_date = datetime.fromisoformat(pull_request["createdAt"][:-1])
+        if start_date != "unknown":
+            week = pr_stats.calculate_week(start_date, created_date)
+        else:
+            week = "unknown"
+
+        review_count = 0
+        for item in pull_request["timelineItems"]["nodes"]:
+            if not item or "state" not in item:
+                continue
+            review_count += 1
+
+        writer.writerow([
+            pull_request["resourcePath"], pull_request["number"],
+            week, start_date, created_date.strftime("%-m/%-d/%Y"),
+            total_comments, review_count,
+            pull_request["deletions"] + pull_request["additions"]
+        ])
+
+
+def time_stats(process, results):
+    """ Measures the time to write the statistics of every repository.
+
+    Args:
+        process: Function that takes a CSV writer, the list of results and
+            the repository start dates, and writes the statistics.
+        results: List with the query results of each repository.
+
+    Returns:
+        Tuple with the time in seconds and the CSV contents.
+    """
+    out_csv = io.StringIO()
+    start = time.perf_counter()
+    process(csv.writer(out_csv), results, dict())
+    return time.perf_counter() - start, out_csv.getvalue()
+
+
+def main():
+    """ Prints the time of each implementation and the speedup. """
+    num_pull_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    results = make_results(num_pull_requests)
+
+    def loops(writer, results, repo_dates):
+        for result in results:
+            process_with_loops(writer, result, HOST_DICT, repo_dates)
+
+    def per_repository(writer, results, repo_dates):
+        for result in results:
+            pr_stats.process_stats_query_results(writer, result, HOST_DICT,
+                                                 repo_dates)
+
+    def columnar(writer, results, repo_dates):
+        columns = pr_stats.build_stats_columns(results, HOST_DICT,
+                                               repo_dates)
+        writer.writerows(zip(*[columns[column]
+                               for column in pr_stats.STATS_COLUMNS]))
+
+    loop_time, expected = time_stats(loops, results)
+    print(f"Loops: {loop_time:.2f} s for {num_pull_requests} pull requests")
+    for name, process in [("Columnar, all repositories", columnar),
+                          ("Columnar, per repository", per_repository)]:
+        elapsed, contents = time_stats(process, results)
+        if contents != expected:
+            raise Exception(f"{name} does not match the loops.")
+        print(f"{name}: {elapsed:.2f} s, "
+              f"speedup {loop_time / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -80,7 +80,66 @@ class PrStatsTest(unittest.TestCase):
         self.assertEqual(repo_dates[repo], "05/12/2020")
 
 
-    @patch("pr_stats.get_pr_stats")
+    def test_build_stats_columns(self):
+        """ Test to check the statistics columns, including pull requests
+        before the first known host and pull requests before the start
+        date. """
+        def make_pull_request(number, created, logins, reviews=(), items=()):
+            return {
+                "resourcePath": f"/intern/risr/pull/{number}",
+                "number": number,
+                "createdAt": created,
+                "deletions": 1,
+                "additions": number,
+                "comments": {"totalCount": 1},
+                "reviews": {"nodes": [
+                    {"body": body, "comments": {"totalCount": count}}
+                    for body, count in reviews]},
+                "participants": {"nodes": [
+                    {"login": login} if login else None
+                    for login in logins]},
+                "timelineItems": {"nodes": list(items)}
+            }
+
+        results = [{
+            "data": {
+                "repository": {
+                    "nameWithOwner": "intern/risr",
+                    "pullRequests": {"nodes": [
+                        make_pull_request(
+                            1, "2020-05-10T23:00:00Z", ["intern"],
+                            [("LGTM", 2), ("", 1)],
+                            [{"state": "APPROVED"}, {}, None]),
+                        make_pull_request(
+                            2, "2020-05-01T10:00:00Z",
+                            [None, "host2", "host1"]),
+                        make_pull_request(
+                            3, "2020-06-30T00:00:00Z", ["host1"],
+                            items=[{"state": "COMMENTED"}])
+                    ]}
+                }
+            }
+        }, []]
+        repo_dates = dict()
+        columns = pr_stats.build_stats_columns(
+            results, {"host1": "05/12/2020", "host2": "6/1/2020"},
+            repo_dates)
+        self.assertEqual(columns, {
+            "pr_path": ["/intern/risr/pull/1", "/intern/risr/pull/2",
+                        "/intern/risr/pull/3"],
+            "pr_number": [1, 2, 3],
+            "week": ["unknown", 5, 5],
+            "start_date": ["unknown", "6/1/2020", "6/1/2020"],
+            "created_date": ["5/10/2020", "5/1/2020", "6/30/2020"],
+            "total_comments": [5, 1, 1],
+            "review_count": [1, 0, 1],
+            "pr_lines_changed": [2, 3, 4]
+        })
+        self.assertEqual(repo_dates, {"intern/risr": "6/1/2020"})
+        self.assertEqual(pr_stats.build_stats_columns([[]], {}, {}),
+                         {column: [] for column in pr_stats.STATS_COLUMNS})
+
+    @patch("pr_stats.get_all_pr_stats")
     def test_get_pr_stats(self, mock_results):
         """ Test for getting test repository PR statistics.
 
@@ -91,7 +150,7 @@ class PrStatsTest(unittest.TestCase):
 
         # Mock results: pull requests for RISR repository.
         # pylint: disable=line-too-long
-        mock_results.return_value = {
+        mock_results.return_value = [{
             "data": {
                 "repository": {
                     "nameWithOwner": "googleinterns/risr",
@@ -268,7 +327,7 @@ class PrStatsTest(unittest.TestCase):
                     }
                 }
             }
-        }
+        }]
 
         pr_stats_path = "data/test_pr_stats.csv"
 
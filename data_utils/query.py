@@ -14,17 +14,323 @@
 
 """ Module for sending a request to the Github API. """
 
+import asyncio
 import os
+import random
+import threading
 from time import sleep
 import requests
+from requests.adapters import HTTPAdapter
+from crawl import get_concurrency
+from rate_limit import BASE_BACKOFF, parse_retry_after
+from response_cache import ResponseCache
+from token_pool import TokenPool, get_tokens_from_env
 
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
 
-def run_query(query, attempt=1):
-    """Sends request to Github GraphQL API v4.
+# Number of keep-alive connections kept open to the Github API.
+DEFAULT_POOL_SIZE = 10
+
+# Seconds to wait for the Github API before giving up on a request.
+REQUEST_TIMEOUT = 60
+
+# Fields that report the cost of a query and the remaining budget.
+RATE_LIMIT_FIELDS = """rateLimit {
+            cost
+            remaining
+            resetAt
+        }"""
+
+# Number of times a query is sent before giving up.
+MAX_ATTEMPTS = 5
+
+# Status codes returned for rate limiting and temporary server errors.
+# pylint: disable=no-member
+RETRY_STATUS_CODES = {
+    requests.codes.forbidden,
+    requests.codes.too_many_requests,
+    requests.codes.bad_gateway,
+    requests.codes.service_unavailable,
+    requests.codes.gateway_timeout
+}
+
+# Seconds that cached responses stay valid for each data_utils stage.
+CACHE_TTLS = {
+    "repos": 24 * 60 * 60,
+    "host": 7 * 24 * 60 * 60,
+    "pr_stats": 24 * 60 * 60,
+    "pr_comments": 24 * 60 * 60,
+    "extract": 24 * 60 * 60
+}
+
+# Maximum size of the response cache of a stage if RISR_CACHE_MAX_MB is not
+# set.
+DEFAULT_CACHE_MAX_MB = 1024
+
+# Client shared by every query sent through run_query.
+_client = None  # pylint: disable=invalid-name
+
+# Response cache used by the shared client, if enabled.
+_cache = None  # pylint: disable=invalid-name
+
+
+class GraphQLClient:
+    """ Client for the Github GraphQL API v4.
+
+    The client owns a pooled requests.Session, so consecutive queries reuse
+    keep-alive connections instead of opening a new TCP and TLS connection
+    for every request.
+
+    Requests are spread across a TokenPool, paced by the RateLimiter of the
+    token they are sent with, and retried with backoff when Github reports a
+    rate limit or a temporary server error. Successful results can be kept
+    in a ResponseCache so that repeated queries are answered from disk.
+
+    Crawls may run inside the workers of other crawls, for example to fetch
+    the pages of a batch, so the number of requests in flight is bounded by
+    the client itself rather than by each crawl.
+
+    Attributes:
+        url: The GraphQL endpoint that queries are sent to.
+        session: The requests.Session used for every query.
+        token_pool: The TokenPool that chooses the token for each query.
+        cache: The ResponseCache for query results, or None.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, tokens=None, url=GITHUB_GRAPHQL_URL,
+                 pool_size=DEFAULT_POOL_SIZE, token_pool=None, cache=None,
+                 max_in_flight=None):
+        """ Creates a client with a connection pool of the given size.
+
+        Args:
+            tokens: List of Github Personal Access Tokens. Read from the
+                GITHUB_PAT environment variable if not given.
+            url: The GraphQL endpoint that queries are sent to.
+            pool_size: The maximum number of connections kept open. Raised
+                to max_in_flight if it is lower.
+            token_pool: The TokenPool that chooses the token for each query.
+                Created from tokens if not given.
+            cache: The ResponseCache for query results. Results are not
+                cached if not given.
+            max_in_flight: The maximum number of requests sent at once by
+                every thread together. Read from the RISR_CONCURRENCY
+                environment variable if not given.
+
+        Raises:
+            Exception: No Github Personal Access Token is available.
+        """
+
+        # Get the Github Personal Access Tokens from your local environment
+        # since authentication is required to make large requests to the
+        # Github API. You can set the environment variable with the following
+        # command:
+        #     $ export GITHUB_PAT="YOUR GITHUB PERSONAL ACCESS TOKEN HERE"
+        if token_pool is None:
+            if tokens is None:
+                tokens = get_tokens_from_env()
+            token_pool = TokenPool(tokens)
+
+        if max_in_flight is None:
+            max_in_flight = get_concurrency()
+        pool_size = max(pool_size, max_in_flight)
+
+        self.url = url
+        self.token_pool = token_pool
+        self.cache = cache
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive"
+        })
+
+    def _post(self, query):
+        """ Sends a single request with the token that has most headroom.
+
+        Args:
+            query: A string containing the query.
+
+        Returns:
+            Tuple with the requests.Response and the RateLimiter of the token
+            it was sent with.
+        """
+        with self._in_flight:
+            token, rate_limiter = self.token_pool.acquire()
+            try:
+                rate_limiter.acquire()
+                request = self.session.post(
+                    self.url,
+                    headers={"Authorization": "token " + token},
+                    json={"query": query},
+                    timeout=REQUEST_TIMEOUT)
+                rate_limiter.update_from_headers(request.headers)
+            finally:
+                self.token_pool.release(token)
+        return request, rate_limiter
+
+    def run_query(self, query, partial=False, use_cache=True):
+        """Sends request to Github GraphQL API v4.
+
+        Requests that fail because of rate limiting or temporary server
+        errors are sent again, possibly with another token, and the results
+        of the first successful attempt are returned.
+
+        Args:
+            query: A string containing the query.
+            partial: Whether to return the results of a query that has
+                errors in some of its fields, such as a batch query with a
+                repository that no longer exists. Partial results are not
+                cached.
+            use_cache: Whether the results may be read from and written to
+                the response cache.
+
+        Returns:
+            JSON. A JSON object containing the results of the query.
+        """
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            result = cache.get(query)
+            if result is not None:
+                return result
+
+        request = None
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                request, rate_limiter = self._post(query)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                print(f"Request to Github GraphQL API failed: {error}. "
+                      "Trying again.")
+                sleep(random.uniform(0, BASE_BACKOFF * 2 ** attempt))
+                continue
+
+            if request.status_code == requests.codes.ok:
+                result = request.json()
+                if "errors" not in result.keys():
+                    rate_limiter.update_from_result(result)
+                    if cache is not None:
+                        cache.put(query, result)
+                    return result
+                if not is_rate_limited(result):
+                    print("There was an error in the Github API query.",
+                          result["errors"] if partial else result)
+                    if partial and result.get("data"):
+                        return result
+                    return []
+            elif request.status_code not in RETRY_STATUS_CODES:
+                break
+
+            print(f"Request status code: {request.status_code}. Trying again.")
+            rate_limiter.backoff(attempt, parse_retry_after(request.headers))
+
+        print("Request to Github GraphQL API failed.", request)
+        return []
+
+    async def run_query_async(self, query, executor=None):
+        """ Sends request to Github GraphQL API v4 without blocking the loop.
+
+        The request runs on an executor thread, so many queries can share the
+        pooled session while the event loop keeps scheduling other work.
+
+        Args:
+            query: A string containing the query.
+            executor: The concurrent.futures executor that sends the request.
+                The event loop's default executor is used if not given.
+
+        Returns:
+            JSON. A JSON object containing the results of the query.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, self.run_query, query)
+
+    def close(self):
+        """ Closes every pooled connection. """
+        self.session.close()
+
+
+def is_rate_limited(result):
+    """ Checks if a query failed because of a GraphQL rate limit error.
+
+    Args:
+        result: The JSON results of a query.
+
+    Returns:
+        bool. True if any of the errors is a rate limit error.
+    """
+    return any(error.get("type") == "RATE_LIMITED"
+               for error in result["errors"])
+
+
+def get_client():
+    """ Gets the client shared by every query sent through run_query.
+
+    The client is created on first use so that GITHUB_PAT is read once per
+    process instead of once per query, and every script shares the budget
+    of all configured tokens.
+
+    Returns:
+        GraphQLClient. The shared client.
+
+    Raises:
+        Exception: An error occurred when creating the client.
+    """
+    global _client  # pylint: disable=global-statement
+    if _client is None:
+        _client = GraphQLClient(cache=_cache)
+    return _client
+
+
+def enable_cache(stage):
+    """ Caches the responses of a data_utils stage on disk.
+
+    The cache is only enabled if the RISR_CACHE_DIR environment variable is
+    set. Each stage has its own subdirectory and time to live, and its size
+    is bounded by RISR_CACHE_MAX_MB:
+        $ export RISR_CACHE_DIR="cache"
+        $ export RISR_CACHE_MAX_MB=1024
+
+    Args:
+        stage: The name of the stage, which is a key of CACHE_TTLS.
+
+    Returns:
+        ResponseCache. The cache used by the shared client, or None if
+            RISR_CACHE_DIR is not set.
+    """
+    global _cache  # pylint: disable=global-statement
+    cache_dir = os.getenv("RISR_CACHE_DIR")
+    if not cache_dir:
+        return None
+    max_mb = int(os.getenv("RISR_CACHE_MAX_MB", str(DEFAULT_CACHE_MAX_MB)))
+    _cache = ResponseCache(os.path.join(cache_dir, stage),
+                           CACHE_TTLS[stage], max_mb * 2 ** 20)
+    if _client is not None:
+        _client.cache = _cache
+    return _cache
+
+
+def get_cache():
+    """ Gets the response cache of the current stage.
+
+    Returns:
+        ResponseCache. The cache from enable_cache(), or None if the cache
+            is not enabled.
+    """
+    return _cache
+
+
+def run_query(query, partial=False, use_cache=True):
+    """Sends request to Github GraphQL API v4 using the shared client.
 
     Args:
         query: A string containing the query.
-        attempt: The number of attempts to send request for a particular query.
+        partial: Whether to return the results of a query that has errors in
+            some of its fields.
+        use_cache: Whether the results may be read from and written to the
+            response cache.
 
     Returns:
         JSON. A JSON object containing the results of the query.
@@ -32,37 +338,20 @@ def run_query(query, attempt=1):
     Raises:
         Exception: An error occurred when sending a request to the Github API.
     """
+    return get_client().run_query(query, partial, use_cache)
+
+
+async def run_query_async(query, executor=None):
+    """ Async counterpart of run_query that uses the shared client.
 
-    # Get the Github Personal Access Token from your local environment since
-    # authentication is required to make large requests to the Github API.
-    # You can set the environment variable with the following command:
-    #     $ export GITHUB_PAT="YOUR GITHUB PERSONAL ACCESS TOKEN HERE"
-
-    github_pat = os.getenv("GITHUB_PAT")
-
-    if github_pat is None:
-        raise Exception("GITHUB_PAT environment variable is not set.")
-
-    headers = {"Authorization": "token " + github_pat}
-    request = requests.post("https://api.github.com/graphql",
-                            headers=headers,
-                            json={"query": query})
-
-    # pylint: disable=no-member
-    if request.status_code == requests.codes.ok:
-        result = request.json()
-        if "errors" in result.keys():
-            print("There was an error in the Github API query.",
-                  result)
-            return []
-        return result
-
-    # Try to send request again in case it failed due to rate limiting.
-    if (attempt == 1 and
-            (request.status_code == requests.codes.forbidden
-             or request.status_code == requests.codes.bad_gateway)):
-        sleep(1)
-        print(f"Request status code: {request.status_code}. Trying again.")
-        run_query(query, 2)
-    print("Request to Github GraphQL API failed.", request)
-    return []
+    Args:
+        query: A string containing the query.
+        executor: The concurrent.futures executor that sends the request.
+
+    Returns:
+        JSON. A JSON object containing the results of the query.
+
+    Raises:
+        Exception: An error occurred when sending a request to the Github API.
+    """
+    return await get_client().run_query_async(query, executor)
@@ -0,0 +1,74 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Benchmark for the per-query latency of the Github API client.
+
+Compares a new requests.post call per query against the pooled
+GraphQLClient, using a local stand-in server for the Github API. The
+stand-in server does not use TLS, so the speedup against the real API, where
+every new connection also pays for a TLS handshake, is larger.
+
+Usage: python query_benchmark.py [number of queries]
+"""
+
+import sys
+import time
+import requests
+from fake_github import FakeGithubServer
+from query import GraphQLClient
+
+
+def time_queries(send, num_queries):
+    """ Measures the average latency of a query.
+
+    Args:
+        send: Function that sends one query.
+        num_queries: The number of queries to send.
+
+    Returns:
+        float. The average latency in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(num_queries):
+        send()
+    return (time.perf_counter() - start) * 1000 / num_queries
+
+
+def main():
+    """ Prints the average query latency with and without pooling. """
+    num_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    query = "{ viewer { login } }"
+
+    with FakeGithubServer() as server:
+        headers = {"Authorization": "token benchmark"}
+        unpooled = time_queries(
+            lambda: requests.post(server.url, headers=headers,
+                                  json={"query": query}),
+            num_queries)
+        unpooled_connections = server.connections
+
+        client = GraphQLClient(tokens=["benchmark"], url=server.url)
+        pooled = time_queries(lambda: client.run_query(query), num_queries)
+        pooled_connections = server.connections - unpooled_connections
+        client.close()
+
+    print(f"requests.post: {unpooled:.3f} ms/query, "
+          f"{unpooled_connections} connections")
+    print(f"GraphQLClient: {pooled:.3f} ms/query, "
+          f"{pooled_connections} connections")
+    print(f"Speedup: {unpooled / pooled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
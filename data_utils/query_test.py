@@ -14,8 +14,14 @@
 
 """ Tests for the query module. """
 
+import asyncio
 import os
+import threading
+import time
 import unittest
+from unittest.mock import patch
+from crawl import crawl
+from fake_github import FakeGithubServer
 import query
 
 
@@ -47,5 +53,147 @@ class QueryTest(unittest.TestCase):
                          name_with_owner)
 
 
+class GraphQLClientTest(unittest.TestCase):
+    """ GraphQL client test class using a local stand-in server. """
+
+    def test_reuses_connection(self):
+        """ Test to check that consecutive queries share one connection. """
+        with FakeGithubServer() as server:
+            client = query.GraphQLClient(tokens=["test"], url=server.url)
+            for _ in range(5):
+                self.assertEqual(client.run_query("{}"), {"data": {}})
+            client.close()
+            self.assertEqual(server.requests, 5)
+            self.assertEqual(server.connections, 1)
+
+    def test_request_headers(self):
+        """ Test to check that the token and gzip encoding are sent. """
+        received = []
+
+        def respond(query_input, headers):
+            received.append((query_input, headers))
+            return 200, {}, {"data": {}}
+
+        with FakeGithubServer(respond) as server:
+            client = query.GraphQLClient(tokens=["test"], url=server.url)
+            client.run_query("{ viewer { login } }")
+            client.close()
+        query_input, headers = received[0]
+        self.assertEqual(query_input, "{ viewer { login } }")
+        self.assertEqual(headers["Authorization"], "token test")
+        self.assertIn("gzip", headers["Accept-Encoding"])
+
+    def test_error_response(self):
+        """ Test to check that queries with errors return an empty list. """
+        def respond(query_input, headers):
+            # pylint: disable=unused-argument
+            return 200, {}, {"errors": [{"message": "error"}]}
+
+        with FakeGithubServer(respond) as server:
+            client = query.GraphQLClient(tokens=["test"], url=server.url)
+            self.assertEqual(client.run_query("{}"), [])
+            client.close()
+
+    @patch("rate_limit.random.uniform", return_value=0)
+    def test_retry_returns_result(self, mock_uniform):
+        """ Test to check that the results of a successful retry are
+        returned after rate limiting and server errors. """
+        responses = [
+            (403, {"Retry-After": "0"}, {"message": "secondary rate limit"}),
+            (502, {}, {}),
+            (200, {}, {"errors": [{"type": "RATE_LIMITED"}]}),
+            (200, {}, {"data": {"viewer": {"login": "test"}}})
+        ]
+
+        def respond(query_input, headers):
+            # pylint: disable=unused-argument
+            return responses.pop(0)
+
+        with FakeGithubServer(respond) as server:
+            client = query.GraphQLClient(tokens=["test"], url=server.url)
+            result = client.run_query("{ viewer { login } }")
+            client.close()
+            self.assertEqual(server.requests, 4)
+        self.assertEqual(mock_uniform.call_count, 2)
+        self.assertEqual(result["data"]["viewer"]["login"], "test")
+
+    def test_no_retry_on_bad_request(self):
+        """ Test to check that other failed requests are not sent again. """
+        def respond(query_input, headers):
+            # pylint: disable=unused-argument
+            return 401, {}, {"message": "Bad credentials"}
+
+        with FakeGithubServer(respond) as server:
+            client = query.GraphQLClient(tokens=["test"], url=server.url)
+            self.assertEqual(client.run_query("{}"), [])
+            client.close()
+            self.assertEqual(server.requests, 1)
+
+    def test_run_query_async(self):
+        """ Test to check that async queries return the query results. """
+        with FakeGithubServer() as server:
+            client = query.GraphQLClient(tokens=["test"], url=server.url)
+
+            async def run_queries():
+                return await asyncio.gather(
+                    *[client.run_query_async("{}") for _ in range(3)])
+
+            loop = asyncio.new_event_loop()
+            try:
+                results = loop.run_until_complete(run_queries())
+            finally:
+                loop.close()
+            client.close()
+        self.assertEqual(results, [{"data": {}}] * 3)
+
+    def test_max_in_flight(self):
+        """ Test to check that nested crawls share the limit of requests in
+        flight of the client. """
+        lock = threading.Lock()
+        in_flight = [0]
+        peaks = []
+
+        def respond(query_input, headers):
+            # pylint: disable=unused-argument
+            with lock:
+                in_flight[0] += 1
+                peaks.append(in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return 200, {}, {"data": {}}
+
+        with FakeGithubServer(respond) as server:
+            client = query.GraphQLClient(tokens=["test"], url=server.url,
+                                         max_in_flight=3)
+            for limiter in client.token_pool.limiters.values():
+                limiter.rate = limiter.max_rate = 10 ** 6
+
+            def fetch_pages(index):
+                return list(crawl(client.run_query,
+                                  [(f"{{ p{index}_{page} }}",)
+                                   for page in range(4)], 3))
+
+            results = list(crawl(fetch_pages, [(index,) for index in range(3)],
+                                 3))
+            client.close()
+        self.assertEqual(len(peaks), 12)
+        self.assertEqual(results, [[{"data": {}}] * 4] * 3)
+        self.assertLessEqual(max(peaks), 3)
+
+    def test_shared_client(self):
+        """ Test to check that run_query always uses the same client. """
+        cur_github_pat = os.environ.get("GITHUB_PAT")
+        os.environ["GITHUB_PAT"] = "test"
+        try:
+            self.assertIs(query.get_client(), query.get_client())
+        finally:
+            query._client = None  # pylint: disable=protected-access
+            if cur_github_pat is None:
+                del os.environ["GITHUB_PAT"]
+            else:
+                os.environ["GITHUB_PAT"] = cur_github_pat
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,212 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for pacing requests within the Github API rate limits. """
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+# Github's secondary rate limit for the GraphQL API allows about 2,000 points
+# per minute, no matter how much of the hourly budget is left.
+MAX_POINTS_PER_SECOND = 2000 / 60
+
+# Number of points that may be spent at once after an idle period.
+BURST_POINTS = 50
+
+# Lowest pacing rate, so that a nearly spent budget still makes progress.
+MIN_POINTS_PER_SECOND = 0.01
+
+# Exponential backoff bounds in seconds for secondary rate limits and
+# server errors.
+BASE_BACKOFF = 1
+MAX_BACKOFF = 60
+
+
+def parse_reset_at(reset_at):
+    """ Converts a GraphQL rateLimit resetAt value to a Unix timestamp.
+
+    Args:
+        reset_at: Date and time in ISO format, for example
+            "2020-06-11T21:51:20Z".
+
+    Returns:
+        float. Seconds since the epoch.
+    """
+    reset_date = datetime.strptime(reset_at, "%Y-%m-%dT%H:%M:%SZ")
+    return reset_date.replace(tzinfo=timezone.utc).timestamp()
+
+
+def parse_retry_after(headers):
+    """ Gets the number of seconds requested by a Retry-After header.
+
+    Args:
+        headers: The response headers.
+
+    Returns:
+        int. Seconds to wait, or None if the header is missing or is not a
+            number of seconds.
+    """
+    retry_after = headers.get("Retry-After")
+    if retry_after is None or not retry_after.strip().isdigit():
+        return None
+    return int(retry_after)
+
+
+class RateLimiter:  # pylint: disable=too-many-instance-attributes
+    """ Token bucket that paces requests to the Github GraphQL API.
+
+    The bucket holds query points. Each request takes as many points as the
+    last reported query cost, and the bucket refills at the highest rate that
+    neither spends the remaining hourly budget before it resets nor exceeds
+    the secondary rate limit. All threads that share a limiter pause together
+    when Github asks clients to back off.
+
+    Attributes:
+        max_rate: The highest refill rate in points per second.
+        rate: The current refill rate in points per second.
+        burst: The capacity of the bucket in points.
+        cost: The last reported cost of a query in points.
+        remaining: The remaining hourly budget in points, if known.
+        reset_at: Unix timestamp at which the budget resets, if known.
+        blocked_until: Unix timestamp before which no request may be sent.
+    """
+
+    def __init__(self, max_rate=MAX_POINTS_PER_SECOND, burst=BURST_POINTS,
+                 clock=time.time, sleep=time.sleep):
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.burst = burst
+        self.cost = 1
+        self.remaining = None
+        self.reset_at = None
+        self.blocked_until = 0
+        self._tokens = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _get_delay(self, now):
+        """ Takes points from the bucket or computes how long to wait.
+
+        Args:
+            now: The current Unix timestamp.
+
+        Returns:
+            float. Seconds to wait, or 0 if the request may be sent now.
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        cost = min(self.cost, self.burst)
+        if (self.remaining is not None and self.remaining < cost
+                and self.reset_at is not None and now < self.reset_at):
+            return self.reset_at - now
+
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= cost:
+            self._tokens -= cost
+            return 0
+        return (cost - self._tokens) / self.rate
+
+    def acquire(self):
+        """ Blocks until the next request may be sent. """
+        while True:
+            with self._lock:
+                delay = self._get_delay(self._clock())
+            if delay <= 0:
+                return
+            self._sleep(delay)
+
+    def update(self, remaining=None, reset_at=None, cost=None):
+        """ Updates the budget and the pacing rate.
+
+        Args:
+            remaining: The remaining hourly budget in points.
+            reset_at: Unix timestamp at which the budget resets.
+            cost: The cost of the last query in points.
+        """
+        with self._lock:
+            if (remaining is not None and self.remaining is not None
+                    and reset_at is not None and reset_at == self.reset_at):
+                # Responses to concurrent requests can arrive out of order,
+                # and the budget only goes down within the same window.
+                remaining = min(remaining, self.remaining)
+            if remaining is not None:
+                self.remaining = remaining
+            if reset_at is not None:
+                self.reset_at = reset_at
+            if cost is not None:
+                self.cost = max(cost, 1)
+            if self.remaining is None or self.reset_at is None:
+                return
+            window = max(self.reset_at - self._clock(), 1)
+            self.rate = min(self.max_rate,
+                            max(self.remaining / window,
+                                MIN_POINTS_PER_SECOND))
+
+    def update_from_headers(self, headers):
+        """ Updates the budget from the X-RateLimit response headers.
+
+        Args:
+            headers: The response headers.
+        """
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_at = headers.get("X-RateLimit-Reset")
+        self.update(
+            remaining=int(remaining) if remaining is not None else None,
+            reset_at=int(reset_at) if reset_at is not None else None)
+
+    def update_from_result(self, result):
+        """ Updates the budget from the rateLimit field of a query result.
+
+        Args:
+            result: The JSON results of a query.
+        """
+        try:
+            rate_limit = result["data"]["rateLimit"]
+        except (KeyError, TypeError):
+            return
+        if not rate_limit:
+            return
+        reset_at = rate_limit.get("resetAt")
+        self.update(
+            remaining=rate_limit.get("remaining"),
+            reset_at=parse_reset_at(reset_at) if reset_at else None,
+            cost=rate_limit.get("cost"))
+
+    def backoff(self, attempt, retry_after=None):
+        """ Pauses every request after a secondary rate limit or an error.
+
+        Args:
+            attempt: The number of failed attempts so far, starting at 0.
+            retry_after: Seconds requested by a Retry-After header, if any.
+
+        Returns:
+            float. Seconds that requests are paused for.
+        """
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            # Full jitter spreads out the retries of concurrent requests.
+            delay = random.uniform(
+                0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+        with self._lock:
+            self.blocked_until = max(self.blocked_until,
+                                     self._clock() + delay)
+        return delay
@@ -0,0 +1,123 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the rate_limit module. """
+
+import unittest
+import rate_limit
+
+
+class FakeClock:
+    """ Clock that only moves forward when sleep is called. """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        """ Returns the current fake time. """
+        return self.now
+
+    def sleep(self, seconds):
+        """ Moves the fake time forward. """
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimitTest(unittest.TestCase):
+    """ Rate limit test class. """
+
+    def make_limiter(self, clock, max_rate=10, burst=2):
+        """ Creates a limiter that uses the fake clock. """
+        return rate_limit.RateLimiter(max_rate=max_rate, burst=burst,
+                                      clock=clock.time, sleep=clock.sleep)
+
+    def test_parse_reset_at(self):
+        """ Test to check conversion of resetAt to a timestamp. """
+        self.assertEqual(rate_limit.parse_reset_at("1970-01-01T00:01:40Z"),
+                         100)
+
+    def test_parse_retry_after(self):
+        """ Test to check parsing of the Retry-After header. """
+        self.assertEqual(rate_limit.parse_retry_after({"Retry-After": "30"}),
+                         30)
+        self.assertIsNone(rate_limit.parse_retry_after({}))
+        self.assertIsNone(rate_limit.parse_retry_after(
+            {"Retry-After": "Wed, 21 Oct 2020 07:28:00 GMT"}))
+
+    def test_token_bucket_pacing(self):
+        """ Test to check that requests beyond the burst are paced. """
+        clock = FakeClock()
+        limiter = self.make_limiter(clock)
+        for _ in range(4):
+            limiter.acquire()
+        # Two requests use up the burst, the next two wait 0.1s each.
+        self.assertAlmostEqual(clock.now - 1000.0, 0.2)
+
+    def test_rate_from_result(self):
+        """ Test to check that the rate spreads the remaining budget over the
+        time until it resets. """
+        clock = FakeClock(now=0)
+        limiter = self.make_limiter(clock)
+        limiter.update_from_result({
+            "data": {
+                "rateLimit": {
+                    "cost": 3,
+                    "remaining": 100,
+                    "resetAt": "1970-01-01T00:01:40Z"
+                }
+            }
+        })
+        self.assertEqual(limiter.cost, 3)
+        self.assertEqual(limiter.remaining, 100)
+        self.assertAlmostEqual(limiter.rate, 1)
+
+    def test_rate_capped(self):
+        """ Test to check that a large budget does not exceed the maximum
+        rate. """
+        clock = FakeClock(now=0)
+        limiter = self.make_limiter(clock)
+        limiter.update(remaining=5000, reset_at=10)
+        self.assertEqual(limiter.rate, 10)
+
+    def test_wait_for_reset(self):
+        """ Test to check that an exhausted budget waits for the reset. """
+        clock = FakeClock(now=0)
+        limiter = self.make_limiter(clock)
+        limiter.update_from_headers({
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": "60"
+        })
+        limiter.acquire()
+        self.assertGreaterEqual(clock.now, 60)
+
+    def test_backoff(self):
+        """ Test to check that backoff pauses requests and honors
+        Retry-After. """
+        clock = FakeClock(now=0)
+        limiter = self.make_limiter(clock)
+        self.assertEqual(limiter.backoff(0, retry_after=30), 30)
+        limiter.acquire()
+        self.assertGreaterEqual(clock.now, 30)
+
+        for attempt in range(10):
+            delay = limiter.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(
+                delay, min(rate_limit.MAX_BACKOFF,
+                           rate_limit.BASE_BACKOFF * 2 ** attempt))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,7 +17,39 @@
 import csv
 import sys
 import os
-from query import run_query
+from datetime import datetime, timedelta
+from columnar import PARQUET_FLAG, write_parquet
+from crawl import crawl
+from incremental import RowBuffer, WatermarkStore, upsert_csv
+from query import enable_cache, run_query
+
+# Github search returns at most this many results for a query, however many
+# pages are requested.
+MAX_SEARCH_RESULTS = 1000
+
+# Start of the first created date window. Github has no older repositories.
+SEARCH_START = "2008-01-01T00:00:00Z"
+
+# Date after which repositories of each type are created.
+EARLIEST_CREATED = {
+    "capstone": "2020-06-17"
+}
+
+# Columns of repos.csv.
+REPO_COLUMNS = [
+    "owner",
+    "name",
+    "created",
+    "pr_count",
+    "repo_type"
+]
+
+# Types of the columns of repos.parquet. Other columns are strings.
+REPO_TYPES = {
+    "created": "timestamp",
+    "pr_count": "int",
+    "repo_type": "category"
+}
 
 
 def get_repos_after(repo_query, cursor):
@@ -35,6 +67,11 @@ def get_repos_after(repo_query, cursor):
     """
 
     query = """{{
+        rateLimit {{
+            cost
+            remaining
+            resetAt
+        }}
         search(
             first: 100,
             {after}
@@ -50,6 +87,7 @@ def get_repos_after(repo_query, cursor):
                         }}
                         name
                         createdAt
+                        pushedAt
                         pullRequests {{
                             totalCount
                         }}
@@ -66,6 +104,29 @@ def get_repos_after(repo_query, cursor):
     return run_query(query.format(after=after, repo_query=repo_query))
 
 
+def search_repos(repo_query, result):
+    """ Gets the remaining pages of the results of a repository search.
+
+    Args:
+        repo_query: A string containing the query to find repositories.
+        result: The results of the first page of the search.
+
+    Returns:
+        List of the results of every page, starting with result. The last
+            page has no repositories.
+    """
+    results = [result]
+    while True:
+        try:
+            edges = result["data"]["search"]["edges"]
+        except (KeyError, TypeError):
+            return results
+        if not edges:
+            return results
+        result = get_repos_after(repo_query, edges[-1]["cursor"])
+        results.append(result)
+
+
 def process_query_results(writer, result, repo_type):
     """ Processes the query results for the repository search.
 
@@ -119,23 +180,35 @@ def query_generator(search="", loc="", org="", created="", sort=""):
     return f"""\"{query_str}\""""
 
 
-def get_query_from_repo_type(repo_type):
+def get_query_from_repo_type(repo_type, created_after="", pushed_after="",
+                             created_before=""):
     """ Calls query_generator with parameters for the specified repository type.
 
     Args:
         repo_type: the string with the repository type. Currently supports "starter",
         "capstone", and "test" (for testing purposes).
+        created_after: ISO 8601 date. If given, only repositories created
+            after it are searched.
+        pushed_after: ISO 8601 date. If given, only repositories pushed to
+            after it are searched.
+        created_before: ISO 8601 date. If given, only repositories created
+            between created_after and it, both included, are searched.
 
     Returns:
         Query string for the repository type.
     """
 
+    pushed = f"pushed:>{pushed_after}" if pushed_after else ""
+    earliest = EARLIEST_CREATED.get(repo_type, "")
+
     repo_query = ""
     if repo_type == "starter":
         # This query looks for a specific string in a repository README.md file.
         repo_query = query_generator(
             search="git clone https://github.com/googleinterns/step.git",
             loc="in:readme",
+            created=get_created_filter(
+                earliest, created_after, created_before, pushed),
             sort="sort:created-asc")
 
     elif repo_type == "capstone":
@@ -144,18 +217,247 @@ def get_query_from_repo_type(repo_type):
         repo_query = query_generator(search="step 2020",
                                      loc="in:name",
                                      org="googleinterns",
-                                     created="created:>2020-06-17",
+                                     created=get_created_filter(
+                                         earliest, created_after,
+                                         created_before, pushed),
                                      sort="sort:created-asc")
 
     elif repo_type == "test":
         # Look for the RISR repository.
         repo_query = query_generator(search="risr",
                                      loc="in:name",
-                                     org="googleinterns")
+                                     org="googleinterns",
+                                     created=get_created_filter(
+                                         earliest, created_after,
+                                         created_before, pushed))
 
     return repo_query
 
 
+def get_created_filter(earliest, created_after, created_before, pushed):
+    """ Combines the creation date qualifiers of a repository search.
+
+    Args:
+        earliest: The date after which repositories of the type are created,
+            or "".
+        created_after: The start of the creation dates, or "".
+        created_before: The end of the creation dates, or "".
+        pushed: The pushed date qualifier, or "".
+
+    Returns:
+        str. The qualifiers, such as "created:>2020-06-17".
+    """
+    after = max(earliest, created_after)
+    if created_before:
+        created = f"created:{after or SEARCH_START}..{created_before}"
+    elif after:
+        created = f"created:>{after}"
+    else:
+        created = ""
+    return " ".join(filter(None, [created, pushed]))
+
+
+def parse_date(date):
+    """ Parses a date from a search qualifier or from Github.
+
+    Args:
+        date: ISO 8601 date, such as "2020-06-17" or "2020-06-17T10:00:00Z".
+
+    Returns:
+        datetime. The date in UTC, without a time zone.
+    """
+    return datetime.fromisoformat(date.rstrip("Z"))
+
+
+def format_date(date):
+    """ Formats a date for a search qualifier.
+
+    Args:
+        date: datetime in UTC.
+
+    Returns:
+        str. The date, such as "2020-06-17T10:00:00Z".
+    """
+    return date.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_search_end(now):
+    """ Gets the end of the last created date window of a search.
+
+    The end is the next midnight rather than the current time, so the
+    queries of a search are the same all day long and can be answered by
+    the response cache.
+
+    Args:
+        now: The current datetime in UTC.
+
+    Returns:
+        datetime. The start of the next day.
+    """
+    return datetime.combine(now.date() + timedelta(days=1),
+                            datetime.min.time())
+
+
+def split_window(window):
+    """ Splits a created date window in two halves.
+
+    The halves share their middle second, since the search ranges include
+    both ends.
+
+    Args:
+        window: Tuple with the start and end datetimes of the window.
+
+    Returns:
+        List of the two windows.
+    """
+    start, end = window
+    middle = start + timedelta(seconds=(end - start).total_seconds() // 2)
+    return [(start, middle), (middle, end)]
+
+
+def get_repository_count(result):
+    """ Gets the total number of results of a repository search.
+
+    Args:
+        result: The results of a page of the search.
+
+    Returns:
+        int. The number of repositories, or 0 if the query failed.
+    """
+    try:
+        return result["data"]["search"]["repositoryCount"] or 0
+    except (KeyError, TypeError):
+        return 0
+
+
+def get_search_windows(repo_type, created_after, pushed_after, concurrency):
+    """ Splits a repository search into created date windows.
+
+    A window with more than MAX_SEARCH_RESULTS repositories is split in
+    half, recursively, until every window can be read completely. The first
+    pages of the windows at each level are fetched concurrently.
+
+    Args:
+        repo_type: The repository type.
+        created_after: ISO 8601 date. If given, only repositories created
+            from it on are searched.
+        pushed_after: ISO 8601 date. If given, only repositories pushed to
+            after it are searched.
+        concurrency: The maximum number of queries in flight at once.
+
+    Returns:
+        List of (query, results of the first page) tuples, one per window,
+            in created date order.
+    """
+    start = max(EARLIEST_CREATED.get(repo_type, ""), created_after)
+    pending = [(parse_date(start or SEARCH_START),
+                get_search_end(datetime.utcnow()))]
+    windows = []
+    while pending:
+        args_list = [(get_query_from_repo_type(
+            repo_type, created_after=format_date(window[0]),
+            pushed_after=pushed_after,
+            created_before=format_date(window[1])), "") for window in pending]
+        first_pages = crawl(get_repos_after, args_list, concurrency)
+        split_windows = []
+        for window, (repo_query, _), result in zip(
+                pending, args_list, first_pages):
+            count = get_repository_count(result)
+            if count > MAX_SEARCH_RESULTS and \
+                    window[1] - window[0] > timedelta(seconds=1):
+                split_windows.extend(split_window(window))
+                continue
+            if count > MAX_SEARCH_RESULTS:
+                print(f"Only {MAX_SEARCH_RESULTS} of the {count} repositories"
+                      f" created at {format_date(window[0])} can be found.")
+            windows.append((window, repo_query, result))
+        pending = split_windows
+
+    windows.sort(key=lambda window: window[0])
+    return [(repo_query, result) for _, repo_query, result in windows]
+
+
+def search_all_repos(repo_type, created_after="", pushed_after="",
+                     concurrency=None):
+    """ Gets every repository of a search, beyond Github's 1,000 results.
+
+    The search is split into created date windows by get_search_windows, and
+    the pages of all the windows are fetched concurrently.
+
+    Args:
+        repo_type: The repository type.
+        created_after: ISO 8601 date. If given, only repositories created
+            from it on are searched.
+        pushed_after: ISO 8601 date. If given, only repositories pushed to
+            after it are searched.
+        concurrency: The maximum number of queries in flight at once.
+
+    Yields:
+        The results of each page, in created date order. Repositories found
+        in an earlier page are removed, so each repository is only given
+        once.
+    """
+    windows = get_search_windows(repo_type, created_after, pushed_after,
+                                 concurrency)
+    seen = set()
+    for results in crawl(search_repos, windows, concurrency):
+        for result in results:
+            try:
+                edges = result["data"]["search"]["edges"]
+            except (KeyError, TypeError):
+                yield result
+                continue
+            unique_edges = []
+            for edge in edges:
+                key = (edge["node"]["owner"]["login"], edge["node"]["name"])
+                if key not in seen:
+                    seen.add(key)
+                    unique_edges.append(edge)
+            yield {"data": {"search": {"edges": unique_edges}}}
+
+
+def sync_repos(out_csv_path, watermark_json, repo_types):
+    """ Merges the new and recently pushed repositories into the CSV.
+
+    For each repository type, the search only covers the repositories
+    created after the newest creation date seen so far, and the ones pushed
+    to after the newest push seen so far, since only those can have new
+    pull requests. Rows are deduplicated by owner and name, so the pr_count
+    of a known repository is replaced with the new count.
+
+    Args:
+        out_csv_path: The path of the repositories CSV.
+        watermark_json: The path of the watermarks of the repository types.
+        repo_types: List of the repository types to search.
+    """
+    # pylint: disable=too-many-locals
+    watermarks = WatermarkStore(watermark_json)
+    buffer = RowBuffer()
+    for repo_type in repo_types:
+        created_key = f"{repo_type}:created"
+        pushed_key = f"{repo_type}:pushed"
+        searches = [{"created_after": watermarks.get(created_key)}]
+        if watermarks.get(pushed_key):
+            searches.append({"pushed_after": watermarks.get(pushed_key)})
+
+        new_watermarks = []
+        for search in searches:
+            for query_results in search_all_repos(repo_type, **search):
+                process_query_results(buffer, query_results, repo_type)
+                for edge in query_results["data"]["search"]["edges"]:
+                    new_watermarks.append(
+                        (created_key, edge["node"]["createdAt"]))
+                    new_watermarks.append(
+                        (pushed_key, edge["node"].get("pushedAt")))
+        for key, value in new_watermarks:
+            watermarks.update(key, value)
+
+    inserted, updated = upsert_csv(
+        out_csv_path, REPO_COLUMNS, buffer.rows, ["owner", "name"])
+    watermarks.save()
+    print(f"{inserted} new repositories, {updated} updated.")
+
+
 def main():
     """Retrieves all the STEP intern repos and stores them in a CSV file.
 
@@ -169,50 +471,54 @@ def main():
         created: The time and date that the repository was created.
         pr_count: The number of pull requests in the repository.
         repo_type: The type of repository.
+
+    With the --incremental flag, only new repositories and repositories
+    with recent pushes are searched, and they are merged into the existing
+    CSV:
+        $ python3 repos.py --incremental starter capstone
+
+    With the --parquet flag, the CSV is also converted to repos.parquet.
     """
 
-    arg_count = len(sys.argv)
+    incremental = "--incremental" in sys.argv
+    parquet = PARQUET_FLAG in sys.argv
+    repo_types = [arg for arg in sys.argv[1:]
+                  if arg not in ("--incremental", PARQUET_FLAG)]
     supported_types = {"test", "starter", "capstone"}
 
     # Check if there are arguments that specify repository types.
-    if arg_count == 1:
-        raise Exception("Usage: repos.py <repository type>...")
-
-    repo_types = sys.argv[1:]
+    if not repo_types:
+        raise Exception("Usage: repos.py [--incremental] [--parquet] "
+                        "<repository type>...")
 
     if not set(repo_types).issubset(supported_types):
         raise Exception("Arguments contain unsupported repository type.")
 
     os.makedirs("data", exist_ok=True)
+    cache = enable_cache("repos")
 
     out_csv_path = "data/repos.csv"
+    watermark_json = "data/repos_watermarks.json"
 
     # Create a different file for testing.
     if repo_types == ["test"]:
         out_csv_path = "data/test_repos.csv"
-
-    with open(out_csv_path, "w", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow([
-            "owner",
-            "name",
-            "created",
-            "pr_count",
-            "repo_type"
-        ])
-        for repo_type in repo_types:
-            repo_query = get_query_from_repo_type(repo_type)
-            cur_cursor = ""
-            while True:
-                query_results = get_repos_after(repo_query, cur_cursor)
-                next_cursor = process_query_results(
-                    writer,
-                    query_results,
-                    repo_type
-                )
-                if next_cursor == "":
-                    break
-                cur_cursor = next_cursor
+        watermark_json = "data/test_repos_watermarks.json"
+
+    if incremental:
+        sync_repos(out_csv_path, watermark_json, repo_types)
+    else:
+        with open(out_csv_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(REPO_COLUMNS)
+            for repo_type in repo_types:
+                for query_results in search_all_repos(repo_type):
+                    process_query_results(writer, query_results, repo_type)
+    if parquet:
+        write_parquet(out_csv_path, REPO_TYPES)
+
+    if cache:
+        print(cache.report())
 
 
 if __name__ == "__main__":
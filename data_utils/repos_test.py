@@ -16,9 +16,12 @@
 
 import csv
 import os
+import re
 import sys
+import tempfile
 import unittest
 from unittest.mock import patch
+import incremental
 import repos
 
 
@@ -62,6 +65,116 @@ class ReposTest(unittest.TestCase):
         self.assertTrue(all([param not in query_2 for param in params_1]))
         self.assertTrue(shared_param in query_1 and shared_param in query_2)
 
+    def test_query_watermarks(self):
+        """ Test to check that watermarks narrow the search dates. """
+        self.assertIn("created:>2020-07-01T00:00:00Z",
+                      repos.get_query_from_repo_type(
+                          "capstone", created_after="2020-07-01T00:00:00Z"))
+        self.assertIn("created:>2020-06-17 ",
+                      repos.get_query_from_repo_type("capstone"))
+        pushed_query = repos.get_query_from_repo_type(
+            "starter", pushed_after="2020-07-01T00:00:00Z")
+        self.assertIn("pushed:>2020-07-01T00:00:00Z", pushed_query)
+        self.assertNotIn("created:", pushed_query)
+
+    def test_get_search_end(self):
+        """ Test to check that searches end at the next midnight, so their
+        queries do not change during a day. """
+        for now in ["2020-06-17T00:00:00", "2020-06-17T10:30:15",
+                    "2020-06-17T23:59:59"]:
+            self.assertEqual(
+                repos.format_date(repos.get_search_end(repos.parse_date(now))),
+                "2020-06-18T00:00:00Z")
+
+    @patch("repos.MAX_SEARCH_RESULTS", 3)
+    @patch("repos.get_repos_after")
+    def test_search_all_repos(self, mock_results):
+        """ Test to check that searches with too many results are split into
+        created date windows and merged in order without duplicates. """
+        created_dates = [f"2020-06-{day:02}T12:00:00Z" for day in range(1, 11)]
+        created_dates.append("2020-06-10T12:00:00Z")
+
+        def get_repos_after(repo_query, cursor):
+            if cursor:
+                return {"data": {"search": {"repositoryCount": 0,
+                                            "edges": []}}}
+            start, end = re.search(r"created:(\S+)\.\.(\S+)",
+                                   repo_query).groups()
+            edges = [{
+                "cursor": str(index),
+                "node": {
+                    "owner": {"login": "intern"},
+                    "name": f"repo{index}",
+                    "createdAt": created,
+                    "pullRequests": {"totalCount": 0}
+                }
+            } for index, created in enumerate(created_dates)
+                     if start <= created <= end]
+            return {"data": {"search": {
+                "repositoryCount": len(edges),
+                "edges": edges[:repos.MAX_SEARCH_RESULTS]
+            }}}
+
+        mock_results.side_effect = get_repos_after
+        buffer = incremental.RowBuffer()
+        for result in repos.search_all_repos(
+                "test", created_after="2020-06-01T00:00:00Z"):
+            repos.process_query_results(buffer, result, "test")
+        self.assertEqual([row[1] for row in buffer.rows],
+                         [f"repo{index}" for index in range(11)])
+
+    @patch("repos.get_repos_after")
+    def test_sync_repos(self, mock_results):
+        """ Test to check that incremental runs merge new repositories and
+        refresh the pull request counts of pushed repositories. """
+        def make_results(nodes):
+            return [{
+                "data": {
+                    "search": {
+                        "edges": [{
+                            "cursor": node["name"],
+                            "node": {
+                                "owner": {"login": "intern"},
+                                "name": node["name"],
+                                "createdAt": node["createdAt"],
+                                "pushedAt": node["pushedAt"],
+                                "pullRequests": {
+                                    "totalCount": node["pr_count"]
+                                }
+                            }
+                        } for node in nodes]
+                    }
+                }
+            }, {"data": {"search": {"edges": []}}}]
+
+        first = {"name": "first", "createdAt": "2020-06-01T00:00:00Z",
+                 "pushedAt": "2020-06-02T00:00:00Z", "pr_count": 1}
+        second = {"name": "second", "createdAt": "2020-06-03T00:00:00Z",
+                  "pushedAt": "2020-06-04T00:00:00Z", "pr_count": 2}
+        new = {"name": "new", "createdAt": "2020-06-05T00:00:00Z",
+               "pushedAt": "2020-06-05T00:00:00Z", "pr_count": 0}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            repos_path = os.path.join(temp_dir, "repos.csv")
+            watermark_json = os.path.join(temp_dir, "watermarks.json")
+
+            mock_results.side_effect = make_results([first, second])
+            repos.sync_repos(repos_path, watermark_json, ["starter"])
+            self.assertIn("git clone", mock_results.call_args_list[0][0][0])
+
+            mock_results.side_effect = (
+                make_results([new])
+                + make_results([dict(second, pr_count=3), new]))
+            repos.sync_repos(repos_path, watermark_json, ["starter"])
+            queries = [call[0][0] for call in mock_results.call_args_list]
+            self.assertIn("created:2020-06-03T00:00:00Z..", queries[2])
+            self.assertIn("pushed:>2020-06-04T00:00:00Z", queries[4])
+
+            with open(repos_path, newline="") as in_csv:
+                rows = [(row["name"], row["pr_count"])
+                        for row in csv.DictReader(in_csv)]
+        self.assertEqual(rows, [("first", "1"), ("second", "3"),
+                                ("new", "0")])
+
     @patch("repos.get_repos_after")
     def test_repos_output(self, mock_results):
         """ Test to check the CSV output, given a set of query results.
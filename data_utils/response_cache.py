@@ -0,0 +1,184 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for caching Github API responses on disk. """
+
+import collections
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+# Matches GraphQL string literals, whose whitespace is significant, and runs
+# of whitespace outside of them.
+_TOKEN_PATTERN = re.compile(r'("(?:[^"\\]|\\.)*")|\s+')
+
+CACHE_SUFFIX = ".json.gz"
+
+
+def normalize_query(query):
+    """ Collapses the whitespace of a query outside of string literals.
+
+    Queries that only differ in indentation or line breaks therefore share
+    the same cache entry.
+
+    Args:
+        query: A string containing the query.
+
+    Returns:
+        str. The normalized query.
+    """
+    return _TOKEN_PATTERN.sub(
+        lambda match: match.group(1) or " ", query).strip()
+
+
+def get_cache_key(query):
+    """ Gets the content address of a query.
+
+    Args:
+        query: A string containing the query.
+
+    Returns:
+        str. The SHA-256 hex digest of the normalized query.
+    """
+    return hashlib.sha256(normalize_query(query).encode()).hexdigest()
+
+
+class ResponseCache:  # pylint: disable=too-many-instance-attributes
+    """ Size-bounded on-disk cache of query results.
+
+    Each result is stored as a gzip-compressed JSON file named after the
+    hash of its normalized query. Entries expire after ttl seconds. When the
+    files take more than max_bytes, the least recently used entries are
+    evicted. The modification time of a file records its last use.
+
+    Attributes:
+        directory: The directory with the cache files.
+        ttl: Seconds after which an entry expires.
+        max_bytes: The maximum total size of the cache files.
+        hits: The number of lookups answered from the cache.
+        misses: The number of lookups not found or expired.
+        evictions: The number of entries evicted to respect max_bytes.
+    """
+
+    def __init__(self, directory, ttl, max_bytes, clock=time.time):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sizes = collections.OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for file_name in os.listdir(directory):
+            if not file_name.endswith(CACHE_SUFFIX):
+                continue
+            stat = os.stat(os.path.join(directory, file_name))
+            entries.append((stat.st_mtime, file_name, stat.st_size))
+        for _, file_name, size in sorted(entries):
+            self._sizes[file_name[:-len(CACHE_SUFFIX)]] = size
+            self._total_bytes += size
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def _remove(self, key):
+        """ Deletes an entry. Must be called with the lock held. """
+        self._total_bytes -= self._sizes.pop(key, 0)
+        try:
+            os.remove(self._get_path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, query):
+        """ Looks up the cached result of a query.
+
+        Args:
+            query: A string containing the query.
+
+        Returns:
+            JSON. The cached results of the query, or None if there is no
+                entry or the entry has expired.
+        """
+        key = get_cache_key(query)
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            try:
+                with gzip.open(self._get_path(key), "rt") as in_file:
+                    entry = json.load(in_file)
+            except (OSError, ValueError):
+                entry = None
+
+            now = self._clock()
+            if entry is None or now - entry["created"] > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            os.utime(self._get_path(key), (now, now))
+            self._sizes.move_to_end(key)
+            self.hits += 1
+            return entry["result"]
+
+    def put(self, query, result):
+        """ Stores the result of a query and evicts old entries if needed.
+
+        Args:
+            query: A string containing the query.
+            result: The JSON results of the query.
+        """
+        key = get_cache_key(query)
+        data = gzip.compress(json.dumps({
+            "created": self._clock(),
+            "result": result
+        }).encode())
+
+        # Write to a temporary file first so that readers never see a
+        # partially written entry.
+        file_handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(file_handle, "wb") as out_file:
+            out_file.write(data)
+
+        with self._lock:
+            os.replace(temp_path, self._get_path(key))
+            self._total_bytes += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            while self._total_bytes > self.max_bytes and len(self._sizes) > 1:
+                oldest_key = next(iter(self._sizes))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def report(self):
+        """ Summarizes the use of the cache.
+
+        Returns:
+            str. The hit, miss and eviction counts.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups else 0
+        return (f"Response cache {self.directory}: {self.hits} hits, "
+                f"{self.misses} misses ({hit_rate:.1f}% hit rate), "
+                f"{self.evictions} evictions, "
+                f"{self._total_bytes / 2 ** 20:.1f} MB.")
@@ -0,0 +1,128 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the response_cache module. """
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from fake_github import FakeGithubServer
+import query
+import response_cache
+
+
+class ResponseCacheTest(unittest.TestCase):
+    """ Response cache test class. """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_cache(self, ttl=60, max_bytes=2 ** 20):
+        """ Creates a cache in the temporary directory with a fake clock. """
+        return response_cache.ResponseCache(self.temp_dir.name, ttl,
+                                            max_bytes, clock=lambda: self.now)
+
+    def test_normalize_query(self):
+        """ Test to check that only whitespace outside strings is
+        collapsed. """
+        query_1 = """{
+            repository(name: "risr", owner: "googleinterns") {
+                nameWithOwner
+            }
+        }"""
+        query_2 = ('{ repository(name: "risr", owner: "googleinterns") '
+                   '{ nameWithOwner } }')
+        self.assertEqual(response_cache.get_cache_key(query_1),
+                         response_cache.get_cache_key(query_2))
+        self.assertNotEqual(
+            response_cache.normalize_query('{ search(query: "a  b") }'),
+            response_cache.normalize_query('{ search(query: "a b") }'))
+
+    def test_put_and_get(self):
+        """ Test to check that stored results are returned and counted. """
+        cache = self.make_cache()
+        self.assertIsNone(cache.get("{ a }"))
+        cache.put("{ a }", {"data": {"a": 1}})
+        self.assertEqual(cache.get("{  a  }"), {"data": {"a": 1}})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertIn("1 hits", cache.report())
+
+    def test_ttl(self):
+        """ Test to check that expired entries are not returned. """
+        cache = self.make_cache(ttl=60)
+        cache.put("{ a }", {"data": {"a": 1}})
+        self.now += 61
+        self.assertIsNone(cache.get("{ a }"))
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_lru_eviction(self):
+        """ Test to check that the least recently used entry is evicted
+        once the cache is full. """
+        cache = self.make_cache()
+        cache.put("{ a }", {"data": {"a": "x" * 100}})
+        entry_size = cache._total_bytes  # pylint: disable=protected-access
+        cache.max_bytes = 2 * entry_size + entry_size // 2
+        self.now += 1
+        cache.put("{ b }", {"data": {"a": "y" * 100}})
+        self.now += 1
+        self.assertIsNotNone(cache.get("{ a }"))
+        self.now += 1
+        cache.put("{ c }", {"data": {"a": "z" * 100}})
+        self.assertEqual(cache.evictions, 1)
+        self.assertIsNone(cache.get("{ b }"))
+        self.assertIsNotNone(cache.get("{ a }"))
+        self.assertIsNotNone(cache.get("{ c }"))
+
+    def test_persistence(self):
+        """ Test to check that a new cache finds the entries on disk. """
+        self.make_cache().put("{ a }", {"data": {"a": 1}})
+        self.assertEqual(self.make_cache().get("{ a }"), {"data": {"a": 1}})
+
+    def test_client_cache(self):
+        """ Test to check that cached queries are not sent again and that
+        errors are not cached. """
+        def respond(query_input, headers):
+            # pylint: disable=unused-argument
+            if "error" in query_input:
+                return 200, {}, {"errors": [{"message": "error"}]}
+            return 200, {}, {"data": {"viewer": {"login": "test"}}}
+
+        with FakeGithubServer(respond) as server:
+            client = query.GraphQLClient(tokens=["test"], url=server.url,
+                                         cache=self.make_cache())
+            for _ in range(3):
+                client.run_query("{ viewer { login } }")
+                client.run_query("{ error }")
+            client.close()
+            self.assertEqual(server.requests, 4)
+
+    def test_enable_cache(self):
+        """ Test to check that the cache is only enabled by RISR_CACHE_DIR. """
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(query.enable_cache("pr_stats"))
+        with patch.dict(os.environ, {"RISR_CACHE_DIR": self.temp_dir.name}):
+            cache = query.enable_cache("pr_stats")
+        query._cache = None  # pylint: disable=protected-access
+        self.assertEqual(cache.directory,
+                         os.path.join(self.temp_dir.name, "pr_stats"))
+        self.assertEqual(cache.ttl, query.CACHE_TTLS["pr_stats"])
+
+
+if __name__ == "__main__":
+    unittest.main()
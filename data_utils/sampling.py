@@ -0,0 +1,257 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for sampling streams of rows without loading them.
+
+Samplers see each row once and keep at most the sample size in memory, so
+comment CSVs of any size can be sampled in a single pass. The samples are
+drawn without replacement, and returned in the order of the stream.
+"""
+
+import math
+
+ALLOCATIONS = ("proportional", "equal")
+
+
+class ReservoirSampler:
+    """ Uniform sample without replacement of a stream of unknown length.
+
+    Uses Algorithm L (Li, 1994), which draws the number of rows to skip
+    before the next replacement instead of a random number per row.
+
+    Attributes:
+        size: The number of rows in the sample.
+        rand: The random.Random used to draw the sample.
+        count: The number of rows seen so far.
+        reservoir: List of (index in the stream, row) tuples.
+        weight: The Algorithm L weight of the current reservoir.
+        next_index: The index of the next row that enters the reservoir.
+    """
+
+    def __init__(self, size, rand):
+        self.size = size
+        self.rand = rand
+        self.count = 0
+        self.reservoir = []
+        self.weight = 0
+        self.next_index = size
+
+    def get_uniform(self):
+        """ Draws a random number in the open interval (0, 1). """
+        value = self.rand.random()
+        while value == 0:
+            value = self.rand.random()
+        return value
+
+    def skip(self):
+        """ Updates the weight and draws the index of the next row that
+        enters the reservoir. """
+        self.weight *= math.exp(math.log(self.get_uniform()) / self.size)
+        self.draw_next_index()
+
+    def draw_next_index(self):
+        """ Draws the index of the next row that enters the reservoir. """
+        self.next_index += math.floor(
+            math.log(self.get_uniform()) / math.log(1 - self.weight)) + 1
+
+    def start_skipping(self):
+        """ Starts skipping rows once the reservoir is full. """
+        self.weight = 1
+        self.next_index = self.size - 1
+        self.skip()
+
+    def shrink(self, size):
+        """ Lowers the sample size, keeping a uniform sample of the rows seen
+        so far.
+
+        Algorithm L keeps the rows with the smallest of a random key per
+        row, and the weight is the largest key in the reservoir. The rows
+        kept after a shrink are a uniform subset of the reservoir, and the
+        new weight is drawn as the size-th smallest of count random keys.
+
+        Args:
+            size: The new number of rows in the sample. Larger sizes are
+                ignored.
+        """
+        if size >= self.size:
+            return
+        self.size = size
+        if self.count < size:
+            return
+        if not size:
+            self.reservoir = []
+        elif self.count == size:
+            self.start_skipping()
+        else:
+            self.reservoir = self.rand.sample(self.reservoir, size)
+            self.weight = self.rand.betavariate(size, self.count - size + 1)
+            self.next_index = self.count - 1
+            self.draw_next_index()
+
+    def add(self, row):
+        """ Sees the next row of the stream.
+
+        Args:
+            row: The row, of any type.
+        """
+        if len(self.reservoir) < self.size:
+            self.reservoir.append((self.count, row))
+            if len(self.reservoir) == self.size:
+                self.start_skipping()
+        elif self.size and self.count == self.next_index:
+            self.reservoir[self.rand.randrange(self.size)] = (self.count, row)
+            self.skip()
+        self.count += 1
+
+    def get_sample(self):
+        """ Gets the sample.
+
+        Returns:
+            List of the sampled rows, in the order of the stream. It has
+            every row if the stream has fewer rows than the sample size.
+        """
+        return [row for _, row in sorted(self.reservoir,
+                                         key=lambda item: item[0])]
+
+
+def get_equal_level(counts, size):
+    """ Finds the number of rows of the largest strata in an equal
+    allocation.
+
+    Strata with fewer rows than an equal share are sampled completely, and
+    the rest of the sample is shared equally by the other strata.
+
+    Args:
+        counts: List of the number of rows of each stratum.
+        size: The number of rows in the sample.
+
+    Returns:
+        float. The share of each of the largest strata, or None if every
+            row fits in the sample.
+    """
+    remaining = size
+    ordered = sorted(counts)
+    for index, count in enumerate(ordered):
+        if count * (len(ordered) - index) > remaining:
+            return remaining / (len(ordered) - index)
+        remaining -= count
+    return None
+
+
+class StratifiedSampler:
+    """ Sample without replacement of a stream, stratified by a key.
+
+    With the proportional allocation, the sample is a uniform sample of the
+    stream, whose strata are proportional to their number of rows in
+    expectation. With the equal allocation, each stratum keeps a reservoir
+    of at most the share of the largest strata so far. That share only
+    falls as rows arrive, so the reservoirs only shrink, and they hold at
+    most the sample size plus the number of strata rows in total.
+
+    Attributes:
+        size: The number of rows in the sample.
+        get_key: Function that takes a row and returns its stratum.
+        rand: The random.Random used to draw the sample.
+        allocation: "proportional" to allocate the sample to strata by
+            their number of rows, or "equal" to allocate the same number of
+            rows to every stratum.
+        count: The number of rows seen so far.
+        reservoir: The ReservoirSampler of (stratum, row) tuples of the
+            proportional allocation.
+        strata: Dictionary mapping strata to their ReservoirSampler, for the
+            equal allocation.
+        capacity: The size of the reservoir of each stratum.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, size, get_key, rand, allocation="proportional"):
+        if allocation not in ALLOCATIONS:
+            raise Exception(f"Unsupported allocation {allocation}.")
+        self.size = size
+        self.get_key = get_key
+        self.rand = rand
+        self.allocation = allocation
+        self.count = 0
+        self.reservoir = ReservoirSampler(size, rand)
+        self.strata = {}
+        self.capacity = size
+
+    def add(self, row):
+        """ Sees the next row of the stream.
+
+        Args:
+            row: The row, of any type.
+        """
+        key = self.get_key(row)
+        self.count += 1
+        if self.allocation == "proportional":
+            self.reservoir.add((key, row))
+            return
+
+        stratum = self.strata.get(key)
+        if stratum is None:
+            stratum = ReservoirSampler(self.capacity, self.rand)
+            self.strata[key] = stratum
+        stratum.add((self.count, row))
+        # The share only changes when a stratum keeps all of its rows.
+        if stratum.count <= stratum.size:
+            level = get_equal_level(
+                [sampler.count for sampler in self.strata.values()],
+                self.size)
+            if level is not None and math.ceil(level) < self.capacity:
+                self.capacity = math.ceil(level)
+                for sampler in self.strata.values():
+                    sampler.shrink(self.capacity)
+
+    def allocate(self):
+        """ Allocates the sample size to the strata.
+
+        Returns:
+            Dictionary mapping strata to their number of sampled rows.
+        """
+        if self.allocation == "proportional":
+            sizes = {}
+            for key, _ in self.reservoir.get_sample():
+                sizes[key] = sizes.get(key, 0) + 1
+            return sizes
+
+        counts = {key: stratum.count for key, stratum in self.strata.items()}
+        if self.count <= self.size:
+            return counts
+
+        # Smaller strata are filled first, and the rows they cannot take go
+        # to the larger ones.
+        sizes = {}
+        remaining = self.size
+        ordered = sorted(counts, key=lambda key: counts[key])
+        for index, key in enumerate(ordered):
+            sizes[key] = min(counts[key], remaining // (len(ordered) - index))
+            remaining -= sizes[key]
+        return sizes
+
+    def get_sample(self):
+        """ Gets the sample.
+
+        Returns:
+            List of the sampled rows, in the order of the stream.
+        """
+        if self.allocation == "proportional":
+            return [row for _, row in self.reservoir.get_sample()]
+
+        sample = []
+        for key, size in self.allocate().items():
+            # A uniform sample of a uniform sample is a uniform sample.
+            sample.extend(self.rand.sample(self.strata[key].get_sample(),
+                                           size))
+        return [row for _, row in sorted(sample, key=lambda item: item[0])]
@@ -0,0 +1,146 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the sampling module. """
+
+import collections
+import random
+import unittest
+import sampling
+
+
+def draw(sampler, rows):
+    """ Adds rows to a sampler and returns its sample. """
+    for row in rows:
+        sampler.add(row)
+    return sampler.get_sample()
+
+
+class SamplingTest(unittest.TestCase):
+    """ Sampling test class. """
+
+    def test_reservoir(self):
+        """ Test to check that samples have no duplicates, keep the stream
+        order and are reproducible. """
+        sample = draw(sampling.ReservoirSampler(10, random.Random(1)),
+                      range(1000))
+        self.assertEqual(len(set(sample)), 10)
+        self.assertEqual(sample, sorted(sample))
+        self.assertEqual(
+            draw(sampling.ReservoirSampler(10, random.Random(1)),
+                 range(1000)),
+            sample)
+        self.assertEqual(
+            draw(sampling.ReservoirSampler(10, random.Random(1)), range(4)),
+            [0, 1, 2, 3])
+        self.assertEqual(
+            draw(sampling.ReservoirSampler(0, random.Random(1)), range(4)),
+            [])
+
+    def test_reservoir_uniform(self):
+        """ Test to check that every row is about as likely to be sampled. """
+        rand = random.Random(2)
+        counts = collections.Counter()
+        for _ in range(4000):
+            counts.update(draw(sampling.ReservoirSampler(5, rand),
+                               range(20)))
+        # Each row is expected 1000 times.
+        self.assertEqual(len(counts), 20)
+        for count in counts.values():
+            self.assertGreater(count, 880)
+            self.assertLess(count, 1120)
+
+    def test_stratified(self):
+        """ Test to check the proportional and equal allocations. """
+        rows = [("small", index) if index % 10 == 0 else ("large", index)
+                for index in range(1000)]
+
+        sampler = sampling.StratifiedSampler(
+            20, lambda row: row[0], random.Random(3))
+        sample = draw(sampler, rows)
+        self.assertEqual(sum(sampler.allocate().values()), 20)
+        self.assertEqual(len(set(sample)), 20)
+        self.assertEqual(sample, sorted(sample, key=lambda row: row[1]))
+
+        sampler = sampling.StratifiedSampler(
+            20, lambda row: row[0], random.Random(3), "equal")
+        draw(sampler, rows[:200])
+        self.assertEqual(sampler.allocate(), {"small": 10, "large": 10})
+
+        sampler = sampling.StratifiedSampler(
+            20, lambda row: row[0], random.Random(3), "equal")
+        draw(sampler, rows[:30])
+        self.assertEqual(sampler.allocate(), {"small": 3, "large": 17})
+
+        with self.assertRaises(Exception):
+            sampling.StratifiedSampler(20, len, random.Random(3), "random")
+
+    def test_stratified_proportional(self):
+        """ Test to check that strata are proportional in expectation. """
+        rows = [("small", index) if index % 10 == 0 else ("large", index)
+                for index in range(1000)]
+        rand = random.Random(4)
+        counts = collections.Counter()
+        for _ in range(500):
+            sampler = sampling.StratifiedSampler(20, lambda row: row[0], rand)
+            draw(sampler, rows)
+            counts.update(sampler.allocate())
+        # The small stratum is expected 1000 times.
+        self.assertGreater(counts["small"], 900)
+        self.assertLess(counts["small"], 1100)
+
+    def test_stratified_memory(self):
+        """ Test to check that the equal allocation keeps about the sample
+        size in memory. """
+        rows = [(index % 50, index) for index in range(10000)]
+        sampler = sampling.StratifiedSampler(
+            20, lambda row: row[0], random.Random(5), "equal")
+        sample = draw(sampler, rows)
+        self.assertEqual(len(set(sample)), 20)
+        self.assertEqual(
+            sum(len(stratum.reservoir)
+                for stratum in sampler.strata.values()), 50)
+        self.assertEqual(sorted(collections.Counter(
+            row[0] for row in sample).values()), [1] * 20)
+
+        sampler = sampling.StratifiedSampler(
+            20, lambda row: row[0] % 5, random.Random(5), "equal")
+        draw(sampler, rows)
+        self.assertEqual(
+            sum(len(stratum.reservoir)
+                for stratum in sampler.strata.values()), 20)
+
+    def test_shrink_uniform(self):
+        """ Test to check that every row is about as likely to be sampled
+        across a shrink. """
+        rand = random.Random(6)
+        counts = collections.Counter()
+        for _ in range(4000):
+            sampler = sampling.ReservoirSampler(8, rand)
+            for row in range(6):
+                sampler.add(row)
+            sampler.shrink(7)
+            for row in range(6, 10):
+                sampler.add(row)
+            sampler.shrink(5)
+            counts.update(draw(sampler, range(10, 20)))
+        # Each row is expected 1000 times.
+        self.assertEqual(len(counts), 20)
+        for count in counts.values():
+            self.assertGreater(count, 880)
+            self.assertLess(count, 1120)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for tagging code review comments with keyword rules.
+
+The keywords and phrases of every category are compiled into a single
+Aho-Corasick automaton, which finds all of them in one pass over a comment,
+however many patterns there are. Matching ignores case, and a pattern that
+starts with a letter or digit must start a word, so that "nit" does not
+match "unit" but matches "nitpick".
+
+The automaton of the pyahocorasick package is used when it is installed,
+and an equivalent pure Python automaton otherwise.
+"""
+
+import collections
+import csv
+import json
+import os
+import sys
+from incremental import read_chunks, write_atomically
+from weeks import get_comment_weeks, load_start_dates
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Number of comments tagged between two writes.
+CHUNK_SIZE = 20000
+
+# Patterns of each category, used when there is no tag_patterns.json.
+DEFAULT_PATTERNS = {
+    "approval": ["lgtm", "looks good", "ship it"],
+    "nit": ["nit", "minor"],
+    "question": ["why", "what about", "?"],
+    "style": ["style", "indentation", "formatting", "naming", "rename",
+              "lint"],
+    "suggestion": ["consider", "suggest", "could you", "how about",
+                   "instead"],
+    "testing": ["test", "coverage", "assert"],
+    "typo": ["typo", "spelling", "misspelled"]
+}
+
+
+def load_patterns(patterns_json):
+    """ Loads the patterns of each category.
+
+    Args:
+        patterns_json: The path of a JSON object mapping each category to
+            its list of keywords and phrases.
+
+    Returns:
+        Dictionary mapping categories to lists of patterns, which are
+        DEFAULT_PATTERNS if the file does not exist.
+    """
+    if not os.path.isfile(patterns_json):
+        return DEFAULT_PATTERNS
+    with open(patterns_json) as in_file:
+        return json.load(in_file)
+
+
+class Tagger:
+    """ Aho-Corasick automaton of the patterns of every category.
+
+    Each pattern has an output of (length, category indexes, whether the
+    match must start a word).
+
+    Attributes:
+        categories: Sorted list of the categories.
+        automaton: The ahocorasick.Automaton, or None without pyahocorasick.
+        transitions: List with a dictionary per state, mapping characters to
+            the next state. Characters that are not in any pattern go back
+            to the initial state.
+        outputs: List with the outputs of the patterns that end at each
+            state.
+    """
+
+    def __init__(self, patterns, use_extension=True):
+        self.categories = sorted(patterns)
+        pattern_categories = collections.defaultdict(list)
+        for index, category in enumerate(self.categories):
+            for pattern in patterns[category]:
+                if not pattern:
+                    raise Exception(f"Empty pattern for {category}.")
+                if index not in pattern_categories[pattern.lower()]:
+                    pattern_categories[pattern.lower()].append(index)
+        pattern_outputs = {
+            pattern: (len(pattern), tuple(indexes), pattern[0].isalnum())
+            for pattern, indexes in pattern_categories.items()
+        }
+
+        self.automaton = None
+        self.transitions = []
+        self.outputs = []
+        if use_extension and ahocorasick:
+            self.automaton = ahocorasick.Automaton()
+            for pattern, output in pattern_outputs.items():
+                self.automaton.add_word(pattern, output)
+            self.automaton.make_automaton()
+        else:
+            self.build(pattern_outputs)
+
+    def build(self, pattern_outputs):
+        """ Builds the pure Python automaton.
+
+        The failure links are folded into the transitions, so that each
+        character of a comment takes a single dictionary lookup.
+
+        Args:
+            pattern_outputs: Dictionary mapping patterns to their output.
+        """
+        trie = [{}]
+        outputs = [[]]
+        for pattern, output in pattern_outputs.items():
+            state = 0
+            for char in pattern:
+                if char not in trie[state]:
+                    trie[state][char] = len(trie)
+                    trie.append({})
+                    outputs.append([])
+                state = trie[state][char]
+            outputs[state].append(output)
+
+        # States are visited by depth, so the failure state of a state is
+        # complete before the state itself.
+        failures = [0] * len(trie)
+        transitions = [None] * len(trie)
+        transitions[0] = dict(trie[0])
+        queue = collections.deque(trie[0].values())
+        while queue:
+            state = queue.popleft()
+            failure = failures[state]
+            outputs[state].extend(outputs[failure])
+            transitions[state] = dict(transitions[failure])
+            for char, child in trie[state].items():
+                failures[child] = transitions[failure].get(char, 0)
+                transitions[state][char] = child
+                queue.append(child)
+        self.transitions = transitions
+        self.outputs = outputs
+
+    def find(self, text):
+        """ Finds every pattern in a lowercase text.
+
+        Args:
+            text: A string containing the lowercase text.
+
+        Yields:
+            Tuples with the index of the last character of each match and
+            the output of its pattern.
+        """
+        if self.automaton is not None:
+            if len(self.automaton):
+                yield from self.automaton.iter(text)
+            return
+        transitions = self.transitions
+        outputs = self.outputs
+        state = 0
+        for index, char in enumerate(text):
+            state = transitions[state].get(char, 0)
+            for output in outputs[state]:
+                yield index, output
+
+    def count(self, text):
+        """ Counts the matches of the patterns of each category in a text.
+
+        Args:
+            text: A string containing the comment text.
+
+        Returns:
+            List with the number of matches of each category, in the order
+            of categories.
+        """
+        text = text.lower()
+        counts = [0] * len(self.categories)
+        for end, (length, indexes, starts_word) in self.find(text):
+            start = end - length + 1
+            if starts_word and start and text[start - 1].isalnum():
+                continue
+            for index in indexes:
+                counts[index] += 1
+        return counts
+
+
+def tag_comments(comments_file, tagger, stats_csv, out_csv):
+    """ Tags every comment of a comments CSV.
+
+    Args:
+        comments_file: CSV containing all code review comments.
+        tagger: The Tagger.
+        stats_csv: The path of the pull request statistics CSV, with the
+            start dates of the internship weeks.
+        out_csv: The path of the CSV with the tags of each comment.
+
+    Returns:
+        Dictionary mapping internship weeks to a list with the number of
+        comments of that week with each tag. Comments with an unknown week
+        are not counted.
+    """
+    start_dates = load_start_dates(stats_csv)
+    week_counts = collections.defaultdict(
+        lambda: [0] * len(tagger.categories))
+
+    def write(out_file):
+        writer = csv.writer(out_file)
+        writer.writerow(["comment_path", "created", "week"] +
+                        tagger.categories)
+        for chunk in read_chunks(comments_file, CHUNK_SIZE):
+            weeks = get_comment_weeks(chunk, start_dates)
+            for row, week in zip(chunk, weeks):
+                counts = tagger.count(row["comment"])
+                writer.writerow([row["comment_path"], row["created"], week] +
+                                counts)
+                if week != "unknown":
+                    flags = week_counts[week]
+                    for index, count in enumerate(counts):
+                        flags[index] += count > 0
+
+    write_atomically(out_csv, write)
+    return week_counts
+
+
+def write_week_counts(week_counts, categories, out_csv):
+    """ Writes the number of comments with each tag per internship week.
+
+    Args:
+        week_counts: Dictionary from tag_comments().
+        categories: List of the categories of the tags.
+        out_csv: The path of the CSV with a week column and a count column
+            per category.
+    """
+    def write(out_file):
+        writer = csv.writer(out_file)
+        writer.writerow(["week"] + categories)
+        for week in sorted(week_counts):
+            writer.writerow([week] + week_counts[week])
+
+    write_atomically(out_csv, write)
+
+
+def main():
+    """ Tags every comment with keyword rules.
+
+    Usage:
+        $ python3 tagging.py [test]
+
+    The patterns of each category are read from tag_patterns.json, a JSON
+    object such as {"nit": ["nit", "minor"]}, or are DEFAULT_PATTERNS.
+
+    comment_tags.csv has the following columns:
+        comment_path: The resource path to the comment.
+        created: The date and time that the comment was created.
+        week: The internship week of the comment, or "unknown".
+        One column per category, with the number of matches of its
+        patterns in the comment. The comment has the tag when it is not 0.
+
+    comment_tag_counts.csv has a week column and the number of comments of
+    that week with each tag, in the format of comment_categories.csv.
+    """
+    if len(sys.argv) == 1:
+        prefix = "data/"
+    elif sys.argv[1] == "test":
+        prefix = "data/test_"
+    else:
+        raise Exception("Invalid command line argument.")
+
+    comments_file = prefix + "pr_comments.csv"
+    if not os.path.isfile(comments_file):
+        raise Exception("The CSV for code review comments does not exist.")
+    tagger = Tagger(load_patterns(prefix + "tag_patterns.json"))
+    week_counts = tag_comments(comments_file, tagger, prefix + "pr_stats.csv",
+                               prefix + "comment_tags.csv")
+    write_week_counts(week_counts, tagger.categories,
+                      prefix + "comment_tag_counts.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Benchmark for tagging comments with keyword rules.
+
+Tags synthetic comments with a regular expression per pattern, which is the
+naive scan, with the pure Python automaton and with pyahocorasick, if it
+is installed. Each is timed with the default patterns and with ten times as
+many patterns: the automata should take about the same time with both,
+unlike the scan per pattern.
+
+Usage: python tagging_benchmark.py [number of comments]
+"""
+
+import random
+import re
+import sys
+import time
+import tagging
+
+WORDS = ("please add a test for this case nit rename the variable why not "
+         "use a helper here consider moving it lgtm thanks typo in the "
+         "docstring").split()
+
+
+def make_comments(count):
+    """ Creates synthetic comments of 5 to 40 words. """
+    rand = random.Random(1)
+    return [" ".join(rand.choice(WORDS) for _ in range(rand.randint(5, 40)))
+            for _ in range(count)]
+
+
+def get_patterns(copies):
+    """ Gets the default patterns, with extra copies of each pattern. """
+    return {category: [f"{pattern}{copy or ''}" for pattern in patterns
+                       for copy in range(copies)]
+            for category, patterns in tagging.DEFAULT_PATTERNS.items()}
+
+
+def count_with_regexes(patterns, comments):
+    """ Counts the matches of each category with a regex per pattern. """
+    regexes = [
+        [re.compile((r"\b" if pattern[0].isalnum() else "") +
+                    re.escape(pattern), re.IGNORECASE)
+         for pattern in patterns[category]]
+        for category in sorted(patterns)
+    ]
+    for comment in comments:
+        counts = [sum(len(regex.findall(comment))
+                      for regex in category_regexes)
+                  for category_regexes in regexes]
+    return counts
+
+
+def count_with_tagger(patterns, comments, use_extension):
+    """ Counts the matches of each category with a Tagger. """
+    tagger = tagging.Tagger(patterns, use_extension)
+    for comment in comments:
+        counts = tagger.count(comment)
+    return counts
+
+
+def main():
+    """ Prints the number of comments tagged per second by each method. """
+    num_comments = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    comments = make_comments(num_comments)
+    methods = [
+        ("regex per pattern", count_with_regexes),
+        ("python automaton",
+         lambda patterns, comments: count_with_tagger(
+             patterns, comments, False))
+    ]
+    if tagging.ahocorasick:
+        methods.append(("pyahocorasick",
+                        lambda patterns, comments: count_with_tagger(
+                            patterns, comments, True)))
+
+    for copies in (1, 10):
+        patterns = get_patterns(copies)
+        num_patterns = sum(len(values) for values in patterns.values())
+        for name, method in methods:
+            start = time.perf_counter()
+            method(patterns, comments)
+            elapsed = time.perf_counter() - start
+            print(f"{name}, {num_patterns} patterns: {elapsed:.2f} s, "
+                  f"{num_comments / elapsed:,.0f} comments/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the tagging module. """
+
+import csv
+import os
+import random
+import tempfile
+import unittest
+import tagging
+
+
+def count_naively(patterns, text):
+    """ Counts the matches of each category with a scan per pattern. """
+    text = text.lower()
+    counts = []
+    for category in sorted(patterns):
+        count = 0
+        for pattern in {pattern.lower() for pattern in patterns[category]}:
+            for start in range(len(text)):
+                if (text.startswith(pattern, start) and not (
+                        pattern[0].isalnum() and start and
+                        text[start - 1].isalnum())):
+                    count += 1
+        counts.append(count)
+    return counts
+
+
+def get_taggers(patterns):
+    """ Gets a tagger with and without pyahocorasick, if installed. """
+    taggers = [tagging.Tagger(patterns, use_extension=False)]
+    if tagging.ahocorasick:
+        taggers.append(tagging.Tagger(patterns))
+    return taggers
+
+
+class TaggingTest(unittest.TestCase):
+    """ Tagging test class. """
+
+    def test_count(self):
+        """ Test to check that patterns are counted case-insensitively at
+        the start of words, and that overlapping patterns all match. """
+        patterns = {"nit": ["nit", "Minor"], "question": ["why", "?"],
+                    "testing": ["test", "unit test"], "both": ["nit"]}
+        for tagger in get_taggers(patterns):
+            self.assertEqual(tagger.categories,
+                             ["both", "nit", "question", "testing"])
+            self.assertEqual(tagger.count("NIT: why no unit test? Why??"),
+                             [1, 1, 5, 2])
+            self.assertEqual(tagger.count("Nitpick: a minor unity tests"),
+                             [1, 2, 0, 1])
+            self.assertEqual(tagger.count(""), [0, 0, 0, 0])
+        for tagger in get_taggers({"none": []}):
+            self.assertEqual(tagger.count("why"), [0])
+        with self.assertRaises(Exception):
+            tagging.Tagger({"empty": [""]})
+
+    def test_count_random(self):
+        """ Test to check the automaton against a scan per pattern. """
+        rand = random.Random(4)
+        alphabet = "ab ?"
+        patterns = {
+            category: ["".join(rand.choice(alphabet)
+                               for _ in range(rand.randint(1, 4)))
+                       for _ in range(5)]
+            for category in ["x", "y", "z"]
+        }
+        taggers = get_taggers(patterns)
+        for _ in range(200):
+            text = "".join(rand.choice(alphabet + "AB")
+                           for _ in range(rand.randint(0, 40)))
+            for tagger in taggers:
+                self.assertEqual(tagger.count(text),
+                                 count_naively(patterns, text))
+
+    def test_tag_comments(self):
+        """ Test to check the tags of each comment and the number of
+        comments with each tag per week. """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            comments_file = os.path.join(temp_dir, "pr_comments.csv")
+            stats_csv = os.path.join(temp_dir, "pr_stats.csv")
+            tags_csv = os.path.join(temp_dir, "comment_tags.csv")
+            with open(comments_file, "w", newline="") as out_csv:
+                csv.writer(out_csv).writerows([
+                    ["comment_path", "created", "comment"],
+                    ["/a/b/pull/1#1", "2020-06-01T10:00:00Z", "nit: typo"],
+                    ["/a/b/pull/1#2", "2020-06-09T10:00:00Z", "LGTM, nit"],
+                    ["/a/b/pull/1#3", "2020-06-09T10:00:00Z", "nit nit"],
+                    ["/a/c/pull/1#1", "2020-06-09T10:00:00Z", "nit"]
+                ])
+            with open(stats_csv, "w", newline="") as out_csv:
+                csv.writer(out_csv).writerows([
+                    ["pr_path", "start_date"], ["/a/b/pull/1", "6/1/2020"],
+                    ["/a/c/pull/1", "unknown"]])
+
+            tagger = tagging.Tagger({"approval": ["lgtm"], "nit": ["nit"],
+                                     "typo": ["typo"]})
+            week_counts = tagging.tag_comments(comments_file, tagger,
+                                               stats_csv, tags_csv)
+            self.assertEqual(week_counts, {1: [0, 1, 1], 2: [1, 2, 0]})
+            with open(tags_csv, newline="") as in_csv:
+                rows = list(csv.reader(in_csv))
+            self.assertEqual(rows[0], ["comment_path", "created", "week",
+                                       "approval", "nit", "typo"])
+            self.assertEqual([row[2:] for row in rows[1:]], [
+                ["1", "0", "1", "1"], ["2", "1", "1", "0"],
+                ["2", "0", "2", "0"], ["unknown", "0", "1", "0"]])
+
+            counts_csv = os.path.join(temp_dir, "comment_tag_counts.csv")
+            tagging.write_week_counts(week_counts, tagger.categories,
+                                      counts_csv)
+            with open(counts_csv, newline="") as in_csv:
+                self.assertEqual(list(csv.reader(in_csv)), [
+                    ["week", "approval", "nit", "typo"], ["1", "0", "1", "1"],
+                    ["2", "1", "2", "0"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
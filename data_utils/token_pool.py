@@ -0,0 +1,122 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for spreading requests across several Github access tokens. """
+
+import os
+import threading
+import time
+from rate_limit import RateLimiter
+
+# Hourly point budget of a Personal Access Token before Github reports it.
+DEFAULT_BUDGET = 5000
+
+
+def get_tokens_from_env():
+    """ Gets the Github Personal Access Tokens from the environment.
+
+    Several tokens can be given as a comma-separated list:
+        $ export GITHUB_PAT="FIRST TOKEN,SECOND TOKEN"
+
+    Returns:
+        List of token strings.
+
+    Raises:
+        Exception: GITHUB_PAT is not set.
+    """
+    github_pat = os.getenv("GITHUB_PAT")
+    if github_pat is None:
+        raise Exception("GITHUB_PAT environment variable is not set.")
+    tokens = [token.strip() for token in github_pat.split(",")]
+    return [token for token in tokens if token] or [""]
+
+
+class TokenPool:
+    """ Set of Personal Access Tokens with their own rate limit budgets.
+
+    Each token has a RateLimiter that tracks its remaining budget. Requests
+    are sent with the token that has the most headroom, which is its
+    remaining budget minus the cost of the requests already in flight with
+    it, so that concurrent requests spread across all tokens.
+
+    Attributes:
+        tokens: List of token strings.
+        limiters: Dictionary mapping each token to its RateLimiter.
+        in_flight: Dictionary mapping each token to the number of requests
+            currently sent with it.
+    """
+
+    def __init__(self, tokens, clock=time.time, sleep=time.sleep):
+        if not tokens:
+            raise Exception("At least one Github access token is required.")
+        self.tokens = list(tokens)
+        self.limiters = {
+            token: RateLimiter(clock=clock, sleep=sleep)
+            for token in self.tokens
+        }
+        self.in_flight = {token: 0 for token in self.tokens}
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _get_priority(self, token, now):
+        """ Ranks a token for the next request.
+
+        Args:
+            token: The token string.
+            now: The current Unix timestamp.
+
+        Returns:
+            Tuple that is larger for better tokens. Tokens that can be used
+            now come first, ordered by headroom. The others are ordered by
+            how soon they can be used again.
+        """
+        limiter = self.limiters[token]
+        remaining = limiter.remaining
+        if remaining is None:
+            remaining = DEFAULT_BUDGET
+
+        available_at = limiter.blocked_until
+        if limiter.reset_at is not None and limiter.reset_at <= now:
+            # The budget has been renewed since Github last reported it.
+            remaining = DEFAULT_BUDGET
+        elif remaining < limiter.cost and limiter.reset_at is not None:
+            available_at = max(available_at, limiter.reset_at)
+
+        headroom = remaining - self.in_flight[token] * limiter.cost
+        return -max(available_at - now, 0), headroom
+
+    def acquire(self):
+        """ Chooses the token for the next request.
+
+        Every call must be followed by a call to release once the request
+        has been answered.
+
+        Returns:
+            Tuple with the token string and its RateLimiter.
+        """
+        with self._lock:
+            now = self._clock()
+            token = max(self.tokens,
+                        key=lambda token: self._get_priority(token, now))
+            self.in_flight[token] += 1
+        return token, self.limiters[token]
+
+    def release(self, token):
+        """ Marks a request sent with the token as answered.
+
+        Args:
+            token: The token string returned by acquire.
+        """
+        with self._lock:
+            self.in_flight[token] -= 1
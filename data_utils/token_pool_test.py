@@ -0,0 +1,143 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the token_pool module. """
+
+import collections
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from crawl import crawl
+from fake_github import FakeGithubServer
+import query
+import token_pool
+
+
+def make_limited_endpoint(budgets):
+    """ Creates a fake endpoint that enforces a point budget per token.
+
+    Every query costs one point. Once a token has spent its budget, the
+    endpoint answers with 403 like the Github API does.
+
+    Args:
+        budgets: Dictionary mapping tokens to their budgets.
+
+    Returns:
+        Tuple with the respond function and a Counter of the successful
+        queries per token.
+    """
+    lock = threading.Lock()
+    used = collections.Counter()
+    reset_at = int(time.time()) + 3600
+
+    def respond(query_input, headers):
+        # pylint: disable=unused-argument
+        token = headers["Authorization"][len("token "):]
+        with lock:
+            remaining = budgets.get(token, 0) - used[token]
+            if remaining <= 0:
+                return 403, {
+                    "X-RateLimit-Remaining": 0,
+                    "X-RateLimit-Reset": reset_at
+                }, {"message": "API rate limit exceeded"}
+            used[token] += 1
+        return 200, {
+            "X-RateLimit-Remaining": remaining - 1,
+            "X-RateLimit-Reset": reset_at
+        }, {"data": {"viewer": {"login": token}}}
+
+    return respond, used
+
+
+class TokenPoolTest(unittest.TestCase):
+    """ Token pool test class. """
+
+    def test_get_tokens_from_env(self):
+        """ Test to check that a comma-separated list of tokens is read. """
+        with patch.dict(os.environ, {"GITHUB_PAT": "token1, token2,"}):
+            self.assertEqual(token_pool.get_tokens_from_env(),
+                             ["token1", "token2"])
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaises(Exception):
+                token_pool.get_tokens_from_env()
+
+    def test_most_headroom(self):
+        """ Test to check that the token with most headroom is chosen. """
+        pool = token_pool.TokenPool(["token1", "token2", "token3"])
+        reset_at = time.time() + 3600
+        pool.limiters["token1"].update(remaining=100, reset_at=reset_at)
+        pool.limiters["token2"].update(remaining=300, reset_at=reset_at)
+        pool.limiters["token3"].update(remaining=200, reset_at=reset_at)
+        token, limiter = pool.acquire()
+        self.assertEqual(token, "token2")
+        self.assertIs(limiter, pool.limiters["token2"])
+        pool.release(token)
+
+    def test_in_flight_headroom(self):
+        """ Test to check that requests in flight count against a token. """
+        pool = token_pool.TokenPool(["token1", "token2"])
+        reset_at = time.time() + 3600
+        pool.limiters["token1"].update(remaining=3, reset_at=reset_at)
+        pool.limiters["token2"].update(remaining=1, reset_at=reset_at)
+        chosen = [pool.acquire()[0] for _ in range(4)]
+        self.assertEqual(collections.Counter(chosen),
+                         {"token1": 3, "token2": 1})
+
+    def test_exhausted_token(self):
+        """ Test to check that an exhausted token is only chosen when no
+        other token can be used. """
+        pool = token_pool.TokenPool(["token1", "token2"])
+        now = time.time()
+        pool.limiters["token1"].update(remaining=0, reset_at=now + 60)
+        pool.limiters["token2"].update(remaining=0, reset_at=now + 30)
+        self.assertEqual(pool.acquire()[0], "token2")
+        pool.limiters["token1"].update(remaining=0, reset_at=now - 1)
+        self.assertEqual(pool.acquire()[0], "token1")
+
+    @patch("rate_limit.random.uniform", return_value=0)
+    def test_crawl_with_per_token_limits(self, mock_uniform):
+        """ Test to check that a crawl larger than one token's budget
+        succeeds against an endpoint that enforces per-token limits. """
+        # pylint: disable=unused-argument
+        budgets = {"token1": 10, "token2": 10, "token3": 10}
+        respond, used = make_limited_endpoint(budgets)
+        with FakeGithubServer(respond) as server:
+            client = query.GraphQLClient(tokens=list(budgets),
+                                         url=server.url)
+            results = list(crawl(client.run_query,
+                                 [("{}",) for _ in range(30)], 6))
+            client.close()
+        self.assertTrue(all(result != [] for result in results))
+        self.assertEqual(used, budgets)
+
+    @patch("rate_limit.random.uniform", return_value=0)
+    def test_skip_exhausted_token(self, mock_uniform):
+        """ Test to check that queries move to another token once a token
+        reports that its budget is spent. """
+        # pylint: disable=unused-argument
+        respond, used = make_limited_endpoint({"spent": 0, "fresh": 5})
+        with FakeGithubServer(respond) as server:
+            client = query.GraphQLClient(tokens=["spent", "fresh"],
+                                         url=server.url)
+            results = [client.run_query("{}") for _ in range(5)]
+            client.close()
+        self.assertEqual([result["data"]["viewer"]["login"]
+                          for result in results], ["fresh"] * 5)
+        self.assertEqual(used["fresh"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for turning the responses in the lake into CSVs in parallel.
+
+Processing stored responses does not wait on the network, so it is bound by
+the CPU. The repositories are split into contiguous chunks, and a pool of
+processes turns each chunk into shard CSVs. The shards are then
+concatenated in chunk order, so the CSVs are identical to the ones written
+by a single process.
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from incremental import write_atomically
+from lake import ResponseLake, get_lake_dir, skip_missing
+
+# Number of chunks per worker process. More chunks than workers keep every
+# process busy when some repositories have many more pull requests.
+CHUNKS_PER_WORKER = 4
+
+
+def get_worker_count():
+    """ Gets the number of processes of a transform.
+
+    The number can be changed with the following command:
+        $ export RISR_WORKERS=4
+
+    Returns:
+        int. The number of processes, by default the number of CPUs.
+
+    Raises:
+        Exception: RISR_WORKERS is not a positive integer.
+    """
+    workers = os.getenv("RISR_WORKERS")
+    if workers is None:
+        return os.cpu_count() or 1
+    if not workers.isdigit() or int(workers) < 1:
+        raise Exception("RISR_WORKERS must be a positive integer.")
+    return int(workers)
+
+
+def split_rows(rows, num_chunks):
+    """ Splits rows into contiguous chunks of about the same size.
+
+    Args:
+        rows: List of the repository rows.
+        num_chunks: The largest number of chunks.
+
+    Returns:
+        List of the non-empty chunks, in order.
+    """
+    size = max(1, -(-len(rows) // num_chunks))
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+
+def transform_chunk(lake_dir, stage, rows, outputs, shard_paths):
+    """ Turns the responses of a chunk of repositories into shard CSVs.
+
+    This function runs in a worker process.
+
+    Args:
+        lake_dir: The root directory of the response lake.
+        stage: The lake stage with the responses.
+        rows: List of the repository rows of the chunk.
+        outputs: List of (CSV path, columns, sink factory, factory
+            arguments) tuples.
+        shard_paths: List with the path of the shard of each output.
+    """
+    lake = ResponseLake(lake_dir)
+    out_files = [open(path, "w", newline="") for path in shard_paths]
+    try:
+        sinks = [make_sink(csv.writer(out_file), *args)
+                 for (_, _, make_sink, args), out_file
+                 in zip(outputs, out_files)]
+        results = (lake.read_latest(stage, row["owner"], row["name"])
+                   for row in rows)
+        for row, result in skip_missing(stage, rows, results):
+            for sink in sinks:
+                sink(row, result)
+    finally:
+        for out_file in out_files:
+            out_file.close()
+
+
+def merge_shards(csv_path, columns, shard_paths):
+    """ Concatenates shard CSVs, in order, under a header.
+
+    Args:
+        csv_path: The path of the merged CSV.
+        columns: List of the column names.
+        shard_paths: List of the shard paths, in order.
+    """
+    def write(out_csv):
+        csv.writer(out_csv).writerow(columns)
+        for shard_path in shard_paths:
+            with open(shard_path, newline="") as in_csv:
+                shutil.copyfileobj(in_csv, out_csv)
+
+    write_atomically(csv_path, write)
+
+
+def run_transform(stage, rows, outputs, workers=None):
+    """ Writes CSVs from the latest responses in the lake, in parallel.
+
+    Each output gets a sink per worker process from its sink factory, which
+    is called with a CSV writer and the factory arguments. Sinks must not
+    depend on the repositories of other chunks.
+
+    Args:
+        stage: The lake stage with the responses, such as "pr_stats".
+        rows: List of the repository rows from the repositories CSV.
+        outputs: List of (CSV path, columns, sink factory, factory
+            arguments) tuples. The sink factories must be module-level
+            functions, so that they can be sent to the worker processes.
+        workers: The number of processes. Defaults to get_worker_count().
+
+    Raises:
+        Exception: RISR_LAKE_DIR is not set.
+    """
+    lake_dir = get_lake_dir()
+    if not lake_dir:
+        raise Exception("RISR_LAKE_DIR must be set to read from the lake.")
+    workers = workers or get_worker_count()
+    chunks = split_rows(rows, workers * CHUNKS_PER_WORKER)
+
+    shard_dir = tempfile.mkdtemp(
+        dir=os.path.dirname(outputs[0][0]) or ".")
+    try:
+        shard_paths = [[os.path.join(shard_dir, f"{index}-{output}.csv")
+                        for output in range(len(outputs))]
+                       for index in range(len(chunks))]
+        with ProcessPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(transform_chunk, lake_dir, stage, chunk,
+                                outputs, paths)
+                for chunk, paths in zip(chunks, shard_paths)
+            ]
+            for future in futures:
+                future.result()
+
+        for output, (csv_path, columns, _, _) in enumerate(outputs):
+            merge_shards(csv_path, columns,
+                         [paths[output] for paths in shard_paths])
+    finally:
+        shutil.rmtree(shard_dir)
@@ -0,0 +1,85 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Benchmark for the parallel transform of the response lake.
+
+Fills a temporary lake with synthetic pr_comments responses, then rebuilds
+the comments CSV with 1, 2, 4, ... worker processes, up to the number of
+CPUs. The time should drop close to linearly with the number of processes.
+
+Usage: python transform_benchmark.py [number of repositories]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+from lake import ResponseLake
+import pr_comments
+from transform import run_transform
+
+PULL_REQUESTS_PER_REPO = 20
+COMMENTS_PER_PULL_REQUEST = 20
+
+
+def make_result(name):
+    """ Creates the pr_comments results of a synthetic repository. """
+    pull_requests = []
+    for number in range(PULL_REQUESTS_PER_REPO):
+        path = f"/intern/{name}/pull/{number}"
+        pull_requests.append({
+            "comments": {"nodes": [{
+                "resourcePath": f"{path}#{index}",
+                "body": "Could you add a test for this case? " * 4,
+                "createdAt": "2020-06-11T21:51:20Z",
+                "author": {"login": f"user{index % 3}"}
+            } for index in range(COMMENTS_PER_PULL_REQUEST)]},
+            "reviews": {"nodes": []}
+        })
+    return {"data": {"repository": {"pullRequests": {
+        "nodes": pull_requests}}}}
+
+
+def main():
+    """ Prints the transform time for each number of processes. """
+    num_repos = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+
+    with tempfile.TemporaryDirectory() as lake_dir, \
+            patch.dict(os.environ, {"RISR_LAKE_DIR": lake_dir}):
+        lake = ResponseLake(lake_dir)
+        rows = []
+        for index in range(num_repos):
+            name = f"repo{index}"
+            rows.append({"owner": "intern", "name": name,
+                         "repo_type": "starter"})
+            lake.append("pr_comments", "intern", name, make_result(name))
+
+        csv_path = os.path.join(lake_dir, "pr_comments.csv")
+        outputs = [(csv_path, pr_comments.COMMENT_COLUMNS,
+                    pr_comments.make_comment_sink, ({"user0"},))]
+        workers = 1
+        baseline = None
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            run_transform("pr_comments", rows, outputs, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers} processes: {elapsed:.2f} s, "
+                  f"speedup {baseline / elapsed:.2f}x")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
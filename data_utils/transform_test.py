@@ -0,0 +1,126 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the transform module. """
+
+import csv
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from lake import ResponseLake
+import pr_comments
+import transform
+
+
+def make_result(name, num_comments):
+    """ Creates the pr_comments results of a repository. """
+    return {
+        "data": {
+            "repository": {
+                "pullRequests": {
+                    "nodes": [{
+                        "comments": {"nodes": [{
+                            "resourcePath": f"/intern/{name}/pull/1#{index}",
+                            "body": f"comment {index}",
+                            "createdAt": "2020-06-11T21:51:20Z",
+                            "author": {"login": "host1"}
+                        } for index in range(num_comments)]},
+                        "reviews": {"nodes": []}
+                    }]
+                }
+            }
+        }
+    }
+
+
+class TransformTest(unittest.TestCase):
+    """ Transform test class. """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_split_rows(self):
+        """ Test to check that chunks are contiguous and cover every row. """
+        self.assertEqual(transform.split_rows(list(range(10)), 4),
+                         [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]])
+        self.assertEqual(transform.split_rows([0, 1], 8), [[0], [1]])
+        self.assertEqual(transform.split_rows([], 8), [])
+
+    def test_get_worker_count(self):
+        """ Test to check that RISR_WORKERS sets the number of processes. """
+        with patch.dict(os.environ, {"RISR_WORKERS": "3"}):
+            self.assertEqual(transform.get_worker_count(), 3)
+        with patch.dict(os.environ, {"RISR_WORKERS": "0"}):
+            with self.assertRaises(Exception):
+                transform.get_worker_count()
+
+    def test_run_transform(self):
+        """ Test to check that the parallel transform writes the same CSV
+        as a single process. """
+        lake = ResponseLake(self.temp_dir.name)
+        rows = []
+        for index in range(20):
+            name = f"repo{index}"
+            rows.append({"owner": "intern", "name": name,
+                         "repo_type": "starter"})
+            lake.append("pr_comments", "intern", name,
+                        make_result(name, index % 5))
+
+        expected = io.StringIO()
+        writer = csv.writer(expected)
+        writer.writerow(pr_comments.COMMENT_COLUMNS)
+        sink = pr_comments.make_comment_sink(writer, {"host1"})
+        for row in rows:
+            sink(row, lake.read_latest("pr_comments", "intern", row["name"]))
+
+        csv_path = os.path.join(self.temp_dir.name, "pr_comments.csv")
+        with patch.dict(os.environ, {"RISR_LAKE_DIR": self.temp_dir.name}):
+            transform.run_transform("pr_comments", rows, [
+                (csv_path, pr_comments.COMMENT_COLUMNS,
+                 pr_comments.make_comment_sink, ({"host1"},))
+            ], workers=2)
+        with open(csv_path, newline="") as in_csv:
+            self.assertEqual(in_csv.read(), expected.getvalue())
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)),
+                         ["pr_comments", "pr_comments.csv"])
+
+    def test_missing_repository(self):
+        """ Test to check that repositories missing from the lake are
+        skipped. """
+        lake = ResponseLake(self.temp_dir.name)
+        rows = [{"owner": "intern", "name": f"repo{index}",
+                 "repo_type": "starter"} for index in range(3)]
+        for row in [rows[0], rows[2]]:
+            lake.append("pr_comments", "intern", row["name"],
+                        make_result(row["name"], 1))
+
+        csv_path = os.path.join(self.temp_dir.name, "pr_comments.csv")
+        with patch.dict(os.environ, {"RISR_LAKE_DIR": self.temp_dir.name}):
+            transform.run_transform("pr_comments", rows, [
+                (csv_path, pr_comments.COMMENT_COLUMNS,
+                 pr_comments.make_comment_sink, ({"host1"},))
+            ], workers=2)
+        with open(csv_path, newline="") as in_csv:
+            self.assertEqual(
+                [row["comment_path"] for row in csv.DictReader(in_csv)],
+                ["/intern/repo0/pull/1#0", "/intern/repo2/pull/1#0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Module for calculating the internship weeks of pull requests and
+comments.
+
+The stages that read the CSVs offline import it instead of pr_stats, which
+queries GitHub.
+"""
+
+import csv
+from datetime import datetime
+import numpy as np
+
+
+def calculate_weeks(start_dates, created):
+    """ Calculates the internship week of many pull requests at once.
+
+    Args:
+        start_dates: List of intern start dates in "mm/dd/YYYY" form, or
+            "unknown".
+        created: datetime64 array of the pull request created dates.
+
+    Returns:
+        List of the internship weeks, or "unknown".
+    """
+    # Each start date is parsed once, instead of once per pull request.
+    start_days = {
+        start_date: np.datetime64(datetime.strptime(start_date, "%m/%d/%Y"))
+        for start_date in set(start_dates) if start_date != "unknown"
+    }
+    starts = np.array(
+        [start_days.get(start_date, np.datetime64("NaT"))
+         for start_date in start_dates], dtype="datetime64[s]")
+    with np.errstate(invalid="ignore"):
+        weeks = np.abs(created - starts) // np.timedelta64(7, "D") + 1
+    weeks = weeks.astype(object)
+    weeks[np.isnat(starts)] = "unknown"
+    return weeks.tolist()
+
+
+def load_start_dates(stats_csv):
+    """ Loads the start date of each pull request.
+
+    Args:
+        stats_csv: The path of the pull request statistics CSV.
+
+    Returns:
+        Dictionary mapping the pr_path of each pull request to its start
+        date, which may be "unknown".
+    """
+    with open(stats_csv, newline="") as in_csv:
+        return {row["pr_path"]: row["start_date"]
+                for row in csv.DictReader(in_csv)}
+
+
+def get_comment_weeks(rows, start_dates):
+    """ Calculates the internship week of many comments at once.
+
+    Args:
+        rows: List of comment rows with a comment_path and a created column.
+        start_dates: Dictionary from load_start_dates().
+
+    Returns:
+        List of the internship weeks of the comments, or "unknown".
+    """
+    return calculate_weeks(
+        [start_dates.get(row["comment_path"].split("#")[0], "unknown")
+         for row in rows],
+        np.array([row["created"][:-1] for row in rows],
+                 dtype="datetime64[s]"))
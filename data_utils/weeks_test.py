@@ -0,0 +1,56 @@
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Tests for the weeks module. """
+
+import csv
+import os
+import tempfile
+import unittest
+import weeks
+
+
+class WeeksTest(unittest.TestCase):
+    """ Weeks test class. """
+
+    def test_get_comment_weeks(self):
+        """ Test to check the weeks of comments from the start dates of
+        their pull requests. """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats_csv = os.path.join(temp_dir, "pr_stats.csv")
+            with open(stats_csv, "w", newline="") as out_csv:
+                writer = csv.writer(out_csv)
+                writer.writerow(["pr_path", "start_date"])
+                writer.writerow(["/a/b/pull/1", "6/1/2020"])
+                writer.writerow(["/a/b/pull/2", "unknown"])
+            start_dates = weeks.load_start_dates(stats_csv)
+
+        self.assertEqual(start_dates, {"/a/b/pull/1": "6/1/2020",
+                                       "/a/b/pull/2": "unknown"})
+        rows = [
+            {"comment_path": "/a/b/pull/1#1",
+             "created": "2020-06-01T10:00:00Z"},
+            {"comment_path": "/a/b/pull/1#2",
+             "created": "2020-06-15T10:00:00Z"},
+            {"comment_path": "/a/b/pull/2#1",
+             "created": "2020-06-15T10:00:00Z"},
+            {"comment_path": "/a/b/pull/3#1",
+             "created": "2020-06-15T10:00:00Z"}
+        ]
+        self.assertEqual(weeks.get_comment_weeks(rows, start_dates),
+                         [1, 3, "unknown", "unknown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
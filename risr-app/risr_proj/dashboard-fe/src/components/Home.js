@@ -50,7 +50,7 @@ class Home extends Component {
     axios
       .get(API_URL)
       .then((res) => {
-        this.setState({data: JSON.parse(res.data)});
+        this.setState({data: res.data});
       })
       .catch((error) => {
         console.log(error);
@@ -26,7 +26,7 @@ jest.mock('axios');
 describe('Home component', () => {
   test('renders a bar chart component', async () => {
     const resData = {
-      data: '{"bar_data": [{"test": "0"}], "stacked_data": [{"test": "1"}]}',
+      data: {bar_data: [{test: '0'}], stacked_data: [{test: '1'}]},
     };
     const spy = jest.spyOn(Home.prototype, 'componentDidMount');
     axios.get.mockImplementation(() => Promise.resolve(resData));
@@ -37,7 +37,7 @@ describe('Home component', () => {
 
   test('updates state with data from the API', async () => {
     const resData = {
-      data: '{"bar_data": [{"test": "0"}], "stacked_data": [{"test": "1"}]}',
+      data: {bar_data: [{test: '0'}], stacked_data: [{test: '1'}]},
     };
     axios.get.mockImplementation(() => Promise.resolve(resData));
     const stateData = {bar_data: [{test: '0'}], stacked_data: [{test: '1'}]};
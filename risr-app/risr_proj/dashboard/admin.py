@@ -13,6 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-# from django.contrib import admin
+"""Registers the dashboard models with the admin site."""
 
-# Register your models here.
+from django.contrib import admin
+
+from dashboard.models import Comment, Host, PullRequest, Repository
+
+admin.site.register([Repository, Host, PullRequest, Comment])
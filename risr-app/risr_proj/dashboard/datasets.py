@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https: // www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module that keeps the datasets of the dashboard in memory.
+
+A dataset is built from one or more files, such as the CSVs written by
+data_utils, and built again only once one of its files changes. Requests
+for an unchanged dataset cost a stat call per file and a dictionary lookup.
+"""
+
+import os
+import threading
+
+import pandas as pd
+
+
+def get_file_version(path):
+    """Gets the version of a file, which changes whenever it is rewritten.
+
+    Args:
+        path: The path of the file.
+
+    Returns:
+        A (modification time in nanoseconds, size) tuple.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_records(path):
+    """Reads a CSV as a list of records.
+
+    Args:
+        path: The path of the CSV.
+
+    Returns:
+        A list with a dictionary per row, mapping columns to values.
+    """
+    return pd.read_csv(path).to_dict(orient='records')
+
+
+class DatasetRegistry:
+    """Registry of datasets, each built once per version of its files.
+
+    Built datasets are shared by every thread of the server process, so
+    they must not be modified.
+
+    Attributes:
+        datasets: A dictionary mapping dataset names to (paths, build)
+            tuples, where build takes the paths and returns the dataset.
+        entries: A dictionary mapping dataset names to (version, dataset)
+            tuples of the latest build.
+        lock: The lock held while a dataset is built, so that it is built
+            by a single thread.
+    """
+
+    def __init__(self):
+        self.datasets = {}
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, paths, build):
+        """Registers a dataset.
+
+        Args:
+            name: The name of the dataset.
+            paths: A list of the paths of the files of the dataset.
+            build: A function that takes the list of paths and returns the
+                dataset.
+        """
+        self.datasets[name] = (list(paths), build)
+        self.entries.pop(name, None)
+
+    def get(self, name):
+        """Gets the latest version of a dataset.
+
+        Args:
+            name: The name of the dataset.
+
+        Returns:
+            A (version, dataset) tuple. The version is a tuple of the
+            versions of the files, from get_file_version().
+        """
+        paths, build = self.datasets[name]
+        version = tuple(get_file_version(path) for path in paths)
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == version:
+            return entry
+
+        with self.lock:
+            # Another thread may have built it while this one waited.
+            entry = self.entries.get(name)
+            if entry is None or entry[0] != version:
+                # A file rewritten during the build gets a newer version,
+                # so the next request builds the dataset again.
+                entry = (version, build(paths))
+                self.entries[name] = entry
+        return entry
+
+
+REGISTRY = DatasetRegistry()
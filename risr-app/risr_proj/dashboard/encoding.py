@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https: // www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module that serves JSON payloads encoded once per version of their data.
+
+A payload is serialized and compressed with every supported content coding
+when its data changes. Requests then pick the smallest coding the client
+accepts, and clients that already have the payload get a 304 response
+without a body, thanks to its strong ETag.
+"""
+
+import collections
+import gzip
+import hashlib
+import json
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings from the most to the least preferred.
+CODINGS = ['br', 'gzip', 'identity'] if brotli else ['gzip', 'identity']
+
+# A JSON body with its ETag and a dictionary mapping each coding in CODINGS
+# to the encoded body.
+EncodedPayload = collections.namedtuple('EncodedPayload', ['etag', 'bodies'])
+
+
+def encode_json(data):
+    """Serializes data to JSON and compresses it with every coding.
+
+    Args:
+        data: The data, of any type that json can serialize.
+
+    Returns:
+        An EncodedPayload. Its ETag is a hash of the JSON body.
+    """
+    body = json.dumps(data, separators=(',', ':')).encode()
+    bodies = {'identity': body, 'gzip': gzip.compress(body)}
+    if brotli:
+        bodies['br'] = brotli.compress(body)
+    return EncodedPayload(hashlib.sha256(body).hexdigest()[:32], bodies)
+
+
+def get_coding(accept_encoding):
+    """Chooses the content coding of a response.
+
+    Args:
+        accept_encoding: The Accept-Encoding header of the request.
+
+    Returns:
+        The most preferred coding in CODINGS that the client accepts.
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        weight = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    default = weights.get('*', None)
+    for coding in CODINGS[:-1]:
+        weight = weights.get(coding, default)
+        if weight is not None and weight > 0:
+            return coding
+    return 'identity'
+
+
+def get_etag(payload, coding):
+    """Gets the strong ETag of a coding of a payload.
+
+    Args:
+        payload: The EncodedPayload.
+        coding: The content coding.
+
+    Returns:
+        The quoted ETag, which differs for each coding since the bytes
+        differ.
+    """
+    if coding == 'identity':
+        return f'"{payload.etag}"'
+    return f'"{payload.etag}-{coding}"'
+
+
+def matches_etag(if_none_match, etag):
+    """Checks whether the If-None-Match header of a request matches an ETag.
+
+    Args:
+        if_none_match: The If-None-Match header.
+        etag: The quoted ETag.
+
+    Returns:
+        True if the client already has the representation.
+    """
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    # If-None-Match uses the weak comparison.
+    return '*' in tags or etag in [
+        tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def make_response(request, payload):
+    """Makes the response with a payload to a GET request.
+
+    Args:
+        request: The request.
+        payload: The EncodedPayload.
+
+    Returns:
+        An HttpResponseNotModified if the client has the payload, and
+        otherwise an HttpResponse with the payload in the chosen coding.
+    """
+    coding = get_coding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    etag = get_etag(payload, coding)
+    if matches_etag(request.META.get('HTTP_IF_NONE_MATCH', ''), etag):
+        response = HttpResponseNotModified()
+    else:
+        body = payload.bodies[coding]
+        response = HttpResponse(body, content_type='application/json')
+        response['Content-Length'] = len(body)
+        if coding != 'identity':
+            response['Content-Encoding'] = coding
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    # Clients keep the payload but check that it is still current.
+    response['Cache-Control'] = 'no-cache'
+    return response
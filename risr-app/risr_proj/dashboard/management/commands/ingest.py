@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https: // www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Command that loads the CSVs written by data_utils into the database.
+
+    $ python manage.py ingest [--data-dir DIR] [--chunk-size N]
+          [--rebuild-indexes]
+
+The CSVs are read in chunks. Rows are matched to the existing rows by their
+unique key: new rows are inserted with bulk_create, changed rows are updated
+with bulk_update, and unchanged rows are not written, so running the command
+again with the same CSVs writes nothing. Each chunk is a transaction.
+
+The secondary indexes of a table are dropped while it is loaded, and built
+again at the end, when the table is empty or with --rebuild-indexes.
+"""
+
+import csv
+import datetime
+import itertools
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from dashboard.models import Comment, Host, PullRequest, Repository
+
+# Number of rows read from a CSV at a time.
+CHUNK_SIZE = 5000
+
+# Largest number of keys in a query, below the SQLite limit of variables.
+MAX_KEYS_PER_QUERY = 500
+
+# Format of the dates of host_info.csv and pr_stats.csv, such as 6/1/2020.
+DATE_FORMAT = '%m/%d/%Y'
+
+
+def parse_date(value):
+    """Parses a date of host_info.csv or pr_stats.csv.
+
+    Args:
+        value: The date in "m/d/YYYY" form, or another value such as
+            "unknown".
+
+    Returns:
+        A datetime.date, or None if the value is not a date.
+    """
+    try:
+        return datetime.datetime.strptime(value, DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def parse_week(value):
+    """Parses an internship week of pr_stats.csv.
+
+    Args:
+        value: The week, or "unknown".
+
+    Returns:
+        An int, or None if the week is unknown.
+    """
+    return int(value) if value.isdigit() else None
+
+
+def get_week(start_date, created):
+    """Calculates the internship week of a comment, as data_utils does.
+
+    Args:
+        start_date: A datetime.date of the intern start date, or None.
+        created: A datetime.datetime of the comment creation.
+
+    Returns:
+        The week, or None if the start date is unknown.
+    """
+    if start_date is None:
+        return None
+    start = datetime.datetime.combine(start_date, datetime.time(),
+                                      created.tzinfo)
+    return abs(created - start) // datetime.timedelta(days=7) + 1
+
+
+def read_chunks(path, size):
+    """Reads a CSV in chunks of rows, without loading all of it.
+
+    Args:
+        path: The path of the CSV.
+        size: The number of rows in a chunk.
+
+    Yields:
+        Lists of at most size rows, as dictionaries.
+    """
+    with open(path, newline='') as in_csv:
+        reader = csv.DictReader(in_csv)
+        while True:
+            chunk = list(itertools.islice(reader, size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def get_key(values, key_fields):
+    """Gets the unique key of a row from its field values."""
+    return tuple(values[field] for field in key_fields)
+
+
+def upsert(model, key_fields, rows):
+    """Inserts new rows and updates changed rows of a table.
+
+    Args:
+        model: The model of the table.
+        key_fields: A list of the fields of the unique key of the model.
+        rows: A list of dictionaries mapping the fields of the model to the
+            values of a row. A later row replaces an earlier one with the
+            same key.
+
+    Returns:
+        A (number of inserted rows, number of updated rows) tuple.
+    """
+    rows = {get_key(row, key_fields): row for row in rows}
+    fields = list(next(iter(rows.values())))
+    update_fields = [field for field in fields if field not in key_fields]
+
+    keys = list(rows)
+    existing = {}
+    for start in range(0, len(keys), MAX_KEYS_PER_QUERY):
+        batch = keys[start:start + MAX_KEYS_PER_QUERY]
+        # Matches a superset of the batch for keys of several fields.
+        lookup = {f'{field}__in': {key[index] for key in batch}
+                  for index, field in enumerate(key_fields)}
+        for values in model.objects.filter(**lookup).values('id', *fields):
+            existing[get_key(values, key_fields)] = values
+
+    new_objects = []
+    changed_objects = []
+    for key, row in rows.items():
+        values = existing.get(key)
+        if values is None:
+            new_objects.append(model(**row))
+        elif any(values[field] != row[field] for field in update_fields):
+            changed_objects.append(model(id=values['id'], **row))
+
+    with transaction.atomic():
+        model.objects.bulk_create(new_objects)
+        if changed_objects and update_fields:
+            model.objects.bulk_update(changed_objects, update_fields)
+    return len(new_objects), len(changed_objects)
+
+
+class Command(BaseCommand):
+    """Loads repos.csv, host_info.csv, pr_stats.csv and pr_comments.csv."""
+    help = 'Loads the CSVs written by data_utils into the database.'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chunk_size = CHUNK_SIZE
+        self.rebuild_indexes = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir', default=os.path.join(settings.BASE_DIR, 'data'),
+            help='Directory of the CSVs.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Number of rows read and written at a time.')
+        parser.add_argument(
+            '--rebuild-indexes', action='store_true',
+            help='Drop the secondary indexes during the load even if the '
+            'tables are not empty.')
+
+    def handle(self, *args, **options):
+        data_dir = options['data_dir']
+        self.chunk_size = options['chunk_size']
+        self.rebuild_indexes = options['rebuild_indexes']
+        paths = {name: os.path.join(data_dir, name) for name in [
+            'repos.csv', 'host_info.csv', 'pr_stats.csv', 'pr_comments.csv']}
+        for path in paths.values():
+            if not os.path.isfile(path):
+                raise CommandError(f'{path} does not exist.')
+
+        self.load(Repository, ['owner', 'name'], paths['repos.csv'],
+                  lambda row: {
+                      'owner': row['owner'],
+                      'name': row['name'],
+                      'created': parse_datetime(row['created']),
+                      'pr_count': int(row['pr_count']),
+                      'repo_type': row['repo_type'],
+                  })
+        self.load(Host, ['username'], paths['host_info.csv'],
+                  lambda row: {
+                      'username': row['username'],
+                      'start_date': parse_date(row['start_date']),
+                      'team': row['team'],
+                  })
+
+        repository_ids = {
+            (owner, name): repository_id
+            for repository_id, owner, name in
+            Repository.objects.values_list('id', 'owner', 'name')}
+
+        def get_pull_request(row):
+            owner, name = row['pr_path'].split('/')[1:3]
+            return {
+                'pr_path': row['pr_path'],
+                'repository_id': repository_ids.get((owner, name)),
+                'number': int(row['pr_number']),
+                'week': parse_week(row['week']),
+                'start_date': parse_date(row['start_date']),
+                'created_date': parse_date(row['created_date']),
+                'total_comments': int(row['total_comments']),
+                'review_count': int(row['review_count']),
+                'lines_changed': int(row['pr_lines_changed']),
+            }
+
+        self.load(PullRequest, ['pr_path'], paths['pr_stats.csv'],
+                  get_pull_request)
+
+        pull_requests = {
+            pr_path: (pull_request_id, start_date)
+            for pull_request_id, pr_path, start_date in
+            PullRequest.objects.values_list('id', 'pr_path', 'start_date')}
+
+        def get_comment(row):
+            created = parse_datetime(row['created'])
+            pull_request_id, start_date = pull_requests.get(
+                row['comment_path'].split('#')[0], (None, None))
+            return {
+                'comment_path': row['comment_path'],
+                'pull_request_id': pull_request_id,
+                'created': created,
+                'author': row['author'],
+                'body': row['comment'],
+                'repo_type': row['repo_type'],
+                'is_host': row['is_host'] == 'True',
+                'week': get_week(start_date, created),
+            }
+
+        self.load(Comment, ['comment_path'], paths['pr_comments.csv'],
+                  get_comment)
+
+    def load(self, model, key_fields, path, get_values):
+        """Loads a CSV into the table of a model.
+
+        Args:
+            model: The model of the table.
+            key_fields: A list of the fields of the unique key of the model.
+            path: The path of the CSV.
+            get_values: A function that takes a row of the CSV and returns a
+                dictionary mapping the fields of the model to its values.
+        """
+        # pylint: disable=protected-access
+        start = time.perf_counter()
+        drop_indexes = (model._meta.indexes and (
+            self.rebuild_indexes or not model.objects.exists()))
+        if drop_indexes:
+            self.alter_indexes(model, 'remove_index')
+        rows = inserted = updated = 0
+        try:
+            for chunk in read_chunks(path, self.chunk_size):
+                chunk_inserted, chunk_updated = upsert(
+                    model, key_fields, [get_values(row) for row in chunk])
+                rows += len(chunk)
+                inserted += chunk_inserted
+                updated += chunk_updated
+        finally:
+            if drop_indexes:
+                self.alter_indexes(model, 'add_index')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{os.path.basename(path)}: {rows} rows, {inserted} inserted, '
+            f'{updated} updated in {elapsed:.2f} s '
+            f'({rows / elapsed if elapsed else 0:,.0f} rows/s)')
+
+    @staticmethod
+    def alter_indexes(model, method):
+        """Removes or adds the secondary indexes of a model.
+
+        Args:
+            model: The model.
+            method: "remove_index" or "add_index".
+        """
+        with connection.schema_editor() as editor:
+            # pylint: disable=protected-access
+            for index in model._meta.indexes:
+                getattr(editor, method)(model, index)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# Copyright 2020 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https: // www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Generated by Django 3.0.8 on 2026-10-17 00:01
+# pylint: disable=line-too-long,invalid-name
+
+"""Creates the models of the data_utils datasets and their indexes."""
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """Initial migration of the dashboard app."""
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Comment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comment_path', models.CharField(max_length=255, unique=True)),
+                ('created', models.DateTimeField()),
+                ('author', models.CharField(max_length=100)),
+                ('body', models.TextField()),
+                ('repo_type', models.CharField(max_length=50)),
+                ('is_host', models.BooleanField()),
+                ('week', models.IntegerField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Host',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=100, unique=True)),
+                ('start_date', models.DateField(null=True)),
+                ('team', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PullRequest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pr_path', models.CharField(max_length=255, unique=True)),
+                ('number', models.IntegerField()),
+                ('week', models.IntegerField(null=True)),
+                ('start_date', models.DateField(null=True)),
+                ('created_date', models.DateField()),
+                ('total_comments', models.IntegerField()),
+                ('review_count', models.IntegerField()),
+                ('lines_changed', models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Repository',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=100)),
+                ('created', models.DateTimeField()),
+                ('pr_count', models.IntegerField()),
+                ('repo_type', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='repository',
+            index=models.Index(fields=['repo_type'], name='repository_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='repository',
+            constraint=models.UniqueConstraint(fields=('owner', 'name'), name='unique_repository'),
+        ),
+        migrations.AddField(
+            model_name='pullrequest',
+            name='repository',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pull_requests', to='dashboard.Repository'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='pull_request',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='dashboard.PullRequest'),
+        ),
+        migrations.AddIndex(
+            model_name='pullrequest',
+            index=models.Index(fields=['week'], name='pull_request_week_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pullrequest',
+            index=models.Index(fields=['start_date'], name='pull_request_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pullrequest',
+            index=models.Index(fields=['created_date'], name='pull_request_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created'], name='comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['author'], name='comment_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['repo_type'], name='comment_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['week', 'is_host'], name='comment_week_idx'),
+        ),
+    ]
@@ -12,4 +12,114 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-# from django.db import models
+"""Models of the datasets written by data_utils.
+
+Each model has a row per row of a CSV: repos.csv, host_info.csv,
+pr_stats.csv and pr_comments.csv. The columns that the API filters and
+groups by are indexed, so that it aggregates in the database.
+"""
+
+from django.db import models
+
+
+class Repository(models.Model):
+    """An intern repository, from repos.csv."""
+    owner = models.CharField(max_length=100)
+    name = models.CharField(max_length=100)
+    created = models.DateTimeField()
+    pr_count = models.IntegerField()
+    repo_type = models.CharField(max_length=50)
+
+    objects = models.Manager()
+
+    class Meta:
+        """Metadata of the model."""
+        # pylint: disable=too-few-public-methods
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'name'],
+                                    name='unique_repository'),
+        ]
+        indexes = [
+            models.Index(fields=['repo_type'], name='repository_type_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.owner}/{self.name}'
+
+
+class Host(models.Model):
+    """A host and the start date of their intern, from host_info.csv."""
+    username = models.CharField(max_length=100, unique=True)
+    start_date = models.DateField(null=True)
+    team = models.CharField(max_length=100)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return str(self.username)
+
+
+class PullRequest(models.Model):
+    """The statistics of a pull request, from pr_stats.csv.
+
+    The week and start date are null when the start date is unknown.
+    """
+    pr_path = models.CharField(max_length=255, unique=True)
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE,
+                                   null=True, related_name='pull_requests')
+    number = models.IntegerField()
+    week = models.IntegerField(null=True)
+    start_date = models.DateField(null=True)
+    created_date = models.DateField()
+    total_comments = models.IntegerField()
+    review_count = models.IntegerField()
+    lines_changed = models.IntegerField()
+
+    objects = models.Manager()
+
+    class Meta:
+        """Metadata of the model."""
+        # pylint: disable=too-few-public-methods
+        indexes = [
+            models.Index(fields=['week'], name='pull_request_week_idx'),
+            models.Index(fields=['start_date'],
+                         name='pull_request_start_idx'),
+            models.Index(fields=['created_date'],
+                         name='pull_request_created_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.pr_path)
+
+
+class Comment(models.Model):
+    """A code review comment, from pr_comments.csv.
+
+    The week is the internship week of its pull request, or null when it is
+    unknown.
+    """
+    comment_path = models.CharField(max_length=255, unique=True)
+    pull_request = models.ForeignKey(PullRequest, on_delete=models.CASCADE,
+                                     null=True, related_name='comments')
+    created = models.DateTimeField()
+    author = models.CharField(max_length=100)
+    body = models.TextField()
+    repo_type = models.CharField(max_length=50)
+    is_host = models.BooleanField()
+    week = models.IntegerField(null=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        """Metadata of the model."""
+        # pylint: disable=too-few-public-methods
+        indexes = [
+            models.Index(fields=['created'], name='comment_created_idx'),
+            models.Index(fields=['author'], name='comment_author_idx'),
+            models.Index(fields=['repo_type'], name='comment_type_idx'),
+            models.Index(fields=['week', 'is_host'],
+                         name='comment_week_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.comment_path)
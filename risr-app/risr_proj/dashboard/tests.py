@@ -13,6 +13,328 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-# from django.test import TestCase
+"""Tests for the dashboard app."""
 
-# Create your tests here.
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from dashboard import encoding, views
+from dashboard.datasets import REGISTRY, DatasetRegistry, read_records
+from dashboard.models import Comment, Host, PullRequest, Repository
+
+
+class DatasetRegistryTest(SimpleTestCase):
+    """Tests for the dataset registry."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'bar_chart.csv')
+        self.write_csv('week,count\n1,2\n')
+        self.builds = 0
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_csv(self, text):
+        """Writes the CSV of the dataset."""
+        with open(self.path, 'w') as out_file:
+            out_file.write(text)
+
+    def build(self, paths):
+        """Builds the dataset and counts the builds."""
+        self.builds += 1
+        return read_records(paths[0])
+
+    def test_get(self):
+        """Checks that a dataset is only built again once its file
+        changes."""
+        registry = DatasetRegistry()
+        registry.register('bar_data', [self.path], self.build)
+        version, dataset = registry.get('bar_data')
+        self.assertEqual(dataset, [{'week': 1, 'count': 2}])
+        self.assertIs(registry.get('bar_data')[1], dataset)
+        self.assertEqual(self.builds, 1)
+
+        self.write_csv('week,count\n1,2\n2,5\n')
+        new_version, dataset = registry.get('bar_data')
+        self.assertNotEqual(new_version, version)
+        self.assertEqual(dataset, [{'week': 1, 'count': 2},
+                                   {'week': 2, 'count': 5}])
+        self.assertEqual(self.builds, 2)
+
+    def test_get_concurrently(self):
+        """Checks that threads requesting a changed dataset at the same time
+        build it once."""
+        def slow_build(paths):
+            time.sleep(0.05)
+            return self.build(paths)
+
+        registry = DatasetRegistry()
+        registry.register('bar_data', [self.path], slow_build)
+        datasets = []
+        threads = [threading.Thread(
+            target=lambda: datasets.append(registry.get('bar_data')[1]))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(len(datasets), 8)
+        self.assertTrue(all(dataset is datasets[0] for dataset in datasets))
+
+
+class DashboardListTest(SimpleTestCase):
+    """Tests for the dashboard endpoint."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.temp_dir.name, name)
+                      for name in ['bar_chart.csv', 'comment_categories.csv']]
+        self.write_csvs('week,count\n1,2\n')
+        REGISTRY.register('dashboard', self.paths,
+                          views.build_dashboard_payload)
+
+    def tearDown(self):
+        REGISTRY.register(
+            'dashboard',
+            [os.path.join(views.settings.BASE_DIR, path)
+             for path in views.DASHBOARD_CSVS.values()],
+            views.build_dashboard_payload)
+        self.temp_dir.cleanup()
+
+    def write_csvs(self, bar_chart):
+        """Writes the CSVs of the dashboard."""
+        with open(self.paths[0], 'w') as out_file:
+            out_file.write(bar_chart)
+        with open(self.paths[1], 'w') as out_file:
+            out_file.write('week,testing\n1,3\n')
+
+    def test_get(self):
+        """Checks that the data is encoded to JSON once, and compressed with
+        the coding that the client prefers."""
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(json.loads(response.content), {
+            'bar_data': [{'week': 1, 'count': 2}],
+            'stacked_data': [{'week': 1, 'testing': 3}]})
+
+        response = self.client.get('/api/dashboard/',
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('bar_data', json.loads(gzip.decompress(
+            response.content)))
+
+        response = self.client.get('/api/dashboard/',
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0, br;q=0')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_get_coding(self):
+        """Checks the choice of a coding from an Accept-Encoding header."""
+        self.assertEqual(encoding.get_coding(''), 'identity')
+        self.assertEqual(encoding.get_coding('gzip;q=0.5, br;q=0'), 'gzip')
+        self.assertEqual(encoding.get_coding('*'), encoding.CODINGS[0])
+        self.assertEqual(encoding.get_coding('*;q=0, identity'), 'identity')
+        if encoding.brotli:
+            self.assertEqual(encoding.get_coding('gzip, br'), 'br')
+
+    def test_if_none_match(self):
+        """Checks that clients with the current data get a 304 response, and
+        clients with older data get the new data."""
+        response = self.client.get('/api/dashboard/',
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        response = self.client.get('/api/dashboard/',
+                                   HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        # The uncompressed representation has another ETag.
+        response = self.client.get('/api/dashboard/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        self.write_csvs('week,count\n1,2\n2,4\n')
+        response = self.client.get('/api/dashboard/',
+                                   HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class StatsTest(TestCase):
+    """Tests for the aggregate endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        created = datetime.datetime(2020, 6, 2, tzinfo=datetime.timezone.utc)
+        starter = Repository.objects.create(
+            owner='a', name='b', created=created, pr_count=2,
+            repo_type='starter')
+        capstone = Repository.objects.create(
+            owner='a', name='c', created=created, pr_count=1,
+            repo_type='capstone')
+        start_date = datetime.date(2020, 6, 1)
+        pull_requests = [
+            PullRequest.objects.create(
+                pr_path=f'/a/{repository.name}/pull/{number}',
+                repository=repository, number=number, week=week,
+                start_date=start_date, created_date=created.date(),
+                total_comments=2, review_count=1, lines_changed=lines)
+            for repository, number, week, lines in [
+                (starter, 1, 1, 10), (starter, 2, 2, 30),
+                (capstone, 1, 2, 50)]
+        ]
+        for index, (author, is_host) in enumerate(
+                [('host', True), ('intern', False), ('intern', False)]):
+            Comment.objects.create(
+                comment_path=f'{pull_requests[index].pr_path}#1',
+                pull_request=pull_requests[index], created=created,
+                author=author, body='nit', is_host=is_host,
+                repo_type=pull_requests[index].repository.repo_type,
+                week=pull_requests[index].week)
+
+    def test_pull_request_stats(self):
+        """Checks that pull requests are grouped and filtered."""
+        response = self.client.get('/api/stats/pull_requests/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'week': 1, 'pull_requests': 1, 'comments': 2, 'reviews': 1,
+             'average_lines_changed': 10.0},
+            {'week': 2, 'pull_requests': 2, 'comments': 4, 'reviews': 2,
+             'average_lines_changed': 40.0}])
+
+        response = self.client.get('/api/stats/pull_requests/',
+                                   {'group_by': 'repo_type', 'week': '2'})
+        self.assertEqual(
+            [(row['repo_type'], row['pull_requests'])
+             for row in response.json()],
+            [('capstone', 1), ('starter', 1)])
+
+        response = self.client.get('/api/stats/pull_requests/',
+                                   {'group_by': 'cohort'})
+        self.assertEqual(response.json()[0]['cohort'], '2020-06-01')
+
+    def test_comment_stats(self):
+        """Checks that comments are grouped by role and filtered."""
+        response = self.client.get('/api/stats/comments/',
+                                   {'group_by': 'role'})
+        self.assertEqual(response.json(), [
+            {'role': 'intern', 'comments': 2, 'authors': 1},
+            {'role': 'host', 'comments': 1, 'authors': 1}])
+
+        response = self.client.get('/api/stats/comments/',
+                                   {'role': 'intern', 'repo_type': 'starter'})
+        self.assertEqual(response.json(),
+                         [{'week': 2, 'comments': 1, 'authors': 1}])
+
+        for params in [{'group_by': 'body'}, {'week': 'two'},
+                       {'cohort': 'june'}, {'role': 'mentor'}]:
+            response = self.client.get('/api/stats/comments/', params)
+            self.assertEqual(response.status_code, 400)
+
+
+class IngestTest(TransactionTestCase):
+    """Tests for the ingest command."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.write_csv('repos.csv', [
+            ['owner', 'name', 'created', 'pr_count', 'repo_type'],
+            ['a', 'b', '2020-06-02T10:00:00Z', '2', 'starter'],
+            ['a', 'c', '2020-06-03T10:00:00Z', '1', 'capstone']])
+        self.write_csv('host_info.csv', [
+            ['username', 'start_date', 'team'],
+            ['host', '6/1/2020', 'team1'], ['other', 'unknown', 'team2']])
+        self.write_csv('pr_stats.csv', [
+            ['pr_path', 'pr_number', 'week', 'start_date', 'created_date',
+             'total_comments', 'review_count', 'pr_lines_changed'],
+            ['/a/b/pull/1', '1', '1', '6/1/2020', '6/2/2020', '2', '1', '10'],
+            ['/a/c/pull/1', '1', 'unknown', 'unknown', '6/9/2020', '1', '0',
+             '5']])
+        self.write_comments('nit: rename this.')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_csv(self, name, rows):
+        """Writes a CSV in the temporary directory."""
+        with open(os.path.join(self.temp_dir.name, name), 'w',
+                  newline='') as out_csv:
+            csv.writer(out_csv).writerows(rows)
+
+    def write_comments(self, first_comment):
+        """Writes pr_comments.csv."""
+        self.write_csv('pr_comments.csv', [
+            ['comment_path', 'created', 'author', 'comment', 'repo_type',
+             'is_host'],
+            ['/a/b/pull/1#1', '2020-06-09T10:00:00Z', 'host', first_comment,
+             'starter', 'True'],
+            ['/a/b/pull/1#2', '2020-06-10T10:00:00Z', 'intern', 'Done.',
+             'starter', 'False'],
+            ['/a/c/pull/1#1', '2020-06-10T10:00:00Z', 'intern', 'Why?',
+             'capstone', 'False']])
+
+    def ingest(self, *args):
+        """Runs the command and returns its output."""
+        out = io.StringIO()
+        call_command('ingest', '--data-dir', self.temp_dir.name,
+                     '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ingest(self):
+        """Checks that every CSV is loaded and linked, and that the indexes
+        are built again."""
+        output = self.ingest()
+        self.assertIn('pr_comments.csv: 3 rows, 3 inserted, 0 updated', output)
+        self.assertEqual(Repository.objects.count(), 2)
+        self.assertEqual(Host.objects.get(username='other').start_date, None)
+
+        pull_request = PullRequest.objects.get(pr_path='/a/b/pull/1')
+        self.assertEqual(str(pull_request.repository), 'a/b')
+        self.assertEqual(pull_request.start_date, datetime.date(2020, 6, 1))
+        self.assertIsNone(PullRequest.objects.get(pr_path='/a/c/pull/1').week)
+
+        comment = Comment.objects.get(comment_path='/a/b/pull/1#1')
+        self.assertEqual(comment.pull_request, pull_request)
+        self.assertTrue(comment.is_host)
+        self.assertEqual(comment.week, 2)
+        self.assertIsNone(Comment.objects.get(
+            comment_path='/a/c/pull/1#1').week)
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Comment._meta.db_table)
+        self.assertIn('comment_week_idx', constraints)
+
+    def test_ingest_again(self):
+        """Checks that a second run only writes the changed rows."""
+        self.ingest()
+        output = self.ingest()
+        self.assertIn('pr_comments.csv: 3 rows, 0 inserted, 0 updated', output)
+
+        self.write_comments('nit: rename this variable.')
+        output = self.ingest('--rebuild-indexes')
+        self.assertIn('pr_comments.csv: 3 rows, 0 inserted, 1 updated', output)
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(
+            Comment.objects.get(comment_path='/a/b/pull/1#1').body,
+            'nit: rename this variable.')
@@ -16,35 +16,195 @@
 """ Module that defines different views for the dashboard app."""
 
 import os
-import json
 
+from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from django.conf import settings
+from django.db.models import Avg, Count, Sum
+from django.utils.dateparse import parse_date
+
+from dashboard.datasets import REGISTRY, read_records
+from dashboard.encoding import encode_json, make_response
+from dashboard.models import Comment, PullRequest
+
+# Keys of the dashboard data and the CSVs they are read from.
+DASHBOARD_CSVS = {
+    'bar_data': 'data/bar_chart.csv',
+    'stacked_data': 'data/comment_categories.csv',
+}
+
+
+def build_dashboard_payload(paths):
+    """Reads the CSVs of the dashboard and encodes them.
+
+    Args:
+        paths: A list of the paths of the CSVs, in the order of
+            DASHBOARD_CSVS.
+
+    Returns:
+        An EncodedPayload of a dictionary mapping the keys of DASHBOARD_CSVS
+        to the records of their CSV.
+    """
+    return encode_json({key: read_records(path)
+                        for key, path in zip(DASHBOARD_CSVS, paths)})
+
+
+REGISTRY.register(
+    'dashboard',
+    [os.path.join(settings.BASE_DIR, path) for path in DASHBOARD_CSVS.values()],
+    build_dashboard_payload)
 
-import pandas as pd
 
 @api_view(['GET'])
 def dashboard_list(request):
     """ Handles GET operations over the root endpoint of the API.
 
-    Reads data from a CSV file and returns it in JSON format as a response.
+    Reads data from CSV files and returns it in JSON format as a response.
+    The CSVs are only parsed and encoded again once they change. The
+    response is compressed if the client accepts it, and has no body if the
+    client already has the data, as told by its If-None-Match header.
 
     Args:
         request: A rest_framework.request.Request instance.
 
     Returns:
-        A rest_framework.Response instance containing the data, if any.
+        A django.http.HttpResponse instance containing the data, or a
+        rest_framework.Response instance for other methods.
     """
     if request.method == 'GET':
-        dataframe = pd.read_csv(
-            os.path.join(settings.BASE_DIR, 'data/bar_chart.csv'))
-        bar_data = dataframe.to_dict(orient='records')
-
-        dataframe = pd.read_csv(
-            os.path.join(settings.BASE_DIR, 'data/comment_categories.csv'))
-        stacked_data = dataframe.to_dict(orient='records')
-        data = {'bar_data': bar_data, 'stacked_data': stacked_data}
-        print(json.dumps(data))
-        return Response(json.dumps(data))
+        _, payload = REGISTRY.get('dashboard')
+        return make_response(request, payload)
     return Response()
+
+
+# Query parameters that pull request statistics can be grouped and filtered
+# by, and their fields.
+PULL_REQUEST_FIELDS = {
+    'week': 'week',
+    'cohort': 'start_date',
+    'repo_type': 'repository__repo_type',
+}
+
+# Query parameters that comments can be grouped and filtered by, and their
+# fields. The role of an author is either "host" or "intern".
+COMMENT_FIELDS = {
+    'week': 'week',
+    'cohort': 'pull_request__start_date',
+    'repo_type': 'repo_type',
+    'role': 'is_host',
+    'author': 'author',
+}
+
+
+def parse_filter(name, value):
+    """Parses the value of a query parameter to filter by.
+
+    Args:
+        name: The name of the query parameter.
+        value: The string value of the parameter.
+
+    Returns:
+        The value to filter by.
+
+    Raises:
+        ValueError: The value is invalid for the parameter.
+    """
+    if name == 'week':
+        return int(value)
+    if name == 'cohort':
+        start_date = parse_date(value)
+        if start_date is None:
+            raise ValueError(f'Invalid cohort {value}.')
+        return start_date
+    if name == 'role':
+        if value not in ('host', 'intern'):
+            raise ValueError(f'Invalid role {value}.')
+        return value == 'host'
+    return value
+
+
+def aggregate(request, queryset, fields, aggregates):
+    """Groups and aggregates a queryset in the database.
+
+    The group_by query parameter names the field to group by, and the other
+    parameters in fields filter the rows.
+
+    Args:
+        request: A rest_framework.request.Request instance.
+        queryset: The queryset of the rows.
+        fields: A dictionary mapping query parameters to fields.
+        aggregates: A dictionary mapping the names of the aggregates to
+            their aggregate expression.
+
+    Returns:
+        A rest_framework.Response instance containing a list with the value
+        of the group and the aggregates of each group, or an error.
+    """
+    group_by = request.query_params.get('group_by', 'week')
+    if group_by not in fields:
+        return Response(
+            {'error': f'group_by must be one of {", ".join(fields)}.'},
+            status=status.HTTP_400_BAD_REQUEST)
+    try:
+        filters = {fields[name]: parse_filter(name, value)
+                   for name, value in request.query_params.items()
+                   if name in fields}
+    except ValueError as error:
+        return Response({'error': str(error)},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    field = fields[group_by]
+    rows = (queryset.filter(**filters).values(field)
+            .annotate(**aggregates).order_by(field))
+    data = []
+    for row in rows:
+        value = row.pop(field)
+        if group_by == 'role':
+            value = 'host' if value else 'intern'
+        data.append({group_by: value, **row})
+    return Response(data)
+
+
+@api_view(['GET'])
+def pull_request_stats(request):
+    """Handles GET operations over the pull request statistics endpoint.
+
+    Groups the pull requests by the group_by query parameter, which is one
+    of week, cohort and repo_type, and filters them by the others.
+
+    Args:
+        request: A rest_framework.request.Request instance.
+
+    Returns:
+        A rest_framework.Response instance containing, for each group, the
+        number of pull requests, their total number of comments and reviews
+        and their average number of lines changed.
+    """
+    return aggregate(request, PullRequest.objects.all(), PULL_REQUEST_FIELDS, {
+        'pull_requests': Count('id'),
+        'comments': Sum('total_comments'),
+        'reviews': Sum('review_count'),
+        'average_lines_changed': Avg('lines_changed'),
+    })
+
+
+@api_view(['GET'])
+def comment_stats(request):
+    """Handles GET operations over the comment statistics endpoint.
+
+    Groups the comments by the group_by query parameter, which is one of
+    week, cohort, repo_type, role and author, and filters them by the
+    others.
+
+    Args:
+        request: A rest_framework.request.Request instance.
+
+    Returns:
+        A rest_framework.Response instance containing, for each group, the
+        number of comments and of distinct authors.
+    """
+    return aggregate(request, Comment.objects.all(), COMMENT_FIELDS, {
+        'comments': Count('id'),
+        'authors': Count('author', distinct=True),
+    })
@@ -38,4 +38,6 @@ from dashboard import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     re_path(r'^api/dashboard/$', views.dashboard_list),
+    re_path(r'^api/stats/pull_requests/$', views.pull_request_stats),
+    re_path(r'^api/stats/comments/$', views.comment_stats),
 ]